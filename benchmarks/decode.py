@@ -0,0 +1,85 @@
+"""Decoding throughput of C37.118 data frames.
+
+Compares the batch decoder of `ltbnet.decoder` with the per-frame struct decoder of
+`ltbnet.c37118` and, if installed, PyPMU `DataFrame.convert2frame` followed by
+`get_measurements`. Frames use the MiniPMU layout.
+
+Usage::
+
+    python benchmarks/decode.py --frames 100000 --pmus 1
+"""
+
+import os
+import sys
+import time
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from ltbnet import c37118  # NOQA
+from ltbnet.decoder import Decoder  # NOQA
+from ltbnet.minipmu import DATA_FORMAT, PHASOR_NUM, ANALOG_NUM, DIGITAL_NUM, DATA_RATE  # NOQA
+
+
+def make_config(npmu):
+    polar, phasor_float, analog_float, freq_float = DATA_FORMAT
+    fmt = polar | phasor_float << 1 | analog_float << 2 | freq_float << 3
+    channels = ['V_PHASOR'] * PHASOR_NUM + ['ANALOG1'] * ANALOG_NUM + ['BREAKER'] * (16 * DIGITAL_NUM)
+    stations = [c37118.Station('PMU {}'.format(i), i + 1, fmt, PHASOR_NUM, ANALOG_NUM, DIGITAL_NUM, channels,
+                               [0] * PHASOR_NUM, [1] * ANALOG_NUM, [0xffff] * DIGITAL_NUM, 60., 1)
+                for i in range(npmu)]
+    return c37118.Config(1, 0, 0, 1000000, stations, DATA_RATE)
+
+
+def make_frames(cfg, count):
+    block = (0,) + (1.02, 0.3) * PHASOR_NUM + (60.01, 0.02) + (0.5,) * ANALOG_NUM + (0,) * DIGITAL_NUM
+    values = block * cfg.num_pmu
+    return [c37118.data_frame(cfg, values, t=1.6e9 + k / DATA_RATE) for k in range(count)]
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='C37.118 data frame decoding benchmark')
+    parser.add_argument('--frames', type=int, default=100000, help='number of frames')
+    parser.add_argument('--pmus', type=int, default=1, help='number of PMU data blocks per frame')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per decoder (best is reported)')
+    args = parser.parse_args()
+
+    cfg = make_config(args.pmus)
+    frames = make_frames(cfg, args.frames)
+    buf = b''.join(frames)
+
+    decoder = Decoder(cfg)
+    cases = [('batch (numpy, with CRC)', lambda: decoder.decode(buf)),
+             ('batch (numpy, no CRC)', lambda: decoder.decode(buf, validate=False)),
+             ('struct per frame', lambda: [c37118.parse_data(f, cfg) for f in frames])]
+
+    try:
+        from synchrophasor.frame import DataFrame, ConfigFrame2
+        pypmu_cfg = ConfigFrame2.convert2frame(c37118.config_frame(cfg))
+        cases.append(('pypmu per frame', lambda: [DataFrame.convert2frame(f, pypmu_cfg).get_measurements()
+                                                  for f in frames]))
+    except ImportError:
+        print('pypmu is not installed; skipping the pypmu decoder')
+
+    print('{} frames of {} bytes with {} PMU(s)\n'.format(args.frames, cfg.frame_size, args.pmus))
+    base = None
+    for name, func in cases:
+        elapsed = timed(func, args.repeat)
+        base = base or elapsed
+        print('{n:<26} {t:9.2f} ms {r:12.0f} frames/s {x:8.1f}x'.format(
+            n=name, t=elapsed * 1e3, r=args.frames / elapsed, x=elapsed / base))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""End-to-end throughput and latency benchmark of MiniPMU streaming.
+
+For every case, a local DiME broker and a fake simulator (`ltbnet.fakesim`) run in a
+separate process and publish `pmudata` at the MiniPMU data rate. One `minipmu` process
+is started per PMU of the topology, each listening on its own loopback port, and a
+`MultiPdc` in this process receives all streams. The simulator writes the step number
+into the voltage magnitudes, so every received frame is matched to the wall time at
+which its step was published. Per case the benchmark reports
+
+ * setup: time to parse the config and set up the `Network`
+ * startup: time from starting the MiniPMU processes to the first data frame of each
+ * fps: data frames per second received from each MiniPMU
+ * cpu and rss: CPU percent and resident memory of each MiniPMU process, from /proc
+ * latency: time from publishing a step to receiving its frame at the PDC
+
+Cases are config files under `data` or `synthetic_N` for N PMUs without a topology.
+MiniPMU requires pypmu (`synchrophasor`). Baselines depend on the machine, so none is
+shipped; a case without a baseline fails until one is recorded with `--update`.
+
+Usage::
+
+    python benchmarks/e2e.py                                  # compare against e2e.json
+    python benchmarks/e2e.py --cases config_5pmu synthetic_100 --output results.json
+    python benchmarks/e2e.py --update                         # record a new baseline
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import numpy as np  # NOQA
+
+from ltbnet.cache import build_network  # NOQA
+from ltbnet.dime import Broker  # NOQA
+from ltbnet.fakesim import FakeSimulator  # NOQA
+from ltbnet.minipmu import DATA_RATE  # NOQA
+from ltbnet.pdc import MultiPdc  # NOQA
+
+BASELINE = os.path.join(HERE, 'e2e.json')
+CASES = ('config_5pmu', 'config_wecc_fixidx', 'synthetic_50')
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+# metric paths and whether larger values are better
+METRICS = ((('setup_ms',), False),
+           (('startup_ms', 'max'), False),
+           (('fps', 'min'), True),
+           (('cpu_percent', 'mean'), False),
+           (('rss_mb', 'mean'), False),
+           (('latency_ms', 'p99'), False))
+
+
+class StampedSimulator(FakeSimulator):
+    """Fake simulator writing the step number into the voltage magnitudes and recording publish times"""
+    def __init__(self, stamps, **kwargs):
+        super().__init__(vn=1e-3, **kwargs)  # MiniPMU scales magnitudes by Vn = 1 V
+        self.stamps = stamps
+
+    def values(self, t):
+        values = super().values(t)
+        values[0, :self.nbus] = self.count
+        return values
+
+    def step(self):
+        if self.count < len(self.stamps):
+            self.stamps[self.count] = time.time()
+        super().step()
+
+
+def simulate(address, nbus, rate, duration, stamps):
+    broker = Broker(address)
+    broker.start()
+    StampedSimulator(stamps, address=address, nbus=nbus, rate=rate).run(duration)
+    broker.stop()
+
+
+def pmus_of(case):
+    """Return (setup seconds, PMU idx list, PMU names) of a case"""
+    if case.startswith('synthetic_'):
+        n = int(case.split('_', 1)[1])
+        return 0., list(range(1, n + 1)), ['PMU_{}'.format(i) for i in range(1, n + 1)]
+
+    path = os.path.join(ROOT, 'data', case + '.csv')
+    start = time.perf_counter()
+    network = build_network(path)
+    setup = time.perf_counter() - start
+    idx = [int(i) for i in network.PMU.pmu_idx]
+    names = [str(name) if str(name).startswith('PMU_') else 'PMU_' + str(name) for name in network.PMU.name]
+    return setup, idx, names
+
+
+def proc_cpu(pid):
+    """Return the user and system CPU seconds of process `pid`"""
+    with open('/proc/{}/stat'.format(pid)) as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def proc_rss(pid):
+    """Return the resident memory of process `pid` in MB"""
+    with open('/proc/{}/status'.format(pid)) as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.
+    return 0.
+
+
+def summary(values, keys=('mean', 'min', 'max')):
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return {k: None for k in keys}
+    funcs = {'mean': np.mean, 'min': np.min, 'max': np.max, 'median': np.median,
+             'p50': lambda v: np.percentile(v, 50), 'p95': lambda v: np.percentile(v, 95),
+             'p99': lambda v: np.percentile(v, 99)}
+    return {k: round(float(funcs[k](values)), 3) for k in keys}
+
+
+def run_case(case, duration, warmup, startup_timeout, base_port):
+    setup, idx, names = pmus_of(case)
+    npmu = len(idx)
+    rate = DATA_RATE
+
+    tmp = tempfile.mkdtemp(prefix='ltbnet-e2e-')
+    address = 'local://' + os.path.join(tmp, 'dime')
+    total = startup_timeout + warmup + duration + 2
+    stamps = multiprocessing.Array('d', int(total * rate) + rate, lock=False)
+    sim = multiprocessing.Process(target=simulate, args=(address, max(idx), rate, total, stamps), daemon=True)
+    sim.start()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    ports = [base_port + k for k in range(npmu)]
+    t_spawn = time.monotonic()
+    procs = [subprocess.Popen([sys.executable, '-m', 'ltbnet.minipmu', '-a', address, '-n', name,
+                               str(port), str(i)], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+             for name, port, i in zip(names, ports, idx)]
+
+    first = {}
+    received = []  # (key, step, receive time)
+    recording = [False]
+
+    def on_data(key, m):
+        if key not in first:
+            first[key] = time.monotonic() - t_spawn
+        if recording[0]:
+            received.append((key, int(round(m['measurements'][0]['phasors'][0][0])), time.time()))
+
+    pdc = MultiPdc([('127.0.0.1', p) for p in ports], idcodes=idx, backoff=(0.05, 0.5))
+    pdc.add_callback(on_data)
+    pdc.connect()
+
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while len(first) < npmu and time.monotonic() < deadline:
+            pdc.poll(0.05)
+            if any(p.poll() is not None for p in procs):
+                raise RuntimeError('a MiniPMU process exited during startup; check `minipmu -h` and pypmu')
+        pdc.run(warmup)
+
+        cpu0 = [proc_cpu(p.pid) for p in procs]
+        recording[0] = True
+        start = time.monotonic()
+        pdc.run(duration)
+        elapsed = time.monotonic() - start
+        recording[0] = False
+        cpu1 = [proc_cpu(p.pid) for p in procs]
+        rss = [proc_rss(p.pid) for p in procs]
+    finally:
+        pdc.stop()
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+        sim.terminate()
+        sim.join()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    counts = np.bincount([r[0] for r in received], minlength=npmu)
+    stamps = np.frombuffer(stamps)
+    latency = [t - stamps[k] for _, k, t in received if 0 <= k < len(stamps) and stamps[k] > 0]
+
+    return {'pmus': npmu,
+            'rate': rate,
+            'duration': round(elapsed, 3),
+            'frames': len(received),
+            'started': len(first),
+            'setup_ms': round(setup * 1e3, 3),
+            'startup_ms': summary(np.array(list(first.values())) * 1e3, ('median', 'max')),
+            'fps': summary(counts / elapsed),
+            'cpu_percent': summary((np.array(cpu1) - np.array(cpu0)) / elapsed * 100),
+            'rss_mb': summary(rss),
+            'latency_ms': summary(np.array(latency) * 1e3, ('p50', 'p95', 'p99', 'max')),
+            }
+
+
+def lookup(result, path):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def compare(name, result, baseline, tolerance):
+    """Return the regressions of `result` against `baseline` as messages"""
+    failures = []
+    for path, higher_better in METRICS:
+        value, ref = lookup(result, path), lookup(baseline, path)
+        if value is None or not ref:
+            continue
+        if (higher_better and value < ref * (1 - tolerance)) or \
+                (not higher_better and value > ref * (1 + tolerance)):
+            failures.append('{c} {m} {v:g} against baseline {r:g}'.format(c=name, m='.'.join(path), v=value, r=ref))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LTBNet end-to-end MiniPMU streaming benchmark')
+    parser.add_argument('--cases', nargs='+', default=CASES,
+                        help='config names under data, or synthetic_N for N PMUs')
+    parser.add_argument('--duration', type=float, default=10, help='seconds measured per case')
+    parser.add_argument('--warmup', type=float, default=2, help='seconds streamed before measuring')
+    parser.add_argument('--startup_timeout', type=float, default=30,
+                        help='seconds to wait for the first frame of every MiniPMU')
+    parser.add_argument('--port', type=int, default=21410, help='first MiniPMU port')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative regression against the baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline json file')
+    parser.add_argument('--output', help='write the results to a json file')
+    parser.add_argument('--update', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.update:
+        print('WARNING: no baseline at {}; nothing to compare against. Record one with --update'.format(
+            args.baseline))
+
+    results = {}
+    failures = []
+    print('{:<22} {:>5} {:>9} {:>11} {:>8} {:>7} {:>8} {:>9} {:>9}'.format(
+        'Case', 'PMUs', 'Setup', 'Startup', 'FPS', 'CPU%', 'RSS MB', 'Lat P50', 'Lat P99'))
+    for case in args.cases:
+        r = run_case(case, args.duration, args.warmup, args.startup_timeout, args.port)
+        results[case] = r
+
+        def fmt(v, spec):
+            return '-' if v is None else format(v, spec)
+
+        print('{:<22} {:>5} {:>7}ms {:>9}ms {:>8} {:>7} {:>8} {:>7}ms {:>7}ms'.format(
+            case, r['pmus'], fmt(r['setup_ms'], '.1f'), fmt(r['startup_ms']['max'], '.0f'),
+            fmt(r['fps']['min'], '.1f'), fmt(r['cpu_percent']['mean'], '.1f'), fmt(r['rss_mb']['mean'], '.1f'),
+            fmt(r['latency_ms']['p50'], '.2f'), fmt(r['latency_ms']['p99'], '.2f')))
+
+        if r['started'] < r['pmus']:
+            failures.append('{c}: {s}/{n} MiniPMUs sent data'.format(c=case, s=r['started'], n=r['pmus']))
+        if args.update:
+            continue
+        if case in baseline:
+            failures += compare(case, r, baseline[case], args.tolerance)
+        else:
+            failures.append('{c}: no baseline to compare against'.format(c=case))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write('\n')
+
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to {}'.format(args.baseline))
+
+    for failure in failures:
+        print('FAIL: ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Import-time regression benchmark for the `ltbnet` and `minipmu` entry points.
+
+Each entry point is run in a fresh interpreter under ``python -X importtime``. The
+benchmark fails if the cumulative import time exceeds the stored baseline by more than
+the tolerance, or if any heavy dependency is imported on a path that must not need it.
+
+Usage::
+
+    python benchmarks/importtime.py             # compare against importtime.json
+    python benchmarks/importtime.py --update    # record a new baseline
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from statistics import median
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BASELINE = os.path.join(HERE, 'importtime.json')
+
+HEAVY = ('numpy', 'matplotlib', 'networkx', 'pygraphviz', 'pydot',
+         'synchrophasor', 'andes_addon', 'mininet.net', 'mininet.node')
+
+CASES = {
+    'ltbnet --parse_only': (
+        "import sys\n"
+        "sys.argv = ['ltbnet', {config!r}, '--parse_only']\n"
+        "from ltbnet.main import main\n"
+        "main()\n"
+    ),
+    'minipmu -h': (
+        "import sys\n"
+        "sys.argv = ['minipmu', '-h']\n"
+        "from ltbnet.minipmu import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse the output of `-X importtime`
+
+    Returns
+    -------
+    tuple
+        (total cumulative time of top-level imports in microseconds, set of module names)
+    """
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        cumulative = int(fields[1])
+        name = fields[2].rstrip()
+        modules.add(name.strip())
+        if not name.startswith(' ' * 2):
+            total += cumulative
+    return total, modules
+
+
+def run_case(code, repeat=5):
+    """Run `code` `repeat` times and return (median total microseconds, imported modules)"""
+    totals = []
+    modules = set()
+    env = dict(os.environ, LTBNET_CACHE=tempfile.mkdtemp(prefix='ltbnet-bench-'),
+               PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+        if proc.returncode != 0:
+            raise RuntimeError('benchmark case failed:\n' + proc.stderr[-2000:])
+        total, mods = parse_importtime(proc.stderr)
+        totals.append(total)
+        modules |= mods
+    return median(totals), modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LTBNet entry point import-time benchmark')
+    parser.add_argument('--config', default=os.path.join('data', 'config_5pmu.csv'),
+                        help='config file for `ltbnet --parse_only`')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs per case')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative slowdown against the baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline json file')
+    parser.add_argument('--update', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+    for name, code in CASES.items():
+        total, modules = run_case(code.format(config=args.config), args.repeat)
+        results[name] = total
+
+        heavy = sorted(m for m in modules if m.split('.')[0] in HEAVY or m in HEAVY)
+        ref = baseline.get(name)
+        status = 'ok'
+        if heavy:
+            status = 'FAIL: imports ' + ', '.join(heavy)
+        elif ref and not args.update and total > ref * (1 + args.tolerance):
+            status = 'FAIL: slower than baseline {r:.1f} ms'.format(r=ref / 1e3)
+        failed = failed or status != 'ok'
+
+        print('{n:<24} {t:8.1f} ms  {s}'.format(n=name, t=total / 1e3, s=status))
+
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to {}'.format(args.baseline))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,32 +5,17 @@ to start sending measurements.
 """
 
 
-from synchrophasor.pdc import Pdc
-from synchrophasor.frame import DataFrame, HeaderFrame, \
-        ConfigFrame1, ConfigFrame2, ConfigFrame3
-from multiprocessing import Queue
-
 import time
 import logging
 
 import numpy as np
-import matplotlib.pyplot as plt
-
-from andes_addon.dime import Dime
-
-h1, = plt.plot([], [], linewidth=6, label='Frequency Deviation')
-h2, = plt.plot([], [], linewidth=6, label='Separation Threshold')
-mng = plt.get_current_fig_manager()
-mng.full_screen_toggle()
 
-ca = plt.gca()
-ca.legend(fontsize=30)
-ca.xaxis.set_tick_params(labelsize=30)
-ca.yaxis.set_tick_params(labelsize=30)
-
-plt.ion()
-plt.show()
-plt.pause(0.1)
+from ltbnet.dime import make_dime
+from ltbnet.pdc import MultiPdc
+from ltbnet.command import CommandChannel, ACK_VAR
+from ltbnet.concentrator import Concentrator
+from ltbnet.detector import Detector
+from ltbnet.plotting import LivePlot
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -41,33 +26,35 @@ fh = logging.FileHandler('/var/log/minipdc.log')
 fh.setFormatter(formatter)
 logger.addHandler(fh)
 
-dimec = Dime('ISLANDING', 'tcp://192.168.1.200:5000')
-
 ISLANDING = {'vgsvaridx': np.array([1, 2])}
 ISLANDING_idx = {'fdev': np.array([1]), 'thresh': np.array([2])}
 ISLANDING_vars = {'t': 0, 'vars': np.array([0, 0.4])}
 ISLANDING_header = ['fdev_WECC', 'thresh_WECC']
 ISLANDING_info = ''
 
+GLITCH = 1  # frequency differences of 1 mHz and above are measurement glitches
+
 
 class MiniPDC(object):
     """A MiniPDC connecting to multiple PMUs and a DiME server
     """
     def __init__(self, name, dime_address, ip_list, port_list=None,
-                 loglevel=logging.INFO):
+                 loglevel=logging.INFO, rate=30, wait=0.1):
         self._name = name
         self._dime_address = dime_address
         self._loglevel = loglevel
 
-        self.dimec = Dime(name, dime_address)
+        self.dimec = make_dime(name, dime_address)
+        self.commands = CommandChannel(self.dimec, name)
         self.ip_list = ip_list
         self.port_list = port_list  # not being used now
 
         # check if the lengths of `ip_list` and `port_list` match
 
-        self.pdc = {}
-        self.header = {}
-        self.config = {}
+        self.pdc = None
+        self.concentrator = None
+        self.rate = rate
+        self.wait = wait  # seconds to wait for all PMUs to report a time slice
 
         self.last_var = None
         # state flags
@@ -101,7 +88,8 @@ class MiniPDC(object):
         if self.last_var == 'DONE' and int(val) == 1:
             self.andes_online = False
             self.initialize()
-            pass
+        elif self.last_var == ACK_VAR:
+            self.commands.handle_ack(val)
         return self.last_var
 
     def start_dime(self):
@@ -114,34 +102,38 @@ class MiniPDC(object):
         self.dimec.start()
         logger.info('DiME connected')
 
-    def init_pdc(self):
-
-        for idx, item in enumerate(self.ip_list):
-            pmu_idx = int(item.split('.')[3])
+    @property
+    def header(self):
+        return self.pdc.header if self.pdc else {}
 
-            self.pdc[idx] = Pdc(pdc_id=pmu_idx,
-                                pmu_ip=self.ip_list[idx],
-                                pmu_port=1410)
+    @property
+    def config(self):
+        return self.pdc.config if self.pdc else {}
 
-            self.pdc[idx].logger.setLevel("INFO")
+    def init_pdc(self):
+        """Connect to all PMUs. Header and ConfigFrame are requested when connected,
+        and measurements are started once the ConfigFrame is received"""
+        self.concentrator = Concentrator(self.npmu, rate=self.rate, wait=self.wait)
+        self.concentrator.add_callback(self.on_snapshot)
+
+        self.pdc = MultiPdc(self.ip_list, port=1410)
+        self.pdc.add_callback(self.concentrator.feed)
+        self.pdc.connect()
         logger.info('PDC initialized')
 
-    def get_header_config(self):
-        for idx, item in self.pdc.items():  # each item is a PDC
-            item.run()  # Connect to PMU
-
-            self.header[idx] = item.get_header()
-            self.config[idx] = item.get_config()
-
-        for idx, item in self.pdc.items():  # each item is a PDC
-            item.start()  # Request to start sending measurements
-            self.pdc_started = True
-
-        logger.info('PMU Header and ConfigFrame received')
-
-    def collect_data(self):
+    def on_snapshot(self, snapshot):
+        """Callback of the time-aligned measurements of all PMUs"""
         pass
 
+    def collect_data(self, timeout=0.01):
+        """Align the frames received within `timeout` seconds from all PMUs and
+        release the complete or expired time slices to `on_snapshot`. Commands
+        submitted by the callbacks are sent together afterwards"""
+        count = self.pdc.poll(timeout)
+        self.concentrator.poll()
+        self.commands.flush()
+        return count
+
     def process_data(self):
         pass
 
@@ -155,13 +147,11 @@ class Islanding(MiniPDC):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        self.result_queue = []
-        self.result_dict = {}
-        self.freq = {}
+        self.detector = None
         self.freq_diff = 0
 
-        self.freq_diff_array = np.array([0, 0.4])
-        self.t_array = np.array([0])
+        self.plot = LivePlot(['Frequency Deviation', 'Separation Threshold'],
+                             linewidth=6, fontsize=30, fullscreen=True)
 
         self.time_detect = 0
         self.detected = False
@@ -177,14 +167,50 @@ class Islanding(MiniPDC):
 
     def initialize(self):
         super(Islanding, self).initialize()
-        self.result_queue = [Queue() for x in range(self.npmu)]
-        self.result_dict = {}
-        self.freq = {}
+        if self.pdc is not None:
+            self.reset_detector()
         self.freq_diff = 0
         self.time_detect = 0
         self.detected = False
         self.islanded = False
 
+    def init_pdc(self):
+        super(Islanding, self).init_pdc()
+        self.reset_detector()
+
+    def reset_detector(self):
+        self.detector = Detector(self.npmu, window=self.rate, threshold=0.4, glitch=GLITCH)
+        self.detector.add_callback(self.on_event)
+
+    def on_snapshot(self, snapshot):
+        # frequency deviation in mHz
+        freq = (snapshot.values['frequency'] - 60) * 1000
+        self.detector.update(snapshot.t, freq, snapshot.present)
+        if np.isnan(self.detector.divergence):
+            return
+        self.freq_diff = self.detector.divergence
+        if abs(self.freq_diff) < GLITCH:
+            print('Frequency difference = {}'.format(self.freq_diff))
+        else:
+            self.freq_diff = 0
+            return
+
+        # impose a delay before islanding by comparing sample times
+        if self.detected and (not self.islanded):
+            if snapshot.t - self.time_detect >= self.islanding_delay:
+                self.commands.submit('sim', 'Event', self.event, t_detect=snapshot.t)
+                print('--> Islanding initiated!!!')
+                self.islanded = True
+
+    def on_event(self, event):
+        # glitches are filtered by the detector before an event can fire
+        if event.kind != 'divergence' or self.detected:
+            return
+        # record the *initial* sample time when frequency divergence is detected
+        self.detected = True
+        self.time_detect = event.t
+        print('--> Frequency divergence detected. Islanding will happen in {}s'.format(self.islanding_delay))
+
     def sync_and_handle(self):
         super(Islanding, self).sync_and_handle()
 
@@ -200,22 +226,15 @@ class Islanding(MiniPDC):
             print(self.dimec.workspace['Varvgs']['t'])
         return self.last_var
 
-    def update_draw(self, xdata, ydata):
-        # TODO: remove the *2 in xdata
-        h1.set_data(xdata * 2, ydata[:, 0])
-        h2.set_data(xdata * 2, ydata[:, 1])
-
-        ca.relim()
-        ca.autoscale_view()
-
-        plt.draw()
-        plt.pause(0.0001)
-        plt.show()
+    def update_draw(self, t, freq_diff):
+        # TODO: remove the *2 in t
+        self.plot.push(t * 2, [freq_diff, 0.4])
 
     def run(self):
         super(Islanding, self).run()
         self.start_dime()
         self.initialize()
+        self.plot.start()
         print('PDC and Islanding running.. Waiting for ANDES')
         while True:
 
@@ -224,83 +243,15 @@ class Islanding(MiniPDC):
             # only start if ANDES is connected
             if self.andes_online is False:
                 continue
-            else:
-                if len(self.config) == 0:
-                    time.sleep(0.5)
-                    self.init_pdc()
-                    self.get_header_config()
-
-            # retrieve all measurements from the PDCs
-            for idx, item in self.pdc.items():
-                item.get_msg(self.result_queue[idx])
-
-            # for each PDC, retrieve the frequency
-            for idx, item in enumerate(self.result_queue):
-
-                self.result_dict[idx] = item.get()
-
-                if self.result_dict[idx] is None:
-                    self.freq[idx] = 60
-                    continue
-
-                frame = self.result_dict[idx]
-
-                if isinstance(frame, HeaderFrame):
-                    self.header[idx] = frame
-                    continue
-
-                elif isinstance(frame, (ConfigFrame3, ConfigFrame2, ConfigFrame1)):
-                    self.config[idx] = frame
-                    continue
-
-                elif isinstance(frame, DataFrame):
-                    measurements = frame.get_measurements()
-                    if isinstance(measurements, dict):
-                        self.freq[idx] = (measurements['measurements'][0]['frequency'] - 60) * 1000
-                        # only the data received here goes to processing
-                    else:
-                        print('Unknown measurement type {}, continue'.format(type(measurements)))
-                        continue
-
-                else:
-                    logger.info('ignored {} data'.format(type(frame)))
-                    continue
-
-            # detect frequency deviation
-
-            if len(self.freq) == 0:
-                continue
+            elif self.pdc is None:
+                time.sleep(0.5)
+                self.init_pdc()
 
-            self.freq_diff = max(self.freq.values()) - min(self.freq.values())
-            if abs(self.freq_diff) < 1:
-                print('Frequency difference = {}'.format(self.freq_diff))
-            else:
-                self.freq_diff = 0
-                continue
-
-            if self.detected is False:
-                if self.freq_diff >= 0.4:
-                    # record the *initial* time when frequency divergence is detected
-                    self.detected = True
-                    self.time_detect = time.time()
-                    print('--> Frequency divergence detected. Islanding will happen in {}s'.format(self.islanding_delay))
-
-            # impose a delay before islanding by comparing time() and time_detect
-
-            elif self.detected and (not self.islanded):
-                if time.time() - self.time_detect >= self.islanding_delay:
-                    self.dimec.send_var('sim', 'Event', self.event)
-                    print('--> Islanding initiated!!!')
-                    self.islanded = True
+            # align the measurements received from all PMUs and detect divergence
+            self.collect_data()
 
             if sf == 'Varvgs':
-                self.freq_diff_array = np.vstack((self.freq_diff_array,
-                                                  np.array([[self.freq_diff, 0.4
-                                                          ]]))
-                          )
-                self.t_array = np.hstack((self.t_array, self.dimec.workspace[sf]['t']))
-
-                self.update_draw(self.t_array, self.freq_diff_array)
+                self.update_draw(self.dimec.workspace[sf]['t'], self.freq_diff)
 
                 ISLANDING_vars['t'] = self.dimec.workspace[sf]['t']
                 ISLANDING_vars['vars'][0] = self.freq_diff
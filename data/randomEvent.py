@@ -1,7 +1,9 @@
-from andes_addon.dime import Dime
+from ltbnet.command import CommandChannel
+from ltbnet.dime import make_dime
 
-dimec = Dime('ISLANDING', 'tcp://192.168.1.200:5000')
+dimec = make_dime('ISLANDING', 'tcp://192.168.1.200:5000')
 dimec.start()
+channel = CommandChannel(dimec, 'ISLANDING')
 
 event = {'id': [143, 146, 135],
          'name': ['Line', 'Line', 'Line'],
@@ -10,6 +12,7 @@ event = {'id': [143, 146, 135],
          'action': [0, 0, 0]
          }
 
-dimec.send_var('sim', 'Event', event)
+channel.send('sim', 'Event', event)
+channel.report()
 
 dimec.exit()
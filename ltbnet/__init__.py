@@ -1 +1,3 @@
-__all__ = ['main', 'network', 'parser', 'utils']
\ No newline at end of file
+__all__ = ['main', 'network', 'parser', 'utils', 'cache']
+
+__version__ = '0.1.2'
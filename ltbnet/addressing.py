@@ -0,0 +1,142 @@
+"""Hierarchical IP address allocation for LTBNet hosts.
+
+Each `Region` gets its own subnet carved from a configurable supernet, optionally split
+further into one subnet per switch, so that addresses identify the region (or switch) of
+a host. Explicit `IP` fields from the config are respected and collisions are detected
+with a set of integer addresses.
+
+By default, the subnets are joined by on-link routes and all hosts remain in one
+layer-2 broadcast domain. With `gateways` in `Network.assign_ip`, the links between
+regions are replaced by routers and every region is its own broadcast domain; see
+`ltbnet.gateways`.
+"""
+
+import ipaddress
+
+# prefix length Mininet gives to addresses configured without one (from its default ipBase)
+MININET_PREFIX = 8
+
+
+class AddressError(ValueError):
+    """Address collision or exhausted address space"""
+    pass
+
+
+def host_network(ip):
+    """Return the network a host address `ip` is configured in, as Mininet would configure it"""
+    if '/' not in ip:
+        ip = '{ip}/{p}'.format(ip=ip, p=MININET_PREFIX)
+    return ipaddress.ip_interface(ip).network
+
+
+class SubnetAllocator(object):
+    """
+    Allocate host addresses from one subnet per region, and optionally per switch
+
+    Parameters
+    ----------
+    supernet
+        address space to carve subnets from
+    region_prefix
+        prefix length of the subnet of each region
+    switch_prefix
+        prefix length of the subnet of each switch within a region. Use None for one
+        subnet per region
+    """
+    def __init__(self, supernet='10.0.0.0/8', region_prefix=16, switch_prefix=None):
+        self.supernet = ipaddress.ip_network(supernet)
+        self.region_prefix = region_prefix
+        self.switch_prefix = switch_prefix
+
+        if not self.supernet.prefixlen <= region_prefix < self.supernet.max_prefixlen - 1:
+            raise AddressError('Region prefix /{r} does not fit in supernet {s}'.format(r=region_prefix,
+                                                                                         s=self.supernet))
+        if switch_prefix is not None and not region_prefix <= switch_prefix < self.supernet.max_prefixlen - 1:
+            raise AddressError('Switch prefix /{w} does not fit in region prefix /{r}'.format(w=switch_prefix,
+                                                                                               r=region_prefix))
+
+        self.region_subnets = {}  # region to network
+        self.switch_subnets = {}  # (region, switch) to network
+        self.used = set()  # integer addresses in use
+
+        self._region_iter = self.supernet.subnets(new_prefix=region_prefix)
+        self._switch_iter = {}
+        self._next = {}  # network to the next host offset to try
+
+    def reserve(self, ip):
+        """Reserve an explicitly configured address `ip`"""
+        addr = int(ipaddress.ip_interface(ip).ip)
+        if addr in self.used:
+            raise AddressError('IP address {ip} is assigned more than once'.format(ip=ip))
+        self.used.add(addr)
+
+    def subnet(self, region, switch=None):
+        """Return the subnet of `region`, or of `switch` in `region` if per-switch subnets are used"""
+        net = self.region_subnets.get(region)
+        if net is None:
+            net = next(self._region_iter, None)
+            if net is None:
+                raise AddressError('Supernet {s} has no /{p} subnet left for region <{r}>'.format(
+                    s=self.supernet, p=self.region_prefix, r=region))
+            self.region_subnets[region] = net
+            self._switch_iter[region] = net.subnets(new_prefix=self.switch_prefix or self.region_prefix)
+
+        if self.switch_prefix is None or switch is None:
+            return net
+
+        key = (region, switch)
+        sw_net = self.switch_subnets.get(key)
+        if sw_net is None:
+            sw_net = next(self._switch_iter[region], None)
+            if sw_net is None:
+                raise AddressError('Region subnet {n} has no /{p} subnet left for switch <{s}>'.format(
+                    n=net, p=self.switch_prefix, s=switch))
+            self.switch_subnets[key] = sw_net
+        return sw_net
+
+    def allocate(self, region, switch=None):
+        """Return the next free address in the subnet of `region` (and `switch`) as `ip/prefix`"""
+        net = self.subnet(region, switch)
+        base = int(net.network_address)
+        last = int(net.broadcast_address)
+
+        addr = base + self._next.get(net, 1)
+        while addr in self.used:
+            addr += 1
+        if addr >= last:
+            raise AddressError('Subnet {n} is full'.format(n=net))
+
+        self._next[net] = addr - base + 1
+        self.used.add(addr)
+        return '{ip}/{p}'.format(ip=ipaddress.ip_address(addr), p=net.prefixlen)
+
+    def routes(self, hosts, extra=()):
+        """
+        Return the on-link routes each host needs to reach the other subnets
+
+        The destinations are reached directly over layer 2 without a gateway.
+
+        Parameters
+        ----------
+        hosts
+            dictionary of host name to configured address
+        extra
+            additional networks to be reachable from every host
+
+        Returns
+        -------
+        dict
+            host name to the list of destination networks as strings
+        """
+        dests = [self.supernet] if self.region_subnets else []
+        dests.extend(ipaddress.ip_network(x) for x in extra)
+        for ip in hosts.values():
+            net = host_network(ip)
+            if not net.subnet_of(self.supernet) and net not in dests:
+                dests.append(net)
+
+        out = {}
+        for name, ip in hosts.items():
+            own = host_network(ip)
+            out[name] = [str(d) for d in dests if not d.subnet_of(own)]
+        return out
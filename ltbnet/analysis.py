@@ -0,0 +1,111 @@
+"""Delay-weighted path analytics and end-to-end latency budget of PMU streams.
+
+The analysis works on the parsed `Network` only and needs neither Mininet nor root, so
+it can be run with `ltbnet --analyze` before bringing up the emulation.
+"""
+
+import sys
+
+from collections import namedtuple, Counter
+
+from ltbnet.routing import link_graph, shortest_paths, trace
+
+PathInfo = namedtuple('PathInfo', ['pmu', 'pdc', 'nodes', 'links', 'delay', 'bandwidth', 'loss'])
+PathInfo.__doc__ = """PMU-to-PDC path with the propagation delay (s), bottleneck bandwidth (Mbps,
+None if unlimited) and compound loss (%)"""
+
+
+class PathAnalysis(object):
+    """Shortest PMU-to-PDC paths and their link parameters"""
+    def __init__(self, network):
+        self.network = network
+        self.graph = link_graph(network)
+        self.transit = set(network.Switch.idx) | set(network.Router.idx)
+
+        self._trees = {}
+        self._paths = None
+
+    def tree(self, root):
+        """Return the cached shortest-path tree `(dist, prev)` rooted at `root`"""
+        if root not in self._trees:
+            self._trees[root] = shortest_paths(self.graph, root, transit=self.transit)
+        return self._trees[root]
+
+    def link_metrics(self, links):
+        """Return (delay, bottleneck bandwidth, compound loss) along the link positions `links`"""
+        link = self.network.Link
+        delay = sum(link.delay[i] or 0. for i in links)
+
+        bws = [link.bw[i] for i in links if link.bw[i] is not None]
+        bandwidth = min(bws) if bws else None
+
+        keep = 1.
+        for i in links:
+            keep *= 1. - (link.loss[i] or 0.) / 100.
+        loss = (1. - keep) * 100.
+
+        return delay, bandwidth, loss
+
+    def pmu_paths(self):
+        """
+        Return the `PathInfo` of every PMU to the PDC of its region
+
+        One shortest-path tree is computed per PDC and shared by all PMUs of its region.
+        PMUs without a PDC or without a path have `nodes` and `links` set to None.
+        """
+        if self._paths is not None:
+            return self._paths
+
+        pdc_of = self.network.region_pdc()
+        self._paths = []
+
+        for pmu in self.network.PMU.idx:
+            pdc = pdc_of.get(pmu)
+            nodes = links = None
+            if pdc is not None:
+                dist, prev = self.tree(pdc)
+                nodes, links = trace(prev, pdc, pmu)
+
+            if nodes is None:
+                self._paths.append(PathInfo(pmu, pdc, None, None, None, None, None))
+                continue
+
+            nodes.reverse()
+            links.reverse()
+            self._paths.append(PathInfo(pmu, pdc, nodes, links, *self.link_metrics(links)))
+
+        return self._paths
+
+    def link_load(self):
+        """Return a Counter of link position to the number of PMU streams carried"""
+        load = Counter()
+        for path in self.pmu_paths():
+            if path.links:
+                load.update(path.links)
+        return load
+
+    def report(self, file=sys.stdout):
+        """Print the latency budget of every PMU stream and the aggregate load per link"""
+        link = self.network.Link
+        paths = self.pmu_paths()
+
+        def fmt(value, scale=1., spec='{:.2f}'):
+            return '-' if value is None else spec.format(value * scale)
+
+        file.write('{:<20} {:<16} {:>5} {:>10} {:>10} {:>8}\n'.format(
+            'PMU', 'PDC', 'Hops', 'Delay(ms)', 'BW(Mbps)', 'Loss(%)'))
+        for p in paths:
+            file.write('{:<20} {:<16} {:>5} {:>10} {:>10} {:>8}\n'.format(
+                p.pmu, p.pdc or '-', len(p.links) if p.links else '-',
+                fmt(p.delay, 1e3), fmt(p.bandwidth, spec='{:g}'), fmt(p.loss, spec='{:.3f}')))
+
+        reached = [p for p in paths if p.links is not None]
+        file.write('\n{r}/{n} PMUs have a path to their PDC\n'.format(r=len(reached), n=len(paths)))
+        if reached:
+            worst = max(reached, key=lambda p: p.delay)
+            file.write('Largest propagation delay: {d:.2f} ms ({pmu} -> {pdc})\n'.format(
+                d=worst.delay * 1e3, pmu=worst.pmu, pdc=worst.pdc))
+
+        file.write('\n{:<24} {:<16} {:<16} {:>8}\n'.format('Link', 'From', 'To', 'Streams'))
+        for i, count in sorted(self.link_load().items(), key=lambda x: (-x[1], x[0])):
+            file.write('{:<24} {:<16} {:<16} {:>8}\n'.format(link.idx[i], link.fr[i], link.to[i], count))
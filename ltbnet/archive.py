@@ -0,0 +1,237 @@
+"""Columnar archive of aligned PDC snapshots.
+
+An archive is a directory with one memory-mapped file per quantity and chunk. Each
+chunk holds `chunk` rows; a quantity is stored in Fortran order (time x PMU) so that
+the series of one PMU is contiguous. The layout is::
+
+    meta.json               PMUs, fields, chunk size and rate
+    rows                    number of committed rows (int64)
+    index.bin               time of the first row of every chunk (float64)
+    t_000000.bin            row times of chunk 0
+    frequency_000000.bin    frequency of chunk 0, one column per PMU
+    ...
+
+The writer updates `rows` only after the data of a row is in place, so readers in other
+processes can open the archive while it is being written and see whole rows only.
+Range queries locate chunks with the sparse index and rows with a binary search on the
+row times, and return views of the memory maps where possible.
+
+Example::
+
+    writer = ArchiveWriter('run1', npmu=100, fields=('frequency', 'angle'))
+    concentrator.add_callback(writer.feed)
+    ...
+    archive = Archive('run1')
+    t, values = archive.read(t0, t0 + 10, pmus=[3, 4])
+"""
+
+import os
+import json
+import struct
+
+import numpy as np
+
+FORMAT = 1
+CHUNK = 65536
+
+_rows = struct.Struct('<q')
+
+
+def _chunk_file(path, name, k):
+    return os.path.join(path, '{}_{:06d}.bin'.format(name, k))
+
+
+class ArchiveWriter(object):
+    """
+    Append aligned snapshots to an archive directory
+
+    Parameters
+    ----------
+    path
+        archive directory; created if it does not exist and must not hold an archive
+    npmu
+        number of PMUs
+    fields
+        quantities stored per PMU
+    pmus
+        optional PMU names, used by `Archive.columns`
+    chunk
+        rows per chunk file
+    rate
+        optional reporting rate recorded in the metadata
+    """
+    def __init__(self, path, npmu, fields=('frequency',), pmus=None, chunk=CHUNK, rate=None):
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            raise FileExistsError('{} already holds an archive'.format(path))
+        os.makedirs(path, exist_ok=True)
+
+        self.path = path
+        self.npmu = npmu
+        self.fields = tuple(fields)
+        self.chunk = chunk
+        self.rows = 0
+
+        meta = {'format': FORMAT, 'npmu': npmu, 'fields': list(self.fields), 'chunk': chunk, 'rate': rate,
+                'pmus': [str(p) for p in pmus] if pmus is not None else None}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        self._rows = open(os.path.join(path, 'rows'), 'wb')
+        self._rows.write(_rows.pack(0))
+        self._rows.flush()
+        self._index = open(os.path.join(path, 'index.bin'), 'ab')
+
+        self._t = None
+        self._data = {}
+
+    def _open_chunk(self, k, t):
+        self.flush()
+        self._t = np.memmap(_chunk_file(self.path, 't', k), dtype=np.float64, mode='w+', shape=(self.chunk,))
+        self._data = {f: np.memmap(_chunk_file(self.path, f, k), dtype=np.float64, mode='w+',
+                                   shape=(self.chunk, self.npmu), order='F')
+                      for f in self.fields}
+        self._index.write(np.float64(t).tobytes())
+        self._index.flush()
+
+    def append(self, t, values):
+        """Append one row at time `t` with `values`, a dictionary of field to one value per PMU"""
+        k, row = divmod(self.rows, self.chunk)
+        if row == 0:
+            self._open_chunk(k, t)
+
+        self._t[row] = t
+        for f in self.fields:
+            self._data[f][row] = values[f]
+
+        self.rows += 1
+        self._commit()
+
+    def feed(self, snapshot):
+        """`Concentrator` callback appending an aligned snapshot"""
+        self.append(snapshot.t, snapshot.values)
+
+    def _commit(self):
+        self._rows.seek(0)
+        self._rows.write(_rows.pack(self.rows))
+        self._rows.flush()
+
+    def flush(self):
+        """Write the current chunk to disk"""
+        if self._t is not None:
+            self._t.flush()
+            for data in self._data.values():
+                data.flush()
+
+    def close(self):
+        self.flush()
+        self._t = None
+        self._data = {}
+        self._rows.close()
+        self._index.close()
+
+
+class Archive(object):
+    """Read access to an archive directory, which may still be written"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT:
+            raise ValueError('Unsupported archive format {}'.format(meta.get('format')))
+
+        self.npmu = meta['npmu']
+        self.fields = tuple(meta['fields'])
+        self.chunk = meta['chunk']
+        self.rate = meta.get('rate')
+        self.pmus = meta.get('pmus')
+
+        self._maps = {}
+        self.rows = 0
+        self.index = np.zeros(0)
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the committed row count and the chunk index"""
+        with open(os.path.join(self.path, 'rows'), 'rb') as f:
+            self.rows = _rows.unpack(f.read(_rows.size))[0]
+        nchunk = -(-self.rows // self.chunk)
+        self.index = np.fromfile(os.path.join(self.path, 'index.bin'), dtype=np.float64, count=nchunk)
+        return self.rows
+
+    def __len__(self):
+        return self.rows
+
+    def columns(self, pmus):
+        """Return the column numbers of PMU names"""
+        position = {name: i for i, name in enumerate(self.pmus or [])}
+        return [position[str(p)] for p in pmus]
+
+    def _map(self, name, k):
+        key = (name, k)
+        if key not in self._maps:
+            if name == 't':
+                m = np.memmap(_chunk_file(self.path, 't', k), dtype=np.float64, mode='r', shape=(self.chunk,))
+            else:
+                m = np.memmap(_chunk_file(self.path, name, k), dtype=np.float64, mode='r',
+                              shape=(self.chunk, self.npmu), order='F')
+            self._maps[key] = m
+        return self._maps[key]
+
+    def _valid(self, k):
+        """Number of committed rows in chunk `k`"""
+        return min(self.rows - k * self.chunk, self.chunk)
+
+    def time_range(self):
+        """Return the times of the first and last committed rows"""
+        if not self.rows:
+            return None, None
+        last = (self.rows - 1) // self.chunk
+        return float(self.index[0]), float(self._map('t', last)[self._valid(last) - 1])
+
+    def chunks(self, t0=None, t1=None, pmus=None, fields=None):
+        """
+        Yield (t, values) per chunk for the rows with `t0 <= t < t1`
+
+        `values` is a dictionary of field to a (rows x PMUs) array. Both are views of the
+        memory maps if `pmus` is None, a slice or a single column.
+        """
+        fields = self.fields if fields is None else fields
+        if not self.rows:
+            return
+
+        first = 0 if t0 is None else max(int(np.searchsorted(self.index, t0, side='right')) - 1, 0)
+        last = len(self.index) - 1 if t1 is None else int(np.searchsorted(self.index, t1, side='left')) - 1
+
+        for k in range(first, last + 1):
+            n = self._valid(k)
+            t = self._map('t', k)[:n]
+            lo = 0 if t0 is None else int(np.searchsorted(t, t0, side='left'))
+            hi = n if t1 is None else int(np.searchsorted(t, t1, side='left'))
+            if hi <= lo:
+                continue
+
+            values = {}
+            for f in fields:
+                data = self._map(f, k)[lo:hi]
+                values[f] = data if pmus is None else data[:, pmus]
+            yield t[lo:hi], values
+
+    def read(self, t0=None, t1=None, pmus=None, fields=None):
+        """
+        Return (t, values) of the rows with `t0 <= t < t1` for the PMU columns `pmus`
+
+        A range within one chunk is returned as views of the memory maps. A range across
+        chunks is concatenated, copying only the selected rows and PMUs.
+        """
+        fields = self.fields if fields is None else fields
+        parts = list(self.chunks(t0, t1, pmus, fields))
+        if len(parts) == 1:
+            return parts[0]
+
+        if not parts:
+            ncol = self.npmu if pmus is None else len(np.arange(self.npmu)[pmus].reshape(-1))
+            return np.zeros(0), {f: np.zeros((0, ncol)) for f in fields}
+
+        t = np.concatenate([p[0] for p in parts])
+        values = {f: np.concatenate([p[1][f] for p in parts]) for f in fields}
+        return t, values
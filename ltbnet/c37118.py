@@ -0,0 +1,306 @@
+"""IEEE C37.118.2 frame primitives.
+
+Struct-based helpers to recognize, split and timestamp synchrophasor frames without
+building PyPMU frame objects. They are shared by the passive tap and the PDC components.
+"""
+
+import time
+import struct
+
+SYNC = 0xAA
+
+# frame types in bits 4-6 of the second SYNC byte
+DATA = 0
+HEADER = 1
+CFG1 = 2
+CFG2 = 3
+COMMAND = 4
+CFG3 = 5
+
+# SYNC, FRAMESIZE, IDCODE, SOC and FRACSEC
+COMMON = struct.Struct('>BBHHII')
+
+TIME_BASE = 1000000  # MiniPMU `ConfigFrame2` time base
+
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc_ccitt(data, crc=0xFFFF):
+    """Return the CRC-CCITT (polynomial 0x1021, initial 0xFFFF) of `data` used by C37.118"""
+    table = CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+def frame_type(buf, offset=0):
+    """Return the frame type of the frame at `offset`, or None if it does not start with SYNC"""
+    if buf[offset] != SYNC:
+        return None
+    return (buf[offset + 1] >> 4) & 0x7
+
+
+def parse_common(buf, offset=0):
+    """Return (frame type, frame size, IDCODE, SOC, FRACSEC) of the frame at `offset`"""
+    sync, ftype, size, idcode, soc, fracsec = COMMON.unpack_from(buf, offset)
+    return (ftype >> 4) & 0x7, size, idcode, soc, fracsec
+
+
+def timestamp(soc, fracsec, time_base=TIME_BASE):
+    """Return the frame time in seconds from SOC and the fraction-of-second count of FRACSEC"""
+    return soc + (fracsec & 0xFFFFFF) / time_base
+
+
+def split_frames(buf):
+    """
+    Return the complete frames at the start of `buf` and the number of bytes they use
+
+    Parsing stops at the first incomplete frame or at data that does not start with
+    SYNC, so that `buf` can be a stream reassembly buffer.
+    """
+    frames = []
+    offset = 0
+    n = len(buf)
+    while offset + 4 <= n and buf[offset] == SYNC:
+        size = (buf[offset + 2] << 8) | buf[offset + 3]
+        if size < COMMON.size + 2 or offset + size > n:
+            break
+        frames.append(bytes(buf[offset:offset + size]))
+        offset += size
+    return frames, offset
+
+
+def check_crc(frame):
+    """Return True if the CHK field of `frame` matches its contents"""
+    return crc_ccitt(frame[:-2]) == ((frame[-2] << 8) | frame[-1])
+
+
+def cfg_time_base(frame):
+    """Return the TIME_BASE of a configuration frame"""
+    return struct.unpack_from('>I', frame, COMMON.size)[0] & 0xFFFFFF
+
+
+# command codes of command frames
+CMD_STOP = 1
+CMD_START = 2
+CMD_HEADER = 3
+CMD_CFG1 = 4
+CMD_CFG2 = 5
+CMD_CFG3 = 6
+
+# STAT bits
+STAT_CFG_CHANGE = 0x0400
+
+_command = struct.Struct('>BBHHIIH')
+_u16 = struct.Struct('>H')
+
+
+def fracsec_now(time_base=TIME_BASE, t=None):
+    """Return (SOC, FRACSEC) of time `t`, or of the current time"""
+    if t is None:
+        t = time.time()
+    soc = int(t)
+    return soc, int((t - soc) * time_base) & 0xFFFFFF
+
+
+def command_frame(idcode, cmd, t=None):
+    """Return a command frame with command `cmd` for the data stream `idcode`"""
+    soc, fracsec = fracsec_now(t=t)
+    body = _command.pack(SYNC, 0x41, _command.size + 2, idcode, soc, fracsec, cmd)
+    return body + _u16.pack(crc_ccitt(body))
+
+
+class Station(object):
+    """Layout of one PMU data block described by a configuration frame"""
+    def __init__(self, name, idcode, fmt, phnmr, annmr, dgnmr, channels, phunit, anunit, digunit, fnom, cfgcnt):
+        self.name = name
+        self.idcode = idcode
+        self.fmt = fmt
+        self.phnmr = phnmr
+        self.annmr = annmr
+        self.dgnmr = dgnmr
+        self.channels = channels
+        self.phunit = phunit
+        self.anunit = anunit
+        self.digunit = digunit
+        self.fnom = fnom
+        self.cfgcnt = cfgcnt
+
+    @property
+    def polar(self):
+        return bool(self.fmt & 0x1)
+
+    @property
+    def phasor_float(self):
+        return bool(self.fmt & 0x2)
+
+    @property
+    def analog_float(self):
+        return bool(self.fmt & 0x4)
+
+    @property
+    def freq_float(self):
+        return bool(self.fmt & 0x8)
+
+    def struct_format(self):
+        """Return the struct format (without byte order) of the data block"""
+        # integer polar phasors have an unsigned magnitude and a signed angle
+        ph = 'ff' if self.phasor_float else ('Hh' if self.polar else 'hh')
+        fr = 'ff' if self.freq_float else 'hh'
+        an = 'f' if self.analog_float else 'h'
+        return 'H' + ph * self.phnmr + fr + an * self.annmr + 'H' * self.dgnmr
+
+
+class Config(object):
+    """
+    Parsed configuration frame (CFG-1 or CFG-2)
+
+    `data` is a precompiled struct of the data frames described by the configuration,
+    so that a data frame is unpacked with a single call.
+    """
+    def __init__(self, idcode, soc, fracsec, time_base, stations, data_rate):
+        self.idcode = idcode
+        self.soc = soc
+        self.fracsec = fracsec
+        self.time_base = time_base
+        self.stations = stations
+        self.data_rate = data_rate
+        self.data = struct.Struct('>' + ''.join(s.struct_format() for s in stations))
+
+    @property
+    def num_pmu(self):
+        return len(self.stations)
+
+    @property
+    def cfgcnt(self):
+        return tuple(s.cfgcnt for s in self.stations)
+
+    @property
+    def frame_size(self):
+        """Size of the data frames in bytes"""
+        return COMMON.size + self.data.size + 2
+
+
+def _name(raw):
+    return raw.decode('ascii', 'replace').rstrip(' \0')
+
+
+def parse_config(frame):
+    """Return the `Config` of a CFG-1 or CFG-2 frame"""
+    ftype, size, idcode, soc, fracsec = parse_common(frame)
+    time_base, num_pmu = struct.unpack_from('>IH', frame, COMMON.size)
+    offset = COMMON.size + 6
+
+    stations = []
+    for _ in range(num_pmu):
+        name = _name(frame[offset:offset + 16])
+        stn_id, fmt, phnmr, annmr, dgnmr = struct.unpack_from('>HHHHH', frame, offset + 16)
+        offset += 26
+
+        nchannel = phnmr + annmr + 16 * dgnmr
+        channels = [_name(frame[offset + 16 * i:offset + 16 * (i + 1)]) for i in range(nchannel)]
+        offset += 16 * nchannel
+
+        units = struct.unpack_from('>' + 'I' * (phnmr + annmr + dgnmr), frame, offset)
+        offset += 4 * len(units)
+        fnom, cfgcnt = struct.unpack_from('>HH', frame, offset)
+        offset += 4
+
+        stations.append(Station(name, stn_id, fmt, phnmr, annmr, dgnmr, channels,
+                                phunit=units[:phnmr], anunit=units[phnmr:phnmr + annmr],
+                                digunit=units[phnmr + annmr:], fnom=50. if fnom & 0x1 else 60., cfgcnt=cfgcnt))
+
+    data_rate = struct.unpack_from('>h', frame, offset)[0]
+    return Config(idcode, soc, fracsec, time_base & 0xFFFFFF, stations, data_rate)
+
+
+def _signed24(value):
+    value &= 0xFFFFFF
+    return value - 0x1000000 if value & 0x800000 else value
+
+
+def parse_data(frame, cfg):
+    """
+    Return the measurements of a data frame in the layout of PyPMU `DataFrame.get_measurements`
+
+    Frequencies are in Hz and ROCOF in Hz/s. Integer phasors and analogs are scaled with
+    PHUNIT (1e-5 per bit) and ANUNIT.
+    """
+    ftype, size, idcode, soc, fracsec = parse_common(frame)
+    values = cfg.data.unpack_from(frame, COMMON.size)
+
+    pos = 0
+    measurements = []
+    for s in cfg.stations:
+        stat = values[pos]
+        pos += 1
+
+        phasors = []
+        for k in range(s.phnmr):
+            a, b = values[pos], values[pos + 1]
+            pos += 2
+            if not s.phasor_float:
+                scale = (s.phunit[k] & 0xFFFFFF) * 1e-5
+                a, b = (a * scale, b / 1e4) if s.polar else (a * scale, b * scale)
+            phasors.append((a, b))
+
+        freq, dfreq = values[pos], values[pos + 1]
+        pos += 2
+        if not s.freq_float:
+            freq, dfreq = s.fnom + freq / 1000., dfreq / 100.
+
+        analog = list(values[pos:pos + s.annmr])
+        pos += s.annmr
+        if not s.analog_float:
+            analog = [v * _signed24(u) for v, u in zip(analog, s.anunit)]
+
+        digital = list(values[pos:pos + s.dgnmr])
+        pos += s.dgnmr
+
+        measurements.append({'stream_id': s.idcode, 'stat': stat, 'phasors': phasors, 'analog': analog,
+                             'digital': digital, 'frequency': freq, 'rocof': dfreq})
+
+    return {'pmu_id': idcode, 'time': timestamp(soc, fracsec, cfg.time_base), 'measurements': measurements}
+
+
+def _frame(ftype, idcode, soc, fracsec, payload):
+    size = COMMON.size + len(payload) + 2
+    body = COMMON.pack(SYNC, (ftype << 4) | 0x1, size, idcode, soc, fracsec) + payload
+    return body + _u16.pack(crc_ccitt(body))
+
+
+def config_frame(cfg, ftype=CFG2, t=None):
+    """Return the CFG-2 (or CFG-1) frame of `cfg`"""
+    soc, fracsec = fracsec_now(cfg.time_base, t)
+    parts = [struct.pack('>IH', cfg.time_base, cfg.num_pmu)]
+    for s in cfg.stations:
+        parts.append(s.name.encode('ascii')[:16].ljust(16))
+        parts.append(struct.pack('>HHHHH', s.idcode, s.fmt, s.phnmr, s.annmr, s.dgnmr))
+        parts.extend(name.encode('ascii')[:16].ljust(16) for name in s.channels)
+        units = list(s.phunit) + list(s.anunit) + list(s.digunit)
+        parts.append(struct.pack('>' + 'I' * len(units), *units))
+        parts.append(struct.pack('>HH', 1 if s.fnom == 50. else 0, s.cfgcnt))
+    parts.append(struct.pack('>h', cfg.data_rate))
+    return _frame(ftype, cfg.idcode, soc, fracsec, b''.join(parts))
+
+
+def data_frame(cfg, values, t=None):
+    """Return a data frame of `cfg` with the flat field `values` in the order of `cfg.data`"""
+    soc, fracsec = fracsec_now(cfg.time_base, t)
+    return _frame(DATA, cfg.idcode, soc, fracsec, cfg.data.pack(*values))
+
+
+def header_frame(idcode, text, t=None):
+    soc, fracsec = fracsec_now(t=t)
+    return _frame(HEADER, idcode, soc, fracsec, text.encode('ascii'))
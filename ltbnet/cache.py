@@ -0,0 +1,144 @@
+"""Compiled topology cache for fast repeat startup.
+
+A fully set-up :class:`ltbnet.network.Network` (records, Mininet names, assigned IPs and
+link list) is pickled under a key made of the config file hash, the LTBNet version and the
+setup options. Loading a cached network skips parsing and topology building entirely.
+"""
+
+import os
+import time
+import pickle
+import hashlib
+
+from mininet import log
+
+from ltbnet import __version__
+from ltbnet.parser import parse_config
+
+# bump when the pickled layout of `Network` changes without a version change
+CACHE_FORMAT = 4
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ltbnet')
+
+
+def cache_dir():
+    """Return the cache directory, which can be overridden by the `LTBNET_CACHE` variable"""
+    return os.environ.get('LTBNET_CACHE', DEFAULT_CACHE_DIR)
+
+
+def cache_key(file, path='', **options):
+    """Return the hex digest keying the config `file` together with the version and `options`"""
+    h = hashlib.sha1()
+    with open(os.path.join(path, file), 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+
+    h.update('{v}:{fmt}:{opt}'.format(v=__version__, fmt=CACHE_FORMAT,
+                                      opt=sorted(options.items())).encode())
+    return h.hexdigest()
+
+
+def cache_path(key, directory=None):
+    return os.path.join(directory or cache_dir(), key + '.pickle')
+
+
+def build_network(file, path='', **options):
+    """Parse `file` and set up a Network without using the cache"""
+    from ltbnet.network import Network
+
+    config = parse_config(file, path)
+    return Network().setup(config, **options)
+
+
+def load(key, directory=None):
+    """Return the cached Network for `key`, or None on a miss or an unreadable entry"""
+    try:
+        with open(cache_path(key, directory), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warn('*** Ignoring unreadable topology cache <{k}>: {e}\n'.format(k=key, e=e))
+        return None
+
+
+def store(key, network, directory=None):
+    """Write `network` to the cache atomically"""
+    directory = directory or cache_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = cache_path(key, directory)
+        tmp = '{p}.{pid}.tmp'.format(p=path, pid=os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(network, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warn('*** Cannot write topology cache to {d}: {e}\n'.format(d=directory, e=e))
+
+
+def load_network(file, path='', use_cache=True, directory=None, **options):
+    """
+    Return a set-up Network for the config `file`, using the topology cache when possible
+
+    Parameters
+    ----------
+    file
+        config file name
+    path
+        directory of the config file
+    use_cache
+        read from and write to the cache if True
+    directory
+        cache directory. Defaults to `cache_dir()`
+    options
+        keyword arguments passed to `Network.setup`, which are part of the cache key
+
+    Returns
+    -------
+    tuple
+        (network, hit) where `hit` is True if the network was loaded from the cache
+    """
+    if not use_cache:
+        return build_network(file, path, **options), False
+
+    key = cache_key(file, path, **options)
+    network = load(key, directory)
+    if network is not None:
+        log.debug('*** Topology loaded from cache <{k}>\n'.format(k=key))
+        return network, True
+
+    network = build_network(file, path, **options)
+    store(key, network, directory)
+    return network, False
+
+
+def profile(file, path='', directory=None, **options):
+    """
+    Time a cold build (parse and set up) against a warm start through `load_network`
+
+    The cache is written only if it has no entry for the config, so that a valid entry
+    is never replaced.
+
+    Returns
+    -------
+    tuple
+        (cold, warm) elapsed time in seconds
+    """
+    t0 = time.perf_counter()
+    key = cache_key(file, path, **options)
+    network = build_network(file, path, **options)
+    cold = time.perf_counter() - t0
+
+    if not os.path.exists(cache_path(key, directory)):
+        store(key, network, directory)
+
+    t0 = time.perf_counter()
+    _, hit = load_network(file, path, directory=directory, **options)
+    warm = time.perf_counter() - t0
+    if not hit:
+        # the entry was unreadable and has been rebuilt by the first load
+        t0 = time.perf_counter()
+        load_network(file, path, directory=directory, **options)
+        warm = time.perf_counter() - t0
+
+    return cold, warm
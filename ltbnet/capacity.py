@@ -0,0 +1,99 @@
+"""Bandwidth capacity planning of PMU streams over the configured topology.
+
+The bandwidth of a MiniPMU stream is fixed by the data frame size implied by its
+`ConfigFrame2` layout and the reporting rate. Every stream is routed to the PDC of its
+region, and the load on each link is compared against the configured `BW`.
+"""
+
+import sys
+
+from collections import namedtuple
+
+from ltbnet.analysis import PathAnalysis
+from ltbnet.minipmu import DATA_FORMAT, PHASOR_NUM, ANALOG_NUM, DIGITAL_NUM, DATA_RATE
+
+# bytes per frame added by Ethernet (14), IPv4 (20) and TCP with timestamps (32) headers
+OVERHEAD = 14 + 20 + 32
+
+LinkUsage = namedtuple('LinkUsage', ['idx', 'fr', 'to', 'streams', 'load', 'bw', 'utilization', 'headroom'])
+LinkUsage.__doc__ = """Load (Mbps) of the PMU streams on a link against its bandwidth (Mbps, None if
+unlimited). `headroom` is the number of additional streams before saturation"""
+
+
+def data_frame_size(num_pmu=1, data_format=DATA_FORMAT, phasor_num=PHASOR_NUM, analog_num=ANALOG_NUM,
+                    digital_num=DIGITAL_NUM):
+    """Return the size in bytes of a C37.118 data frame with the given layout"""
+    polar, phasor_float, analog_float, freq_float = data_format
+
+    per_pmu = 2  # STAT
+    per_pmu += phasor_num * (8 if phasor_float else 4)
+    per_pmu += 2 * (4 if freq_float else 2)  # FREQ and DFREQ
+    per_pmu += analog_num * (4 if analog_float else 2)
+    per_pmu += digital_num * 2
+
+    # SYNC, FRAMESIZE, IDCODE, SOC, FRACSEC, data blocks and CHK
+    return 14 + num_pmu * per_pmu + 2
+
+
+def stream_bandwidth(data_rate=DATA_RATE, frame_size=None, overhead=OVERHEAD):
+    """Return the bandwidth in Mbps of one PMU stream including protocol overhead"""
+    if frame_size is None:
+        frame_size = data_frame_size()
+    return (frame_size + overhead) * 8 * data_rate / 1e6
+
+
+class CapacityPlan(object):
+    """Per-link load of PMU streams routed to the PDC of their region"""
+    def __init__(self, network, data_rate=DATA_RATE, frame_size=None, analysis=None):
+        self.network = network
+        self.analysis = analysis or PathAnalysis(network)
+        self.stream_bw = stream_bandwidth(data_rate, frame_size)
+
+    def usage(self):
+        """Return the `LinkUsage` of every link that carries PMU streams, most utilized first"""
+        link = self.network.Link
+        out = []
+
+        for i, streams in self.analysis.link_load().items():
+            load = streams * self.stream_bw
+            bw = link.bw[i]
+            utilization = headroom = None
+            if bw:
+                utilization = load / bw
+                headroom = int((bw - load) // self.stream_bw)
+            out.append(LinkUsage(link.idx[i], link.fr[i], link.to[i], streams, load, bw, utilization, headroom))
+
+        out.sort(key=lambda u: (-(u.utilization or 0.), -u.load))
+        return out
+
+    def oversubscribed(self, threshold=1.):
+        """Return the `LinkUsage` of links at or above `threshold` utilization"""
+        return [u for u in self.usage() if u.utilization is not None and u.utilization >= threshold]
+
+    def saturation_factor(self):
+        """Return the factor by which all stream rates can grow before the first link saturates"""
+        factors = [1. / u.utilization for u in self.usage() if u.utilization]
+        return min(factors) if factors else None
+
+    def report(self, file=sys.stdout, warn=0.8):
+        """Print the utilization of every loaded link, marking links above `warn` utilization"""
+        file.write('Stream bandwidth: {b:.4f} Mbps ({f} byte frames + {o} bytes overhead)\n\n'.format(
+            b=self.stream_bw, f=data_frame_size(), o=OVERHEAD))
+        file.write('{:<24} {:<16} {:<16} {:>8} {:>10} {:>9} {:>7} {:>9}\n'.format(
+            'Link', 'From', 'To', 'Streams', 'Load(Mbps)', 'BW(Mbps)', 'Util', 'Headroom'))
+
+        for u in self.usage():
+            flag = ''
+            if u.utilization is not None and u.utilization >= 1.:
+                flag = '  OVERSUBSCRIBED'
+            elif u.utilization is not None and u.utilization >= warn:
+                flag = '  WARNING'
+            file.write('{:<24} {:<16} {:<16} {:>8} {:>10.3f} {:>9} {:>7} {:>9}{}\n'.format(
+                u.idx, u.fr, u.to, u.streams, u.load,
+                '-' if u.bw is None else '{:g}'.format(u.bw),
+                '-' if u.utilization is None else '{:.1%}'.format(u.utilization),
+                '-' if u.headroom is None else u.headroom, flag))
+
+        factor = self.saturation_factor()
+        if factor is not None:
+            file.write('\nThe first link saturates at {f:.2f}x the configured load\n'.format(f=factor))
@@ -0,0 +1,176 @@
+"""Control command channel from PDC applications to the simulator and MiniPMUs.
+
+Commands are DiME variables, such as an ANDES `Event` or a MiniPMU `pmucmd`, whose
+fields are lists. Every command gets a sequence number and the times of detection,
+sending and acknowledgement, so that the detection-to-actuation latency can be
+measured. Commands submitted for the same recipient and variable before `flush` are
+sent as one message with their lists concatenated.
+
+With `ack=True`, the message carries the `seq` list and the `sender` name, and the
+receiver replies with the variable `cmdack` holding `{'seq': [...], 't': time}`, as
+MiniPMU does for `pmucmd`. Receivers take a batch apart with `split`. Receivers that do
+not acknowledge, such as ANDES, are used with `ack=False`.
+
+Example::
+
+    channel = CommandChannel(dimec, 'ISLANDING')
+    channel.send('sim', 'Event', event, t_detect=snapshot.t)
+
+    channel.submit('PMU_1', 'pmucmd', {'record': [1]}, ack=True)
+    channel.submit('PMU_2', 'pmucmd', {'record': [1]}, ack=True)
+    channel.flush()
+    ...
+    if var == 'cmdack':
+        channel.handle_ack(dimec.workspace[var])
+"""
+
+import sys
+import time
+
+from collections import OrderedDict
+
+import numpy as np
+
+ACK_VAR = 'cmdack'
+
+
+class Command(object):
+    """Sequence number, destination and timestamps of one command"""
+    __slots__ = ('seq', 'recipient', 'var', 'payload', 't_detect', 't_send', 't_ack')
+
+    def __init__(self, seq, recipient, var, payload, t_detect):
+        self.seq = seq
+        self.recipient = recipient
+        self.var = var
+        self.payload = payload
+        self.t_detect = t_detect
+        self.t_send = None
+        self.t_ack = None
+
+
+def _length(payload):
+    return max((len(v) if isinstance(v, (list, tuple)) else 1 for v in payload.values()), default=0)
+
+
+def merge(payloads):
+    """
+    Return one command dictionary with the list fields of `payloads` concatenated
+
+    Scalars count as one-element lists. Fields missing from a payload are padded with
+    None so that the fields stay aligned.
+    """
+    payloads = list(payloads)
+    keys = OrderedDict((key, None) for payload in payloads for key in payload)
+    out = {key: [] for key in keys}
+    for payload in payloads:
+        n = _length(payload)
+        for key in keys:
+            value = payload.get(key, [None] * n)
+            out[key].extend(value if isinstance(value, (list, tuple)) else [value])
+    return out
+
+
+def split(data):
+    """Yield the single commands of a merged message, without the None padding, `seq` and `sender`"""
+    fields = {k: v for k, v in data.items() if k not in ('seq', 'sender')}
+    for i in range(_length(fields)):
+        item = {}
+        for key, value in fields.items():
+            value = value[i] if isinstance(value, (list, tuple)) else value
+            if value is not None:
+                item[key] = value
+        yield item
+
+
+def ack(dimec, data, t=None):
+    """Acknowledge a command message `data` received through DiME if it asks for it"""
+    if not isinstance(data, dict) or 'seq' not in data or 'sender' not in data:
+        return False
+    dimec.send_var(data['sender'], ACK_VAR, {'seq': list(data['seq']), 't': time.time() if t is None else t})
+    return True
+
+
+class CommandChannel(object):
+    """
+    Command channel of a DiME client
+
+    Parameters
+    ----------
+    dimec
+        started DiME client
+    name
+        DiME name of the client, to which acknowledgements are sent
+    """
+    def __init__(self, dimec, name):
+        self.dimec = dimec
+        self.name = name
+        self.seq = 0
+        self.commands = {}   # seq -> Command
+        self.pending = OrderedDict()  # (recipient, var, ack) -> [Command]
+
+    def submit(self, recipient, var, payload, t_detect=None, ack=False):
+        """Queue a command until the next `flush` and return its sequence number"""
+        self.seq += 1
+        command = Command(self.seq, recipient, var, payload, time.time() if t_detect is None else t_detect)
+        self.commands[command.seq] = command
+        self.pending.setdefault((recipient, var, ack), []).append(command)
+        return command.seq
+
+    def flush(self):
+        """Send the queued commands, one message per recipient and variable"""
+        batches = list(self.pending.items())
+        self.pending.clear()
+
+        for (recipient, var, ack), commands in batches:
+            message = merge(c.payload for c in commands)
+            if ack:
+                message['seq'] = [c.seq for c in commands]
+                message['sender'] = self.name
+
+            self.dimec.send_var(recipient, var, message)
+            t_send = time.time()
+            for c in commands:
+                c.t_send = t_send
+
+        return len(batches)
+
+    def send(self, recipient, var, payload, t_detect=None, ack=False):
+        """Send one command right away together with the queued ones"""
+        seq = self.submit(recipient, var, payload, t_detect, ack)
+        self.flush()
+        return seq
+
+    def handle_ack(self, data):
+        """Record the acknowledgement `{'seq': [...], 't': time}` of a receiver"""
+        t = data.get('t', time.time())
+        for seq in data.get('seq', []):
+            command = self.commands.get(int(seq))
+            if command is not None and command.t_ack is None:
+                command.t_ack = t
+
+    def latency(self):
+        """
+        Return the latencies in seconds of the sent commands
+
+        Returns
+        -------
+        dict
+            `detect_send`, `send_ack` and `detect_ack` arrays; the last two only cover
+            acknowledged commands
+        """
+        sent = [c for c in self.commands.values() if c.t_send is not None]
+        acked = [c for c in sent if c.t_ack is not None]
+        return {'detect_send': np.array([c.t_send - c.t_detect for c in sent]),
+                'send_ack': np.array([c.t_ack - c.t_send for c in acked]),
+                'detect_ack': np.array([c.t_ack - c.t_detect for c in acked])}
+
+    def report(self, file=sys.stdout):
+        """Print the latency percentiles in milliseconds"""
+        file.write('{:<12} {:>6} {:>9} {:>9} {:>9} {:>9}\n'.format('Latency', 'N', 'P50', 'P95', 'P99', 'Max'))
+        for name, values in self.latency().items():
+            if not len(values):
+                file.write('{:<12} {:>6}\n'.format(name, 0))
+                continue
+            p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1e3
+            file.write('{:<12} {:>6} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}\n'.format(
+                name, len(values), p50, p95, p99, values.max() * 1e3))
@@ -0,0 +1,156 @@
+"""Time-aligning concentrator of PMU measurements.
+
+Measurements are bucketed by their SOC/FRACSEC time into slots of `1 / rate` seconds
+in a preallocated ring of (slot x PMU) NumPy matrices, one per field. A time slice is
+released in time order when every PMU has reported, when a newer slice is complete,
+or when `wait` seconds have passed since its first measurement arrived. Frames that
+arrive after their slice was released, or that are older than the newer slice holding
+their ring row, are counted as late and dropped, and PMUs absent from a released slice
+are counted as missing.
+
+A concentrator can be fed directly by `MultiPdc`::
+
+    conc = Concentrator(len(pdc), rate=30, wait=0.05)
+    conc.add_callback(lambda snap: print(snap.t, np.nanmax(snap.values['frequency'])))
+    pdc.add_callback(conc.feed)
+
+    while True:
+        pdc.poll(0.01)
+        conc.poll()
+"""
+
+import time
+
+from collections import namedtuple
+
+import numpy as np
+
+FIELDS = ('frequency', 'rocof', 'magnitude', 'angle')
+
+Snapshot = namedtuple('Snapshot', ['t', 'values', 'present'])
+Snapshot.__doc__ = """Aligned time slice at time `t`. `values` is a dictionary of field to an array of
+one value per PMU (NaN if missing) and `present` is a boolean array of the PMUs that
+reported. The arrays are views into the ring and are only valid during the callback"""
+
+
+def extract(measurement, fields=FIELDS):
+    """Return the `fields` of the first data block of PyPMU-style `measurements`"""
+    block = measurement['measurements'][0]
+    out = []
+    for field in fields:
+        if field == 'magnitude':
+            out.append(block['phasors'][0][0])
+        elif field == 'angle':
+            out.append(block['phasors'][0][1])
+        else:
+            out.append(block[field])
+    return out
+
+
+class Concentrator(object):
+    """
+    Align PMU measurements by timestamp
+
+    Parameters
+    ----------
+    npmu
+        number of PMUs. Measurements are keyed by the position 0 to `npmu - 1`
+    rate
+        reporting rate in frames per second
+    wait
+        seconds to wait for the slowest PMU after the first measurement of a slice
+    depth
+        number of slices in the ring. Defaults to enough slices for the wait window
+    fields
+        measurement fields to keep, see `FIELDS`
+    """
+    def __init__(self, npmu, rate=30, wait=0.1, depth=None, fields=('frequency', 'rocof')):
+        self.npmu = npmu
+        self.rate = rate
+        self.wait = wait
+        self.depth = depth or max(int(np.ceil(wait * rate)) + 2, 4)
+        self.fields = tuple(fields)
+
+        self.values = {f: np.full((self.depth, npmu), np.nan) for f in self.fields}
+        self.present = np.zeros((self.depth, npmu), dtype=bool)
+        self.tick = np.full(self.depth, -1, dtype=np.int64)
+        self.arrival = np.zeros(self.depth)
+
+        self.received = np.zeros(npmu, dtype=np.int64)
+        self.late = np.zeros(npmu, dtype=np.int64)
+        self.missing = np.zeros(npmu, dtype=np.int64)
+        self.released = None  # last released tick
+        self.slices = 0
+
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        """Call `callback(snapshot)` for every released time slice"""
+        self.callbacks.append(callback)
+
+    def feed(self, key, measurements):
+        """`MultiPdc` callback adding the measurements of PMU `key`"""
+        self.add(key, measurements['time'], extract(measurements, self.fields))
+
+    def add(self, key, t, values, now=None):
+        """Add the measurement `values` (in the order of `fields`) of PMU `key` at time `t`"""
+        tick = int(round(t * self.rate))
+        if self.released is not None and tick <= self.released:
+            self.late[key] += 1
+            return
+
+        row = tick % self.depth
+        if tick < self.tick[row]:
+            # the row holds a newer slice; storing this one would release it out of order
+            self.late[key] += 1
+            return
+        if self.tick[row] != tick:
+            if self.tick[row] >= 0:
+                # the ring is full; make room by releasing everything up to the old slice
+                self.release(self.tick[row])
+            self.tick[row] = tick
+            self.arrival[row] = time.monotonic() if now is None else now
+            self.present[row] = False
+            for f in self.fields:
+                self.values[f][row] = np.nan
+
+        self.received[key] += 1
+        self.present[row, key] = True
+        for f, v in zip(self.fields, values):
+            self.values[f][row, key] = v
+
+        if self.present[row].all():
+            self.release(tick)
+
+    def poll(self, now=None):
+        """Release the slices whose wait window has expired"""
+        now = time.monotonic() if now is None else now
+        expired = (self.tick >= 0) & (self.arrival + self.wait <= now)
+        if expired.any():
+            self.release(self.tick[expired].max())
+
+    def release(self, tick):
+        """Release all pending slices up to and including `tick` in time order"""
+        pending = np.flatnonzero((self.tick >= 0) & (self.tick <= tick))
+        for row in pending[np.argsort(self.tick[pending])]:
+            present = self.present[row]
+            self.missing += ~present
+            values = {f: self.values[f][row] for f in self.fields}
+            snapshot = Snapshot(int(self.tick[row]) / self.rate, values, present)
+            for callback in self.callbacks:
+                callback(snapshot)
+            self.tick[row] = -1
+            self.slices += 1
+
+        if self.released is None or tick > self.released:
+            self.released = tick
+
+    def flush(self):
+        """Release all pending slices"""
+        if (self.tick >= 0).any():
+            self.release(self.tick.max())
+
+    def stats(self):
+        """Return a dictionary of the received, late and missing frame counts per PMU"""
+        return {'received': self.received.copy(), 'late': self.late.copy(), 'missing': self.missing.copy(),
+                'slices': self.slices}
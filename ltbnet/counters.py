@@ -0,0 +1,166 @@
+"""Per-interface traffic counters of switch ports sampled at a high rate.
+
+All counters are read from `/proc/net/dev` in a single read per tick, which covers every
+switch port of the root network namespace. Samples are kept in a preallocated ring
+buffer, so memory is bounded by `rate * window` regardless of the run length.
+"""
+
+import sys
+import time
+import threading
+
+import numpy as np
+
+COUNTERS = ('rx_bytes', 'rx_packets', 'rx_dropped', 'tx_bytes', 'tx_packets', 'tx_dropped')
+
+# positions of `COUNTERS` among the fields of a `/proc/net/dev` line
+_FIELDS = (0, 1, 3, 8, 9, 11)
+
+
+class CounterSampler(object):
+    """
+    Sample the counters of `interfaces` at `rate` Hz into a ring buffer of `window` seconds
+
+    Parameters
+    ----------
+    interfaces
+        interface names, such as `s0-eth1`
+    rate
+        sampling rate in Hz
+    window
+        length of the ring buffer in seconds
+    """
+    def __init__(self, interfaces, rate=100, window=30, path='/proc/net/dev'):
+        self.interfaces = list(interfaces)
+        self.rate = rate
+        self.path = path
+
+        self.capacity = max(int(rate * window), 2)
+        self.t = np.zeros(self.capacity)
+        self.data = np.zeros((self.capacity, len(self.interfaces), len(COUNTERS)), dtype=np.int64)
+        self.count = 0
+
+        self._pos = {name: i for i, name in enumerate(self.interfaces)}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """Take one sample of all interfaces"""
+        row = self.count % self.capacity
+        self.t[row] = time.time()
+        buf = self.data[row]
+
+        with open(self.path) as f:
+            for line in f.readlines()[2:]:
+                name, _, data = line.partition(':')
+                i = self._pos.get(name.strip())
+                if i is None:
+                    continue
+                values = data.split()
+                buf[i] = [int(values[k]) for k in _FIELDS]
+
+        self.count += 1
+
+    def run(self):
+        period = 1. / self.rate
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            self.sample()
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.perf_counter()  # fell behind; do not burst
+
+    def start(self):
+        """Start sampling in a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='ltbnet-counters', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def snapshot(self):
+        """Return (t, data) of the samples in the ring buffer in chronological order"""
+        n = min(self.count, self.capacity)
+        if self.count <= self.capacity:
+            return self.t[:n].copy(), self.data[:n].copy()
+
+        head = self.count % self.capacity
+        order = np.r_[head:self.capacity, 0:head]
+        return self.t[order], self.data[order]
+
+    def dump(self, path):
+        """Write the samples to a NumPy `.npz` file with one array per counter"""
+        t, data = self.snapshot()
+        columns = {name: data[:, :, k] for k, name in enumerate(COUNTERS)}
+        np.savez_compressed(path, t=t, interfaces=np.array(self.interfaces), **columns)
+
+    def rates(self):
+        """
+        Return per-interface throughput in Mbps between consecutive samples
+
+        Returns
+        -------
+        tuple
+            (rx, tx) arrays of shape (samples - 1, interfaces)
+        """
+        t, data = self.snapshot()
+        if len(t) < 2:
+            empty = np.zeros((0, len(self.interfaces)))
+            return empty, empty
+
+        dt = np.diff(t)[:, None]
+        dt[dt <= 0] = np.nan
+        rx = np.diff(data[:, :, COUNTERS.index('rx_bytes')], axis=0) * 8 / dt / 1e6
+        tx = np.diff(data[:, :, COUNTERS.index('tx_bytes')], axis=0) * 8 / dt / 1e6
+        return rx, tx
+
+
+def switch_port_bw(network, net):
+    """
+    Return the switch ports of `net` with the bandwidth of their configured links
+
+    Returns
+    -------
+    list
+        (switch interface name, node name, bandwidth in Mbps or None) tuples
+    """
+    bw = {}
+    for fr, to, b in zip(network.Link.fr, network.Link.to, network.Link.bw):
+        fr = network.to_canonical(fr)
+        to = network.to_canonical(to)
+        bw[(fr, to)] = bw[(to, fr)] = b
+
+    header, rows = network.sw_port_node(net)
+    out = []
+    for idx, sw_name, sw_id, mac, port, sw_intf, node_intf, node_name in rows:
+        out.append((sw_intf, node_name, bw.get((sw_id, node_name))))
+    return out
+
+
+def summarize(sampler, ports, file=sys.stdout):
+    """Print the mean and peak throughput of each port and the peak utilization of its link `BW`"""
+    rx, tx = sampler.rates()
+    file.write('{:<16} {:<16} {:>10} {:>10} {:>10} {:>10} {:>9} {:>7}\n'.format(
+        'Intf', 'Node', 'RX avg', 'RX peak', 'TX avg', 'TX peak', 'BW(Mbps)', 'Util'))
+
+    rows = []
+    for i, (intf, node, bw) in enumerate(ports):
+        if not len(rx):
+            continue
+        rx_avg, rx_max = np.nanmean(rx[:, i]), np.nanmax(rx[:, i])
+        tx_avg, tx_max = np.nanmean(tx[:, i]), np.nanmax(tx[:, i])
+        util = max(rx_max, tx_max) / bw if bw else None
+        rows.append((util or 0., intf, node, rx_avg, rx_max, tx_avg, tx_max, bw, util))
+
+    for util_key, intf, node, rx_avg, rx_max, tx_avg, tx_max, bw, util in sorted(rows, key=lambda r: -r[0]):
+        file.write('{:<16} {:<16} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>9} {:>7}\n'.format(
+            intf, node, rx_avg, rx_max, tx_avg, tx_max,
+            '-' if bw is None else '{:g}'.format(bw),
+            '-' if util is None else '{:.1%}'.format(util)))
@@ -0,0 +1,156 @@
+"""Batch decoding of C37.118 data frames with NumPy structured dtypes.
+
+The configuration frame fixes the layout and size of every data frame of a stream, so
+a run of received frames in one contiguous buffer is a NumPy record array. The
+decoder builds the big-endian structured dtype from a `c37118.Config`, views the
+buffer with `np.frombuffer` and converts all frames at once. CRCs are checked in one
+vectorized pass over the byte columns of the frames.
+
+The decoder is meant for runs of stored or captured frames, such as in
+`benchmarks/decode.py`. The live receive path of `MultiPdc` keeps the per-frame struct
+codec, since a PMU connection usually delivers one frame per read and its callbacks
+take the measurements of one frame.
+"""
+
+import numpy as np
+
+from ltbnet import c37118
+
+CRC_TABLE = np.array(c37118.CRC_TABLE, dtype=np.uint16)
+
+
+def station_dtype(station):
+    """Return the structured dtype of the data block of a `c37118.Station`"""
+    if station.phasor_float:
+        ph = ('phasors', '>f4', (station.phnmr, 2))
+    elif station.polar:
+        # unsigned magnitude and signed angle
+        ph = ('phasors', [('mag', '>u2'), ('ang', '>i2')], (station.phnmr,))
+    else:
+        ph = ('phasors', '>i2', (station.phnmr, 2))
+    fr = '>f4' if station.freq_float else '>i2'
+    an = '>f4' if station.analog_float else '>i2'
+    return np.dtype([('stat', '>u2'),
+                     ph,
+                     ('freq', fr),
+                     ('dfreq', fr),
+                     ('analog', an, (station.annmr,)),
+                     ('digital', '>u2', (station.dgnmr,))])
+
+
+def frame_dtype(cfg):
+    """Return the structured dtype of the data frames of a `c37118.Config`"""
+    fields = [('sync', '>u2'), ('framesize', '>u2'), ('idcode', '>u2'), ('soc', '>u4'), ('fracsec', '>u4')]
+    fields.extend(('pmu{}'.format(i), station_dtype(s)) for i, s in enumerate(cfg.stations))
+    fields.append(('chk', '>u2'))
+    return np.dtype(fields)
+
+
+def crc_ccitt(frames):
+    """Return the CRC-CCITT of every row of a (frames x bytes) uint8 array"""
+    crc = np.full(frames.shape[0], 0xFFFF, dtype=np.uint16)
+    for column in frames.T:
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ column]
+    return crc
+
+
+class Decoder(object):
+    """
+    Decoder of the data frames of one stream
+
+    Parameters
+    ----------
+    cfg
+        `c37118.Config` of the stream
+    """
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.dtype = frame_dtype(cfg)
+        self.frame_size = self.dtype.itemsize
+
+        stations = cfg.stations
+        self.npmu = len(stations)
+        self.phnmr = max([s.phnmr for s in stations] or [0])
+        self.fnom = np.array([s.fnom for s in stations])
+
+        # per-channel scale of integer phasors (PHUNIT is 1e-5 per bit)
+        self.phscale = np.ones((self.npmu, self.phnmr))
+        for i, s in enumerate(stations):
+            if not s.phasor_float:
+                self.phscale[i, :s.phnmr] = [(u & 0xFFFFFF) * 1e-5 for u in s.phunit]
+
+    def count(self, buf):
+        """Return the number of whole frames in `buf`"""
+        return len(buf) // self.frame_size
+
+    def records(self, buf, count=None):
+        """Return the frames in `buf` as a record array without copying"""
+        if count is None:
+            count = self.count(buf)
+        return np.frombuffer(buf, dtype=self.dtype, count=count)
+
+    def check(self, buf, count=None):
+        """Return a boolean array of the frames in `buf` with valid SYNC, FRAMESIZE and CRC"""
+        if count is None:
+            count = self.count(buf)
+        raw = np.frombuffer(buf, dtype=np.uint8, count=count * self.frame_size).reshape(count, self.frame_size)
+        rec = self.records(buf, count)
+        ok = ((rec['sync'] >> 8) == c37118.SYNC) & (((rec['sync'] >> 4) & 0x7) == c37118.DATA)
+        ok &= rec['framesize'] == self.frame_size
+        ok &= crc_ccitt(raw[:, :-2]) == rec['chk']
+        return ok
+
+    def decode(self, buf, count=None, validate=True):
+        """
+        Decode the frames in `buf`
+
+        Returns
+        -------
+        dict
+            `soc`, `fracsec` and `time` of shape (frames,), `stat`, `frequency` (Hz) and
+            `rocof` (Hz/s) of shape (frames, PMUs), `phasors` of shape
+            (frames, PMUs, phasors, 2) as (magnitude, angle) or (real, imaginary) and,
+            if `validate`, the boolean `valid` of shape (frames,)
+        """
+        if count is None:
+            count = self.count(buf)
+        rec = self.records(buf, count)
+
+        soc = rec['soc'].astype(np.int64)
+        fracsec = rec['fracsec'] & 0xFFFFFF
+        out = {'soc': soc,
+               'fracsec': fracsec,
+               'time': soc + fracsec / self.cfg.time_base,
+               'stat': np.empty((count, self.npmu), dtype=np.uint16),
+               'frequency': np.empty((count, self.npmu)),
+               'rocof': np.empty((count, self.npmu)),
+               'phasors': np.full((count, self.npmu, self.phnmr, 2), np.nan)}
+
+        for i, s in enumerate(self.cfg.stations):
+            block = rec['pmu{}'.format(i)]
+            out['stat'][:, i] = block['stat']
+
+            freq = block['freq'].astype(np.float64)
+            dfreq = block['dfreq'].astype(np.float64)
+            if not s.freq_float:
+                freq = s.fnom + freq / 1000.
+                dfreq = dfreq / 100.
+            out['frequency'][:, i] = freq
+            out['rocof'][:, i] = dfreq
+
+            ph = block['phasors']
+            if ph.dtype.names:
+                ph = np.stack((ph['mag'], ph['ang']), axis=-1)
+            ph = ph.astype(np.float64)
+            if not s.phasor_float:
+                scale = self.phscale[i, :s.phnmr]
+                if s.polar:
+                    ph[:, :, 0] *= scale
+                    ph[:, :, 1] /= 1e4
+                else:
+                    ph *= scale[:, None]
+            out['phasors'][:, i, :s.phnmr] = ph
+
+        if validate:
+            out['valid'] = self.check(buf, count)
+        return out
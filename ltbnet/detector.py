@@ -0,0 +1,185 @@
+"""Sliding-window frequency divergence detection over many PMUs.
+
+Frequencies of all PMUs are kept in a (window x PMU) ring. Rolling maxima and minima
+use the van Herk/Gil-Werman scheme vectorized across PMUs: the window is covered by
+the suffix extrema of the previous block and the running prefix extrema of the
+current block, and the suffix extrema are recomputed once per block. Together with a
+running sum for the mean and the sample leaving the window for ROCOF, every update
+costs O(PMUs) regardless of the window length.
+
+PMUs can be assigned to coherency groups, such as their regions. The divergence is
+the spread of the group mean frequencies, or the spread across all PMUs without
+groups. An event is fired with the sample timestamp at which the divergence first
+crossed the threshold once it has stayed above it for `hold` seconds. Divergences
+at or above an optional `glitch` level are taken as measurement glitches and count as
+below the threshold, so they neither fire nor latch an event.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+Event = namedtuple('Event', ['t', 'kind', 'value', 'pmus'])
+Event.__doc__ = """Detected event. `t` is the sample time of the onset, `kind` is `divergence` or
+`rocof`, `value` is the divergence or the largest |ROCOF|, and `pmus` are the columns involved"""
+
+
+def region_groups(network, pmus):
+    """Return the coherency group of each PMU Idx in `pmus` by its region"""
+    region = dict(zip(network.PMU.idx, network.PMU.region))
+    names = sorted({region.get(idx) for idx in pmus}, key=str)
+    code = {name: i for i, name in enumerate(names)}
+    return np.array([code[region.get(idx)] for idx in pmus])
+
+
+class Detector(object):
+    """
+    Frequency divergence detector
+
+    Parameters
+    ----------
+    npmu
+        number of PMUs
+    window
+        window length in samples
+    groups
+        coherency group number of every PMU. Defaults to one group per PMU
+    threshold
+        divergence threshold in the unit of the samples
+    hold
+        seconds the divergence has to stay above `threshold` before an event fires
+    rocof_limit
+        |ROCOF| over the window above which a `rocof` event fires. Disabled if None
+    glitch
+        divergence at or above which a sample is a measurement glitch. Disabled if None
+    """
+    def __init__(self, npmu, window=30, groups=None, threshold=0.4, hold=0., rocof_limit=None, glitch=None):
+        self.npmu = npmu
+        self.window = window
+        self.threshold = threshold
+        self.glitch = glitch
+        self.hold = hold
+        self.rocof_limit = rocof_limit
+
+        self.groups = np.arange(npmu) if groups is None else np.asarray(groups)
+        self.ngroup = int(self.groups.max()) + 1 if npmu else 0
+
+        self.data = np.full((window, npmu), np.nan)
+        self.t = np.full(window, np.nan)
+        self.suffix_max = np.full((window, npmu), np.nan)
+        self.suffix_min = np.full((window, npmu), np.nan)
+        self.prefix_max = np.full(npmu, np.nan)
+        self.prefix_min = np.full(npmu, np.nan)
+        self.total = np.zeros(npmu)
+        self.valid = np.zeros(npmu, dtype=np.int64)
+        self.count = 0
+
+        self.max = self.min = self.mean = self.rocof = np.full(npmu, np.nan)
+        self.group_mean = np.full(self.ngroup, np.nan)
+        self.divergence = np.nan
+
+        self.onset = None      # sample time the divergence crossed the threshold
+        self.active = False    # event fired and condition not cleared yet
+        self.rocof_active = False
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        """Call `callback(event)` for every event"""
+        self.callbacks.append(callback)
+
+    def feed(self, snapshot, field='frequency'):
+        """`Concentrator` callback updating with an aligned snapshot"""
+        return self.update(snapshot.t, snapshot.values[field], snapshot.present)
+
+    def update(self, t, x, present=None):
+        """
+        Add the sample `x` (one value per PMU, NaN if missing) at time `t`
+
+        Returns
+        -------
+        list
+            events fired by this sample
+        """
+        x = np.array(x, dtype=float)
+        if present is not None:
+            x[~present] = np.nan
+
+        w = self.window
+        pos = self.count % w
+        old = self.data[pos]
+        old_t = self.t[pos]
+
+        # running sum for the mean
+        old_ok = ~np.isnan(old)
+        new_ok = ~np.isnan(x)
+        self.total -= np.where(old_ok, old, 0.)
+        self.valid -= old_ok
+        self.total += np.where(new_ok, x, 0.)
+        self.valid += new_ok
+
+        # rate of change against the sample leaving the window
+        self.rocof = (x - old) / (t - old_t) if self.count >= w else np.full(self.npmu, np.nan)
+
+        self.data[pos] = x
+        self.t[pos] = t
+
+        # van Herk/Gil-Werman: prefix of the current block and suffix of the previous block
+        if pos == 0:
+            self.prefix_max = x.copy()
+            self.prefix_min = x.copy()
+        else:
+            np.fmax(self.prefix_max, x, out=self.prefix_max)
+            np.fmin(self.prefix_min, x, out=self.prefix_min)
+
+        if pos == w - 1:
+            self.max = self.prefix_max.copy()
+            self.min = self.prefix_min.copy()
+            self.suffix_max = np.fmax.accumulate(self.data[::-1], axis=0)[::-1]
+            self.suffix_min = np.fmin.accumulate(self.data[::-1], axis=0)[::-1]
+        else:
+            self.max = np.fmax(self.suffix_max[pos + 1], self.prefix_max)
+            self.min = np.fmin(self.suffix_min[pos + 1], self.prefix_min)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = self.total / self.valid
+
+            # group means of the current sample
+            counts = np.bincount(self.groups[new_ok], minlength=self.ngroup)
+            sums = np.bincount(self.groups[new_ok], weights=x[new_ok], minlength=self.ngroup)
+            self.group_mean = sums / counts
+
+        reported = self.group_mean[counts > 0]
+        self.divergence = reported.max() - reported.min() if len(reported) else np.nan
+        self.count += 1
+
+        events = self._check(t)
+        for event in events:
+            for callback in self.callbacks:
+                callback(event)
+        return events
+
+    def _check(self, t):
+        events = []
+
+        if self.divergence >= self.threshold and not (self.glitch is not None and self.divergence >= self.glitch):
+            if self.onset is None:
+                self.onset = t
+            if not self.active and t - self.onset >= self.hold:
+                self.active = True
+                means = np.nan_to_num(self.group_mean, nan=np.nanmean(self.group_mean))
+                groups = (int(np.argmax(means)), int(np.argmin(means)))
+                pmus = np.flatnonzero(np.isin(self.groups, groups))
+                events.append(Event(self.onset, 'divergence', float(self.divergence), pmus))
+        else:
+            self.onset = None
+            self.active = False
+
+        if self.rocof_limit is not None:
+            over = np.flatnonzero(np.abs(np.nan_to_num(self.rocof)) >= self.rocof_limit)
+            if len(over) and not self.rocof_active:
+                self.rocof_active = True
+                events.append(Event(t, 'rocof', float(np.abs(self.rocof[over]).max()), over))
+            elif not len(over):
+                self.rocof_active = False
+
+        return events
@@ -0,0 +1,364 @@
+"""Local stand-in for the DiME server and client.
+
+`Broker` relays variables between named clients over a unix or TCP socket, and
+`LocalDime` implements the part of the `andes_addon.dime.Dime` client used by LTBNet
+(`start`, `exit`, `sync`, `workspace`, `send_var` and `broadcast`). Together with
+`ltbnet.fakesim` they run the MiniPMU and PDC pipeline on one machine without DiME
+or ANDES.
+
+Local addresses start with `local:`. `local:///tmp/ltbnet-dime` is a unix socket, which
+also reaches Mininet hosts since they share the file system, and `local://host:port` is
+a TCP socket. `make_dime` returns a `LocalDime` for local addresses and the DiME client
+otherwise.
+
+Every message is a 4-byte big-endian length followed by a pickled tuple. Values are
+pickled by the sender and relayed by the broker as bytes without unpickling them::
+
+    client -> broker    ('hello', name), ('send', recipient, var, value), ('broadcast', var, value)
+    broker -> client    (var, value)
+
+Messages to names without a connected client are kept until the client connects. The
+last broadcast values of `retain` variables, by default the reset-cycle variables of
+the simulator, are replayed to clients connecting later.
+"""
+
+import os
+import sys
+import time
+import errno
+import pickle
+import socket
+import struct
+import logging
+import argparse
+import selectors
+import threading
+
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'local:'
+ADDRESS = 'local:///tmp/ltbnet-dime'
+RETAIN = ('SysParam', 'Idxvgs', 'Varheader', 'SysName')
+
+_length = struct.Struct('>I')
+
+
+def parse_address(address):
+    """Return (family, address) of a `local:` address"""
+    if not address.startswith(PREFIX + '//'):
+        raise ValueError('Not a local DiME address: {}'.format(address))
+    rest = address[len(PREFIX) + 2:]
+    if rest.startswith('/'):
+        return socket.AF_UNIX, rest
+    host, _, port = rest.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+def make_dime(name, address):
+    """Return a DiME client: `LocalDime` for `local:` addresses and `andes_addon` Dime otherwise"""
+    if address.startswith(PREFIX):
+        return LocalDime(name, address)
+    from andes_addon.dime import Dime
+    return Dime(name, address)
+
+
+def pack(*fields):
+    body = pickle.dumps(fields, protocol=pickle.HIGHEST_PROTOCOL)
+    return _length.pack(len(body)) + body
+
+
+def unpack(buf):
+    """Return (messages, bytes used) of the complete messages at the start of `buf`"""
+    out = []
+    pos = 0
+    while len(buf) - pos >= _length.size:
+        size = _length.unpack_from(buf, pos)[0]
+        end = pos + _length.size + size
+        if end > len(buf):
+            break
+        out.append(pickle.loads(buf[pos + _length.size:end]))
+        pos = end
+    return out, pos
+
+
+class _Peer(object):
+    __slots__ = ('sock', 'name', 'buf', 'out')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.name = None
+        self.buf = bytearray()
+        self.out = bytearray()
+
+
+class Broker(object):
+    """
+    Relay of variables between named local DiME clients
+
+    Parameters
+    ----------
+    address
+        `local:` address to listen on
+    retain
+        variables whose last broadcast value is replayed to new clients
+    backlog
+        messages kept per name without a connected client
+    """
+    def __init__(self, address=ADDRESS, retain=RETAIN, backlog=10000):
+        self.address = address
+        self.retain = set(retain)
+        self.backlog = backlog
+
+        self.family, self.bind = parse_address(address)
+        self.sock = None
+        self.selector = selectors.DefaultSelector()
+        self.peers = {}      # name -> [_Peer]
+        self.pending = {}    # name -> deque of messages
+        self.retained = {}   # var -> message
+        self.messages = 0
+        self._running = False
+        self._thread = None
+
+    def listen(self):
+        if self.family == socket.AF_UNIX and os.path.exists(self.bind):
+            os.unlink(self.bind)
+        self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family != socket.AF_UNIX:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(self.bind)
+        self.sock.listen(64)
+        self.sock.setblocking(False)
+        self.selector.register(self.sock, selectors.EVENT_READ, None)
+        logger.info('DiME broker listening on {}'.format(self.address))
+
+    def _accept(self):
+        sock, _ = self.sock.accept()
+        sock.setblocking(False)
+        if self.family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.selector.register(sock, selectors.EVENT_READ, _Peer(sock))
+
+    def _close(self, peer):
+        self.selector.unregister(peer.sock)
+        peer.sock.close()
+        if peer.name is not None:
+            peers = self.peers.get(peer.name, [])
+            if peer in peers:
+                peers.remove(peer)
+            if not peers:
+                self.peers.pop(peer.name, None)
+
+    def _write(self, peer, message):
+        if not peer.out:
+            try:
+                sent = peer.sock.send(message)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                return
+            message = message[sent:]
+            if not message:
+                return
+            self.selector.modify(peer.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, peer)
+        peer.out += message
+
+    def _flush(self, peer):
+        try:
+            sent = peer.sock.send(peer.out)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close(peer)
+            return
+        del peer.out[:sent]
+        if not peer.out:
+            self.selector.modify(peer.sock, selectors.EVENT_READ, peer)
+
+    def _deliver(self, name, message):
+        peers = self.peers.get(name)
+        if peers:
+            for peer in peers:
+                self._write(peer, message)
+        else:
+            self.pending.setdefault(name, deque(maxlen=self.backlog)).append(message)
+
+    def _handle(self, peer, fields):
+        kind = fields[0]
+        self.messages += 1
+
+        if kind == 'hello':
+            peer.name = fields[1]
+            self.peers.setdefault(peer.name, []).append(peer)
+            for message in self.retained.values():
+                self._write(peer, message)
+            for message in self.pending.pop(peer.name, ()):
+                self._write(peer, message)
+
+        elif kind == 'send':
+            _, recipient, var, value = fields
+            self._deliver(recipient, pack(var, value))
+
+        elif kind == 'broadcast':
+            _, var, value = fields
+            message = pack(var, value)
+            if var in self.retain:
+                self.retained[var] = message
+            for name, peers in list(self.peers.items()):
+                if name != peer.name:
+                    for other in peers:
+                        self._write(other, message)
+
+    def _read(self, peer):
+        try:
+            data = peer.sock.recv(1 << 16)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(peer)
+            return
+        peer.buf += data
+        messages, used = unpack(peer.buf)
+        del peer.buf[:used]
+        for fields in messages:
+            self._handle(peer, fields)
+
+    def poll(self, timeout=0.1):
+        for key, events in self.selector.select(timeout):
+            if key.data is None:
+                self._accept()
+                continue
+            peer = key.data
+            if events & selectors.EVENT_WRITE and peer.out:
+                self._flush(peer)
+            if events & selectors.EVENT_READ and peer.sock.fileno() != -1:
+                self._read(peer)
+
+    def serve_forever(self):
+        if self.sock is None:
+            self.listen()
+        self._running = True
+        while self._running:
+            self.poll()
+        self.close()
+
+    def start(self):
+        """Serve in a daemon thread"""
+        self.listen()
+        self._thread = threading.Thread(target=self.serve_forever, name='ltbnet-dime', daemon=True)
+        self._thread.start()
+
+    def stop(self, linger=0.2):
+        """Stop serving after relaying the messages arriving within `linger` seconds"""
+        time.sleep(linger)
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.bind):
+            os.unlink(self.bind)
+
+
+class LocalDime(object):
+    """Client of a local `Broker` with the interface of the DiME client"""
+    def __init__(self, name, address=ADDRESS):
+        self.name = name
+        self.address = address
+        self.family, self.connect_to = parse_address(address)
+        self.sock = None
+        self.buf = bytearray()
+        self.inbox = deque()
+        self.workspace = {}
+
+    def start(self, timeout=5.):
+        """Connect to the broker, retrying for `timeout` seconds while it starts"""
+        deadline = time.time() + timeout
+        while True:
+            self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+            try:
+                self.sock.connect(self.connect_to)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                self.sock.close()
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.05)
+        if self.family != socket.AF_UNIX:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buf = bytearray()
+        self.inbox.clear()
+        self._send('hello', self.name)
+        return True
+
+    def exit(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _send(self, *fields):
+        self.sock.settimeout(None)
+        self.sock.sendall(pack(*fields))
+
+    def send_var(self, recipient, var_name, value):
+        self._send('send', recipient, var_name, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def broadcast(self, var_name, value):
+        self._send('broadcast', var_name, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _receive(self, timeout):
+        self.sock.settimeout(timeout)
+        try:
+            data = self.sock.recv(1 << 16)
+        except (socket.timeout, BlockingIOError):
+            return
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        if not data:
+            raise ConnectionError('DiME broker closed the connection')
+        self.buf += data
+        messages, used = unpack(self.buf)
+        del self.buf[:used]
+        self.inbox.extend(messages)
+
+    def sync(self, timeout=0.):
+        """
+        Receive one variable into `workspace`
+
+        Returns
+        -------
+        str or False
+            name of the received variable, or False if none arrived within `timeout`
+        """
+        if not self.inbox:
+            self._receive(timeout)
+        if not self.inbox:
+            return False
+        var, value = self.inbox.popleft()
+        self.workspace[var] = pickle.loads(value)
+        return var
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local DiME broker for LTBNet')
+    parser.add_argument('-a', '--address', default=ADDRESS, help='local DiME address to listen on')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+    try:
+        Broker(args.address).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
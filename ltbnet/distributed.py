@@ -0,0 +1,703 @@
+"""Distributed emulation of one LTBNet topology on several worker hosts.
+
+The coordinator sets up the whole `Network` (so that addresses are assigned once and
+consistently), partitions its nodes among the workers, and sends every worker the
+config with its part over plain TCP. Each worker agent (`ltbnet-worker`) sets up the
+same `Network`, starts Mininet with the nodes and links of its part only, and joins
+links cut by the partition with one VXLAN or GRE tunnel per link. Tunnel ends are
+added as ports of the local switch of the link, or of a tunnel switch if the local end
+is a host, and each end carries the delay, bandwidth, loss and jitter of the link.
+Hardware interfaces are added by the worker that runs their switch.
+
+Partitioning methods:
+
+ * `region` assigns whole regions to workers, largest first to the least loaded one
+ * `mincut` merges single-link hosts into their switch, grows parts by breadth-first
+   search, moves nodes out of parts over 5% above the average size and then moves
+   single nodes between parts while that reduces the number of cut links
+
+Messages are JSON objects, one per line, with the reply `{"ok": true, ...}` or
+`{"ok": false, "error": ...}`::
+
+    {"cmd": "hello"}
+    {"cmd": "setup", "config": ..., "format": ".csv", "options": {...}, "part": 0,
+     "nodes": [...], "tunnels": [...], "runpmu": false, "dime": null}
+    {"cmd": "status"}
+    {"cmd": "stop"}
+
+A single Linux box can run the workers in separate network namespaces joined by a
+veth pair, with Linux bridges since Open vSwitch ports cannot cross namespaces::
+
+    ip netns add w1; ip netns add w2
+    ip link add v1 netns w1 type veth peer name v2 netns w2
+    ip -n w1 addr add 10.99.0.1/24 dev v1; ip -n w1 link set v1 up; ip -n w1 link set lo up
+    ip -n w2 addr add 10.99.0.2/24 dev v2; ip -n w2 link set v2 up; ip -n w2 link set lo up
+    ip netns exec w1 ltbnet-worker --listen 10.99.0.1 --switch lxbr &
+    ip netns exec w2 ltbnet-worker --listen 10.99.0.2 --switch lxbr &
+    ip netns exec w1 ltbnet data/config_5pmu.csv --workers 10.99.0.1,10.99.0.2
+"""
+
+import os
+import sys
+import json
+import math
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from collections import namedtuple, deque, Counter
+
+from mininet import log
+
+from ltbnet.cache import build_network
+from ltbnet.parser import format_delay
+
+PORT = 7410
+VNI = 1000       # first VXLAN network identifier or GRE key
+DSTPORT = 4789   # VXLAN UDP port
+DPID = 0x4c54000000  # first datapath ID of tunnel switches
+
+NODES = ('Switch', 'Router', 'PDC', 'PMU')
+
+Tunnel = namedtuple('Tunnel', ['link', 'vni', 'ends', 'parts', 'addresses', 'delay', 'bw', 'loss', 'jitter'])
+Tunnel.__doc__ = """Tunnel of a cut link. `ends` are the node Idx, `parts` the worker of each end and
+`addresses` the tunnel address of each worker. `delay` is in seconds"""
+
+
+def node_records(network):
+    """Return a dictionary of node Idx to (record name, position)"""
+    out = {}
+    for ty in NODES:
+        record = getattr(network, ty)
+        for i, idx in enumerate(record.idx):
+            out[idx] = (ty, i)
+    return out
+
+
+def adjacency(network):
+    """Return a dictionary of node Idx to the list of its link neighbors"""
+    adj = {idx: [] for idx in node_records(network)}
+    for fr, to in zip(network.Link.fr, network.Link.to):
+        if fr in adj and to in adj and fr != to:
+            adj[fr].append(to)
+            adj[to].append(fr)
+    return adj
+
+
+def by_region(network, k):
+    """Assign whole regions to `k` parts, the largest regions first to the least loaded part"""
+    members = {}
+    for idx, (ty, i) in node_records(network).items():
+        members.setdefault(getattr(network, ty).region[i], []).append(idx)
+    if len(members) < k:
+        raise ValueError('{r} region(s) cannot be split into {k} parts; use the mincut method'.format(
+            r=len(members), k=k))
+
+    load = [0] * k
+    part = {}
+    for region in sorted(members, key=lambda r: (-len(members[r]), str(r))):
+        p = load.index(min(load))
+        for idx in members[region]:
+            part[idx] = p
+        load[p] += len(members[region])
+    return part
+
+
+def grow(adj, weight, k):
+    """Grow `k` parts one after the other by breadth-first search, each up to an equal share
+    of the weight left. Nodes that do not fit are left to the later parts"""
+    part = {}
+    left = sum(weight.values())
+    seeds = iter(adj)
+    for p in range(k):
+        if p == k - 1:
+            for v in adj:
+                part.setdefault(v, p)
+            break
+
+        target = left / (k - p)
+        load = 0
+        seen = set()
+        queue = deque()
+        while load < target:
+            if not queue:
+                start = next((v for v in seeds if v not in part), None)
+                if start is None:
+                    break
+                queue.append(start)
+                seen.add(start)
+            v = queue.popleft()
+            if load + weight[v] > target and load:
+                continue
+            part[v] = p
+            load += weight[v]
+            for w in adj[v]:
+                if w not in part and w not in seen:
+                    seen.add(w)
+                    queue.append(w)
+        left -= load
+        seeds = iter(adj)
+    return part
+
+
+def rebalance(adj, weight, part, k, cap):
+    """Move nodes out of parts heavier than `cap`, those cutting the fewest links first, to
+    parts with room, and give every empty part a node of the largest one. Return the part
+    sizes"""
+    part_size = [0] * k
+    for v, p in part.items():
+        part_size[p] += weight[v]
+
+    for _ in range(k):
+        over = [p for p in range(k) if part_size[p] > cap]
+        if not over:
+            break
+        for p in over:
+            moves = []
+            for v in adj:
+                if part[v] != p:
+                    continue
+                links = [0] * k
+                for w in adj[v]:
+                    links[part[w]] += 1
+                for q in range(k):
+                    if q != p:
+                        moves.append((links[p] - links[q], -links[q], v, q))
+            moves.sort(key=lambda m: m[:2])
+            for _, _, v, q in moves:
+                if part_size[p] <= cap:
+                    break
+                if part[v] == p and part_size[q] + weight[v] <= cap:
+                    part[v] = q
+                    part_size[p] -= weight[v]
+                    part_size[q] += weight[v]
+
+    for q in range(k):
+        if part_size[q]:
+            continue
+        p = part_size.index(max(part_size))
+        moves = [(sum(part[w] == p for w in adj[v]), v) for v in adj
+                 if part[v] == p and weight[v] < part_size[p]]
+        if moves:
+            v = min(moves)[1]
+            part[v] = q
+            part_size[p] -= weight[v]
+            part_size[q] += weight[v]
+    return part_size
+
+
+def cut_size(adj, part):
+    return sum(part[v] != part[w] for v in adj for w in adj[v]) // 2
+
+
+def refine(adj, weight, part, k, cap, passes=10):
+    """Move single nodes to the part holding most of their neighbors while that cuts fewer
+    links, keeps the weight of every part within `cap` and leaves no part empty"""
+    part = dict(part)
+    size = [0] * k
+    for v, p in part.items():
+        size[p] += weight[v]
+
+    for _ in range(passes):
+        moved = 0
+        for v in adj:
+            p = part[v]
+            if size[p] == weight[v]:
+                continue
+            links = [0] * k
+            for w in adj[v]:
+                links[part[w]] += 1
+            best, gain = p, 0
+            for q in range(k):
+                if q != p and size[q] + weight[v] <= cap and links[q] - links[p] > gain:
+                    best, gain = q, links[q] - links[p]
+            if best != p:
+                part[v] = best
+                size[p] -= weight[v]
+                size[best] += weight[v]
+                moved += 1
+        if not moved:
+            break
+    return part
+
+
+def min_cut(network, k, passes=10, imbalance=0.05):
+    """
+    Partition the nodes into `k` parts of at most (1 + `imbalance`) times the average
+    size with few cut links
+
+    Nodes with a single link, such as PMUs, are first merged into their neighbor up to
+    the size limit, and the merged nodes are weighted by the number of nodes they hold.
+    Parts grown by breadth-first search and, if it is balanced enough, the region
+    assignment are brought within the limit by `rebalance` and refined with `refine`,
+    and the one with fewer cut links is kept. If the merged nodes cannot be packed
+    within the limit, or into `k` parts, the parts are rebalanced and refined once more
+    node by node.
+    """
+    adj = adjacency(network)
+    n = len(adj)
+    cap = max(int(math.ceil(n / k * (1 + imbalance))), 1)
+
+    owner = {}
+    weight = {v: 1 for v in adj}
+    for v, neighbors in adj.items():
+        if len(neighbors) == 1 and len(adj[neighbors[0]]) > 1:
+            o = neighbors[0]
+            if weight[o] < cap:
+                owner[v] = o
+                weight[o] += 1
+    for v in owner:
+        del weight[v]
+    core = {v: [w for w in neighbors if w not in owner] for v, neighbors in adj.items() if v not in owner}
+
+    starts = [grow(core, weight, k)]
+    if len(set(network.Region.idx)) >= k:
+        region = by_region(network, k)
+        if max(Counter(region.values()).values()) <= cap:
+            starts.append({v: region[v] for v in core})
+
+    best = None
+    for start in starts:
+        part = dict(start)
+        size = rebalance(core, weight, part, k, cap)
+        part = refine(core, weight, part, k, max(cap, max(size)), passes)
+        key = (max(size) > cap or not min(size), cut_size(core, part))
+        if best is None or key < best[0]:
+            best = (key, part)
+
+    part = best[1]
+    for v, o in owner.items():
+        part[v] = part[o]
+
+    if best[0][0]:
+        single = {v: 1 for v in adj}
+        rebalance(adj, single, part, k, cap)
+        part = refine(adj, single, part, k, cap, passes)
+    return part
+
+
+METHODS = {'region': by_region, 'mincut': min_cut}
+
+
+class Partition(object):
+    """Assignment of the nodes of a Network to `k` workers"""
+    def __init__(self, network, k, method='region'):
+        self.network = network
+        self.k = k
+        self.method = method
+        self.part = METHODS[method](network, k)
+
+        empty = set(range(k)) - set(self.part.values())
+        if empty:
+            raise ValueError('{e} of {k} parts are empty; use fewer workers'.format(e=len(empty), k=k))
+
+        link = network.Link
+        self.cut = [i for i, (fr, to) in enumerate(zip(link.fr, link.to))
+                    if fr in self.part and to in self.part and self.part[fr] != self.part[to]]
+
+    def nodes(self, p):
+        return [idx for idx, q in self.part.items() if q == p]
+
+    def report(self, file=sys.stdout):
+        sizes = [0] * self.k
+        for p in self.part.values():
+            sizes[p] += 1
+        file.write('Partition ({m}) of {n} nodes into {k} parts: sizes {s}, {c} cut link(s) of {l}\n'.format(
+            m=self.method, n=len(self.part), k=self.k, s=sizes, c=len(self.cut), l=self.network.Link.n))
+
+
+def plan_tunnels(partition, addresses, base=VNI):
+    """Return the `Tunnel` of every cut link given the tunnel address of each worker"""
+    link = partition.network.Link
+    out = []
+    for n, i in enumerate(partition.cut):
+        ends = (link.fr[i], link.to[i])
+        parts = tuple(partition.part[e] for e in ends)
+        out.append(Tunnel(link.idx[i], base + n, ends, parts, tuple(addresses[p] for p in parts),
+                          link.delay[i], link.bw[i], link.loss[i], link.jitter[i]))
+    return out
+
+
+def _run(*args):
+    subprocess.check_call(['ip'] + [str(a) for a in args])
+
+
+def tunnel_name(kind, vni):
+    return '{}{}'.format('vx' if kind == 'vxlan' else 'gt', vni)
+
+
+def create_tunnel(kind, vni, local, remote):
+    """Create and bring up the tunnel interface to `remote` and return its name"""
+    name = tunnel_name(kind, vni)
+    if kind == 'vxlan':
+        _run('link', 'add', name, 'type', 'vxlan', 'id', vni, 'local', local, 'remote', remote,
+             'dstport', DSTPORT)
+    elif kind == 'gretap':
+        _run('link', 'add', name, 'type', 'gretap', 'local', local, 'remote', remote, 'key', vni)
+    else:
+        raise ValueError('Unknown tunnel type {}'.format(kind))
+    _run('link', 'set', name, 'up')
+    return name
+
+
+def delete_tunnel(name):
+    subprocess.call(['ip', 'link', 'del', name], stderr=subprocess.DEVNULL)
+
+
+def part_topo(network, nodes, tunnels, part):
+    """
+    Return a Mininet Topo with the `nodes` of `network` and the links between them, and
+    the local switch of every tunnel of `part`
+
+    Returns
+    -------
+    tuple
+        (topo, {tunnel vni: switch name})
+    """
+    from mininet.topo import Topo
+
+    nodes = set(nodes)
+    records = node_records(network)
+    topo = Topo()
+
+    for idx in nodes:
+        ty, i = records[idx]
+        record = getattr(network, ty)
+        if ty == 'Switch':
+            topo.addSwitch(record.mn_name[i], dpid=record.mac[i])
+        else:
+            topo.addHost(record.mn_name[i], ip=record.ip[i], mac=record.mac[i])
+
+    added = set()
+    link = network.Link
+    for fr, to, delay, bw, loss, jitter in zip(link.fr, link.to, link.delay, link.bw, link.loss, link.jitter):
+        if fr not in nodes or to not in nodes:
+            continue
+        fr, to = network.to_canonical(fr), network.to_canonical(to)
+        if (fr, to) in added or (to, fr) in added:
+            continue
+        topo.addLink(fr, to, delay=format_delay(delay), bw=bw, loss=loss if loss else None, jitter=jitter)
+        added.add((fr, to))
+
+    switch_of = {}
+    for t in tunnels:
+        if part not in t.parts:
+            continue
+        local = t.ends[t.parts.index(part)]
+        if records[local][0] == 'Switch':
+            switch_of[t.vni] = network.to_canonical(local)
+        else:
+            name = 'x{}'.format(t.vni)
+            topo.addSwitch(name, dpid='{:016x}'.format(DPID + t.vni))
+            topo.addLink(network.to_canonical(local), name)
+            switch_of[t.vni] = name
+    return topo, switch_of
+
+
+class Worker(object):
+    """
+    Worker agent emulating one part of a distributed topology
+
+    Parameters
+    ----------
+    address
+        address of this host used for tunnels
+    switch
+        `ovs` for Open vSwitch with the default controller, or `lxbr` for Linux bridges
+    """
+    def __init__(self, address, switch='ovs'):
+        self.address = address
+        self.switch = switch
+        self.network = None
+        self.net = None
+        self.tunnels = []
+        self.nodes = []
+        self.procs = []
+
+    def hello(self, msg):
+        return {'address': self.address, 'host': socket.gethostname(), 'switch': self.switch}
+
+    def setup(self, msg):
+        """Start the part in `msg`, replacing any running part. Everything started is torn
+        down again if the setup fails"""
+        if self.net is not None or self.tunnels:
+            self.stop(msg)
+        try:
+            return self._setup(msg)
+        except BaseException:
+            self.stop(msg)
+            raise
+
+    def _setup(self, msg):
+        from mininet.net import Mininet
+        from mininet.link import TCLink, TCIntf
+        from mininet.node import DefaultController
+        from mininet.nodelib import LinuxBridge
+
+        fd, path = tempfile.mkstemp(suffix=msg['format'], prefix='ltbnet-part-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(msg['config'])
+        try:
+            options = dict(msg.get('options') or {})
+            options['routes'] = tuple(options.get('routes', ()))
+            self.network = build_network(path, **options)
+        finally:
+            os.unlink(path)
+
+        part = msg['part']
+        self.nodes = msg['nodes']
+        tunnels = [Tunnel(*t) for t in msg['tunnels']]
+        topo, switch_of = part_topo(self.network, self.nodes, tunnels, part)
+
+        if self.switch == 'lxbr':
+            self.net = Mininet(topo=topo, link=TCLink, switch=LinuxBridge, controller=None)
+        else:
+            self.net = Mininet(topo=topo, link=TCLink, controller=DefaultController)
+
+        kind = msg.get('tunnel', 'vxlan')
+        for t in tunnels:
+            if part not in t.parts:
+                continue
+            side = t.parts.index(part)
+            name = create_tunnel(kind, t.vni, self.address, t.addresses[1 - side])
+            self.tunnels.append(name)
+            delay = format_delay(t.delay) if t.delay else None
+            TCIntf(name, node=self.net.get(switch_of[t.vni]), delay=delay, bw=t.bw, loss=t.loss, jitter=t.jitter)
+
+        if self.network.HwIntf.n:
+            self.network.add_hw_intf(self.net, nodes=set(self.nodes))
+        if self.network.TCHwIntf.n:
+            self.network.add_tc_hw_intf(self.net, nodes=set(self.nodes))
+
+        self.net.start()
+        self.network.add_routes(self.net, hosts=set(self.network.to_canonical(idx) for idx in self.nodes))
+
+        if msg.get('runpmu'):
+            self.procs += self.network.PMU.run_pmu(self.net, dime_address=msg.get('dime'), nodes=set(self.nodes))
+            self.procs += self.network.PDC.run_pdc(self.net, self.network, nodes=set(self.nodes))
+
+        log.info('*** Part {p} running with {n} nodes and {t} tunnels\n'.format(
+            p=part, n=len(self.nodes), t=len(self.tunnels)))
+        return {'nodes': len(self.nodes), 'tunnels': len(self.tunnels)}
+
+    def status(self, msg):
+        return {'running': self.net is not None, 'nodes': len(self.nodes), 'tunnels': len(self.tunnels)}
+
+    def stop(self, msg):
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        self.procs = []
+        if self.net is not None:
+            self.net.stop()
+            self.net = None
+        for name in self.tunnels:
+            delete_tunnel(name)
+        self.tunnels = []
+        self.nodes = []
+        return {}
+
+    def handle(self, msg):
+        handler = {'hello': self.hello, 'setup': self.setup, 'status': self.status, 'stop': self.stop}.get(msg.get('cmd'))
+        if handler is None:
+            return {'ok': False, 'error': 'unknown command {}'.format(msg.get('cmd'))}
+        try:
+            reply = handler(msg)
+        except (Exception, SystemExit) as e:
+            # Mininet exits when its runtime is missing, which must not stop the agent
+            if isinstance(e, SystemExit):
+                error = 'Mininet exited with status {}; see the worker log'.format(e.code)
+            else:
+                error = '{}: {}'.format(type(e).__name__, e)
+            log.error('*** {c} failed: {e}\n'.format(c=msg.get('cmd'), e=error))
+            return {'ok': False, 'error': error}
+        reply['ok'] = True
+        return reply
+
+    def serve(self, host='0.0.0.0', port=PORT):
+        """Handle the connections of coordinators one at a time until interrupted"""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, port))
+        server.listen(4)
+        log.info('*** Worker listening on {h}:{p}\n'.format(h=host, p=port))
+        try:
+            while True:
+                conn, addr = server.accept()
+                with conn, conn.makefile('rw') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            reply = self.handle(json.loads(line))
+                        except ValueError as e:
+                            reply = {'ok': False, 'error': 'invalid message: {}'.format(e)}
+                        f.write(json.dumps(reply) + '\n')
+                        f.flush()
+        finally:
+            self.stop({})
+            server.close()
+
+
+class WorkerClient(object):
+    """Coordinator connection to one worker"""
+    def __init__(self, host, port=PORT, timeout=10.):
+        self.host = host
+        self.port = port
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(None)
+        self.file = self.sock.makefile('rw')
+
+    def request(self, cmd, **fields):
+        fields['cmd'] = cmd
+        self.file.write(json.dumps(fields) + '\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('worker {h}:{p} closed the connection'.format(h=self.host, p=self.port))
+        reply = json.loads(line)
+        if not reply.get('ok'):
+            raise RuntimeError('worker {h}:{p}: {e}'.format(h=self.host, p=self.port, e=reply.get('error')))
+        return reply
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def parse_workers(text):
+    """Parse `host[:port],host[:port]` into a list of (host, port)"""
+    out = []
+    for item in text.split(','):
+        host, _, port = item.strip().partition(':')
+        out.append((host, int(port) if port else PORT))
+    return out
+
+
+class Coordinator(object):
+    """
+    Partition a topology and run it on worker agents
+
+    Parameters
+    ----------
+    file
+        config file
+    workers
+        list of (host, port) of the worker agents
+    method
+        partitioning method, `region` or `mincut`
+    tunnel
+        `vxlan` or `gretap`
+    options
+        keyword arguments of `Network.setup`
+    """
+    def __init__(self, file, workers, method='region', tunnel='vxlan', options=None, runpmu=False, dime=None,
+                 network=None):
+        self.file = file
+        self.workers = workers
+        self.method = method
+        self.tunnel = tunnel
+        self.options = dict(options or {})
+        if self.options.get('gateways'):
+            raise ValueError('Gateways between regions are not supported on workers')
+        self.runpmu = runpmu
+        self.dime = dime
+
+        self.network = network if network is not None else build_network(file, **self.options)
+        self.partition = Partition(self.network, len(workers), method)
+        self.clients = []
+        self.tunnels = []
+
+    def _each(self, func):
+        """Call `func(part, client)` for all workers in parallel and raise the first error"""
+        errors = []
+
+        def call(p, client):
+            try:
+                func(p, client)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call, args=(p, c)) for p, c in enumerate(self.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+
+    def start(self):
+        self.clients = [WorkerClient(host, port) for host, port in self.workers]
+        addresses = [c.request('hello')['address'] for c in self.clients]
+        self.tunnels = plan_tunnels(self.partition, addresses)
+
+        with open(self.file) as f:
+            config = f.read()
+        options = dict(self.options)
+        options['routes'] = list(options.get('routes', ()))
+        fmt = os.path.splitext(self.file)[1]
+
+        def setup(p, client):
+            client.request('setup', config=config, format=fmt, options=options, part=p,
+                           nodes=self.partition.nodes(p), tunnels=[list(t) for t in self.tunnels],
+                           tunnel=self.tunnel, runpmu=self.runpmu, dime=self.dime)
+
+        try:
+            self._each(setup)
+        except Exception:
+            self.stop()
+            raise
+
+    def status(self):
+        return [c.request('status') for c in self.clients]
+
+    def stop(self):
+        for client in self.clients:
+            try:
+                client.request('stop')
+            except (OSError, RuntimeError) as e:
+                log.warn('*** Stopping worker {h} failed: {e}\n'.format(h=client.host, e=e))
+            client.close()
+        self.clients = []
+
+    def report(self, file=sys.stdout):
+        self.partition.report(file)
+        for p, (host, port) in enumerate(self.workers):
+            file.write('  part {p} on {h}:{o}: {n} nodes\n'.format(p=p, h=host, o=port, n=len(self.partition.nodes(p))))
+        for t in self.tunnels:
+            file.write('  tunnel {v} for link <{l}>: {a} ({pa}) - {b} ({pb})\n'.format(
+                v=t.vni, l=t.link, a=t.ends[0], pa=t.addresses[0], b=t.ends[1], pb=t.addresses[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LTBNet distributed emulation worker agent')
+    parser.add_argument('--listen', default='0.0.0.0', help='address to listen on for the coordinator')
+    parser.add_argument('--port', type=int, default=PORT, help='TCP port to listen on')
+    parser.add_argument('--address', help='local tunnel address; defaults to the listen address')
+    parser.add_argument('--switch', choices=('ovs', 'lxbr'), default='ovs',
+                        help='switch type: Open vSwitch, or Linux bridges for workers in network namespaces')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    if args.verbose:
+        log.setLogLevel('info')
+
+    address = args.address or args.listen
+    if address == '0.0.0.0':
+        parser.error('--address is required when listening on all interfaces')
+
+    try:
+        Worker(address, args.switch).serve(args.listen, args.port)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
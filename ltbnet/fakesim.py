@@ -0,0 +1,189 @@
+"""Fake ANDES publisher for running LTBNet without a simulator.
+
+`FakeSimulator` connects to DiME as `sim`, broadcasts the reset-cycle variables
+`SysParam`, `Idxvgs`, `Varheader` and `SysName` of an N-bus system, and then
+broadcasts `pmudata` at a fixed rate in the layout expected by MiniPMU: voltage
+magnitudes, angles and frequencies (pu) of all buses. Modules that send a dictionary
+with `vgsvaridx` (1-based indices into `Varheader`), like the islanding application,
+also receive `Varvgs` with those variables.
+
+Bus frequencies follow a common slow oscillation with optional noise. The buses are
+split into two areas; after an `Event` is received, or at `event_time`, the area
+frequencies drift apart by `split` pu. Received events are acknowledged through
+`ltbnet.command` when they ask for it.
+
+Example with the local DiME broker::
+
+    ltbnet-fakesim -n 10 --rate 30 --broker
+    minipmu -a local:///tmp/ltbnet-dime 1410 1
+"""
+
+import sys
+import time
+import logging
+import argparse
+
+from math import pi
+
+import numpy as np
+
+from ltbnet import command
+from ltbnet.dime import ADDRESS, Broker, make_dime
+
+logger = logging.getLogger(__name__)
+
+
+class FakeSimulator(object):
+    """
+    Publisher of synthetic ANDES variables
+
+    Parameters
+    ----------
+    address
+        DiME address
+    nbus
+        number of buses, each with one PMU
+    rate
+        `pmudata` rate in Hz
+    fn
+        nominal frequency in Hz
+    vn
+        nominal bus voltage in kV
+    noise
+        standard deviation of the noise added to frequencies in pu
+    split
+        frequency difference between the two areas after an event in pu
+    event_time
+        simulation time of an event applied without a received `Event`. Disabled if None
+    seed
+        seed of the noise
+    """
+    def __init__(self, address=ADDRESS, nbus=10, rate=30, fn=60, vn=230., noise=0., split=2e-5,
+                 event_time=None, seed=None, name='sim'):
+        self.address = address
+        self.nbus = nbus
+        self.rate = rate
+        self.fn = fn
+        self.vn = vn
+        self.noise = noise
+        self.split = split
+        self.event_time = event_time
+        self.name = name
+
+        self.random = np.random.RandomState(seed)
+        self.dimec = make_dime(name, address)
+
+        self.area = np.arange(nbus) >= nbus // 2
+        self.phase = np.linspace(0, pi / 6, nbus)
+        self.subscribers = {}  # module name -> 0-based indices into the variables
+        self.events = []
+        self.t = 0.
+        self.count = 0
+
+    def reset_vars(self):
+        """Return the reset-cycle variables of the system"""
+        n = self.nbus
+        idx = np.arange(1, n + 1)
+        names = ['Bus_{}'.format(i) for i in idx]
+
+        # MiniPMU looks up the bus rows by their 1-based idx
+        sys_param = {'Bus': {int(i): [int(i), self.vn, 1.0, 0.0] for i in idx}}
+        idxvgs = {'Pmu': {'vm': idx.reshape(1, -1), 'am': (n + idx).reshape(1, -1)},
+                  'Bus': {'w_Busfreq': (2 * n + idx).reshape(1, -1)}}
+        varheader = ['V {}'.format(b) for b in names] + ['theta {}'.format(b) for b in names] + \
+                    ['w {}'.format(b) for b in names]
+        return {'SysParam': sys_param, 'Idxvgs': idxvgs, 'Varheader': varheader, 'SysName': {'Bus': names}}
+
+    def values(self, t):
+        """Return the (1 x 3 nbus) variables at time `t`"""
+        vm = 1 + 0.01 * np.sin(2 * pi * 0.1 * t + self.phase)
+        am = 0.2 * np.sin(2 * pi * 0.05 * t) + self.phase
+        w = 1 + 1e-4 * np.sin(2 * pi * 0.2 * t) * np.ones(self.nbus)
+
+        if self.event_time is not None and t >= self.event_time:
+            drift = self.split / 2 * (1 - np.exp(-(t - self.event_time)))
+            w += np.where(self.area, drift, -drift)
+        if self.noise:
+            w += self.random.normal(0, self.noise, self.nbus)
+
+        return np.concatenate([vm, am, w]).reshape(1, -1)
+
+    def handle(self, var):
+        data = self.dimec.workspace[var]
+        if var == 'Event':
+            self.events.append((self.t, data))
+            if self.event_time is None:
+                self.event_time = self.t
+            command.ack(self.dimec, data)
+            logger.info('Event at t={:.3f}: {}'.format(self.t, data))
+        elif isinstance(data, dict) and 'vgsvaridx' in data:
+            self.subscribers[var] = np.asarray(data['vgsvaridx'], dtype=int).reshape(-1) - 1
+            logger.info('{} subscribed to {} variables'.format(var, len(self.subscribers[var])))
+
+    def step(self):
+        """Publish the variables of the next time step"""
+        self.t = self.count / self.rate
+        values = self.values(self.t)
+
+        self.dimec.broadcast('pmudata', {'t': self.t, 'vars': values})
+        for module, idx in self.subscribers.items():
+            self.dimec.send_var(module, 'Varvgs', {'t': self.t, 'vars': values[:, idx]})
+        self.count += 1
+
+    def run(self, duration=None):
+        """Publish in real time for `duration` seconds, or until interrupted"""
+        self.dimec.start()
+        for var, value in self.reset_vars().items():
+            self.dimec.broadcast(var, value)
+
+        start = time.monotonic()
+        try:
+            while duration is None or self.count < duration * self.rate:
+                while True:
+                    var = self.dimec.sync()
+                    if var is False:
+                        break
+                    self.handle(var)
+
+                self.step()
+                delay = start + self.count / self.rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            self.dimec.broadcast('DONE', 1)
+            self.dimec.exit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish synthetic ANDES variables for LTBNet')
+    parser.add_argument('-a', '--address', default=ADDRESS, help='DiME address')
+    parser.add_argument('-n', '--nbus', type=int, default=10, help='number of buses')
+    parser.add_argument('--rate', type=float, default=30, help='pmudata rate in Hz')
+    parser.add_argument('--noise', type=float, default=0., help='frequency noise in pu')
+    parser.add_argument('--event_time', type=float, help='time of an area split without a received Event')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--duration', type=float, help='seconds to run')
+    parser.add_argument('--broker', action='store_true', help='also run a local DiME broker at the address')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+
+    broker = None
+    if args.broker:
+        broker = Broker(args.address)
+        broker.start()
+
+    sim = FakeSimulator(args.address, nbus=args.nbus, rate=args.rate, noise=args.noise,
+                        event_time=args.event_time, seed=args.seed)
+    try:
+        sim.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if broker is not None:
+            broker.stop()
+
+
+if __name__ == '__main__':
+    main()
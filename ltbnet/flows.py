@@ -0,0 +1,221 @@
+"""Proactive OpenFlow rules computed from the LTBNet topology.
+
+Instead of a learning-switch controller, every switch gets static rules installed with
+`ovs-ofctl add-flows` batch files at startup. IP and ARP packets are forwarded by
+destination address along delay-weighted shortest paths. The remaining broadcast traffic
+and traffic to hardware interfaces is flooded along a spanning tree, so looped topologies
+cannot create broadcast storms and no controller sits in the data path.
+
+With gateways (see `ltbnet.gateways`), the paths and spanning trees stay within the
+broadcast domain of each region, and packets to the networks of other regions are
+forwarded to the first gateway toward them.
+"""
+
+import os
+import time
+import tempfile
+
+from statistics import median
+
+from mininet import log
+
+from ltbnet import gateways as gw
+from ltbnet.routing import HOP_WEIGHT, link_graph, shortest_paths
+
+ROUTE_PRIORITY = 100
+GATEWAY_PRIORITY = 50
+FLOOD_PRIORITY = 1
+
+
+def bare_ip(ip):
+    """Strip the prefix length from `ip`"""
+    return ip.split('/')[0]
+
+
+def host_addresses(network):
+    """Return a dictionary of host Mininet name to IP address without prefix"""
+    out = {}
+    for item in (network.PDC, network.PMU):
+        for name, ip in zip(item.mn_name, item.ip):
+            if ip:
+                out[name] = bare_ip(ip)
+    return out
+
+
+def gateway_graph(network):
+    """Return `link_graph` of Mininet names with every link replaced by a gateway split into
+    the two legs of the gateway"""
+    graph = link_graph(network, canonical=True)
+    for g in network.gateways:
+        a, b = (network.to_canonical(x) for x in g.ends)
+        for node in (a, b):
+            graph[node] = [(nbr, w, link) for nbr, w, link in graph[node] if link != g.link]
+        weight = g.delay + HOP_WEIGHT
+        graph[a].append((g.name, weight, g.link))
+        graph[b].append((g.name, HOP_WEIGHT, g.link))
+        graph[g.name] = [(a, weight, g.link), (b, HOP_WEIGHT, g.link)]
+    return graph
+
+
+def compute_flows(network, net=None):
+    """
+    Compute the flow table of every switch
+
+    Parameters
+    ----------
+    network
+        a set-up `ltbnet.network.Network`
+    net
+        the Mininet object. If given, ports of hardware interfaces are included in the
+        flooding tree
+
+    Returns
+    -------
+    dict
+        switch Mininet name to a list of flows in `ovs-ofctl add-flows` syntax
+    """
+    graph = gateway_graph(network)
+    switches = set(network.Switch.mn_name)
+    flows = {sw: [] for sw in network.Switch.mn_name}
+
+    addresses = {host: [ip] for host, ip in host_addresses(network).items()}
+    for g in network.gateways:
+        addresses[g.name] = [bare_ip(ip) for ip in g.ips]
+
+    # one shortest-path tree toward each destination host or gateway
+    trees = {}
+    for host, ips in addresses.items():
+        if host not in graph:
+            continue
+        dist, prev = trees[host] = shortest_paths(graph, host, transit=switches)
+        for sw in switches:
+            if sw not in prev:
+                continue
+            port = network.port(sw, prev[sw][0])[0]
+            for ip in ips:
+                flows[sw].append('priority={p},ip,nw_dst={ip},actions=output:{o}'.format(
+                    p=ROUTE_PRIORITY, ip=ip, o=port))
+                flows[sw].append('priority={p},arp,arp_tpa={ip},actions=output:{o}'.format(
+                    p=ROUTE_PRIORITY, ip=ip, o=port))
+
+    # networks of other regions toward the first gateway of the region of each switch
+    if network.gateways:
+        switches_of = {}
+        for sw, region in zip(network.Switch.mn_name, network.Switch.region):
+            switches_of.setdefault(region, []).append(sw)
+        for region, entries in gw.region_routes(network).items():
+            for dest, k in entries:
+                prev = trees[network.gateways[k].name][1]
+                for sw in switches_of.get(region, ()):
+                    if sw not in prev:
+                        continue
+                    port = network.port(sw, prev[sw][0])[0]
+                    flows[sw].append('priority={p},ip,nw_dst={d},actions=output:{o}'.format(
+                        p=GATEWAY_PRIORITY, d=dest, o=port))
+
+    # flood along a spanning tree of each connected component
+    flood = {sw: set() for sw in switches}
+    covered = set()
+    for root in network.Switch.mn_name:
+        if root in covered:
+            continue
+        dist, prev = shortest_paths(graph, root, transit=switches)
+        covered.update(dist)
+        for node, (parent, link) in prev.items():
+            if node in switches:
+                flood[node].add(network.port(node, parent)[0])
+            if parent in switches:
+                flood[parent].add(network.port(parent, node)[0])
+
+    if net is not None:
+        for sw in switches:
+            for intf, port in net.get(sw).ports.items():
+                if intf.link is None and intf.name != 'lo':
+                    flood[sw].add(port)
+
+    for sw, ports in flood.items():
+        if ports:
+            actions = ','.join('output:{}'.format(p) for p in sorted(ports))
+            flows[sw].append('priority={p},actions={a}'.format(p=FLOOD_PRIORITY, a=actions))
+
+    return flows
+
+
+def install(network, net, directory=None):
+    """
+    Install the flows from `compute_flows` on the started switches of `net`
+
+    Returns
+    -------
+    int
+        total number of flows installed
+    """
+    flows = compute_flows(network, net)
+    directory = directory or tempfile.mkdtemp(prefix='ltbnet-flows-')
+    count = 0
+
+    for sw, lines in flows.items():
+        path = os.path.join(directory, sw + '.flows')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines))
+            f.write('\n')
+
+        node = net.get(sw)
+        node.dpctl('del-flows')
+        out = node.dpctl('add-flows', path)
+        if out.strip():
+            log.error('*** Installing flows on {sw} failed: {o}\n'.format(sw=sw, o=out.strip()))
+        count += len(lines)
+
+    log.info('*** Installed {n} flows on {s} switches from {d}\n'.format(n=count, s=len(flows), d=directory))
+    return count
+
+
+def time_to_first_packet(network, net, timeout=10):
+    """
+    Measure the time for the first packet of every PMU to reach the PDC of its region
+
+    All PMUs probe their PDCs concurrently with one `ping` right after the flows are
+    installed, before any MiniPMU runs. The times include starting `ping` and resolving
+    the PDC address; the first C37.118 data frames are reported by `MultiPdc.report`.
+
+    Returns
+    -------
+    dict
+        PMU Mininet name to the elapsed time in seconds, or None if the PDC was not reached
+    """
+    pdc_ip = {idx: bare_ip(ip) for idx, ip in zip(network.PDC.idx, network.PDC.ip) if ip}
+    pdc_of = network.region_pdc()
+
+    t0 = time.time()
+    procs = {}
+    for idx, name in zip(network.PMU.idx, network.PMU.mn_name):
+        dest = pdc_ip.get(pdc_of.get(idx))
+        if dest is None:
+            continue
+        procs[name] = net.get(name).popen(['ping', '-n', '-q', '-c', '1', '-i', '0.01',
+                                           '-w', str(timeout), dest])
+
+    out = {}
+    while procs:
+        for name, proc in list(procs.items()):
+            if proc.poll() is None:
+                continue
+            out[name] = time.time() - t0 if proc.returncode == 0 else None
+            del procs[name]
+        time.sleep(0.001)
+
+    return out
+
+
+def report_first_packet(result):
+    """Print a summary of `time_to_first_packet`"""
+    reached = sorted(t for t in result.values() if t is not None)
+    print('Time to first packet (ping): {r}/{n} PMUs reached their PDC'.format(r=len(reached), n=len(result)))
+    if reached:
+        print('  min {a:.1f} ms, median {m:.1f} ms, max {b:.1f} ms'.format(
+            a=reached[0] * 1e3, m=median(reached) * 1e3, b=reached[-1] * 1e3))
+
+    missing = sorted(name for name, t in result.items() if t is None)
+    if missing:
+        print('  unreachable: ' + ' '.join(missing))
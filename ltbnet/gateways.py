@@ -0,0 +1,226 @@
+"""Gateways bounding the layer-2 broadcast domain of every region.
+
+With gateways, every link between switches of two regions is cut by a Linux router
+holding one address in the subnet of each region, so that ARP requests and flooded
+frames stay within their region. The router takes the place of the link: the link
+delay, bandwidth, loss and jitter are applied on its leg toward the `From` switch.
+
+Hosts reach the networks of other regions through the gateway of their region that
+starts the delay-weighted shortest path over the region graph, and every gateway
+forwards toward the side closer to the destination region. Every gateway on the way
+is closer to the destination region than the one before, so the routes are loop-free.
+"""
+
+import ipaddress
+
+from collections import namedtuple
+
+from mininet import log
+from mininet.node import Node
+
+from ltbnet.addressing import host_network
+from ltbnet.routing import HOP_WEIGHT, shortest_paths, trace
+
+Gateway = namedtuple('Gateway', ['name', 'link', 'ends', 'regions', 'ips', 'delay'])
+Gateway.__doc__ = """Router replacing the link at position `link` of `Network.Link`. `ends` are the
+Idx of the switches at the `From` and `To` side, `regions` their regions, `ips` the
+addresses of the router on each side as `ip/prefix` and `delay` the link delay in seconds.
+Interface `<name>-eth0` faces the `From` side and `<name>-eth1` the `To` side"""
+
+
+class LinuxRouter(Node):
+    """Mininet node forwarding IP packets between its interfaces"""
+    def config(self, **params):
+        super(LinuxRouter, self).config(**params)
+        self.cmd('sysctl -w net.ipv4.ip_forward=1')
+
+    def terminate(self):
+        self.cmd('sysctl -w net.ipv4.ip_forward=0')
+        super(LinuxRouter, self).terminate()
+
+
+def intf_name(gateway, side):
+    """Return the interface name of `gateway` facing the `From` (0) or `To` (1) side"""
+    return '{g}-eth{s}'.format(g=gateway.name, s=side)
+
+
+def plan(network, allocator):
+    """
+    Return a `Gateway` for every link between switches of different regions
+
+    The router addresses are allocated from the subnets of the regions (and switches)
+    by `allocator` after the host addresses, so that host addresses do not depend on
+    the use of gateways.
+    """
+    switch = network.Switch
+    taken = set(network.Switch.mn_name) | set(network.PDC.mn_name) | set(network.PMU.mn_name) | \
+        set(network.Router.mn_name)
+    per_switch = allocator.switch_prefix is not None
+
+    out = []
+    for i, fr, to, delay in zip(range(network.Link.n), network.Link.fr, network.Link.to, network.Link.delay):
+        if fr not in switch.index or to not in switch.index:
+            continue
+        regions = (switch.region[switch.index[fr]], switch.region[switch.index[to]])
+        if regions[0] == regions[1]:
+            continue
+
+        name = 'g{}'.format(len(out))
+        while name in taken:
+            name = 'g' + name
+        ips = tuple(allocator.allocate(r, s if per_switch else None) for r, s in zip(regions, (fr, to)))
+        out.append(Gateway(name, i, (fr, to), regions, ips, delay or 0.))
+
+    for host, sw in network.host_switch().items():
+        for item in (network.PDC, network.PMU):
+            if host in item.index and item.region[item.index[host]] != switch.region[switch.index[sw]]:
+                log.warn('*** Host <{h}> of region <{r}> is linked to switch <{s}> of another region and is '
+                         'only reachable within that region\n'.format(h=host, r=item.region[item.index[host]],
+                                                                      s=sw))
+    return out
+
+
+def region_graph(gateways):
+    """Return the adjacency dictionary of regions joined by `gateways`, in the format of
+    `ltbnet.routing.link_graph` with the gateway position as the link"""
+    graph = {}
+    for k, g in enumerate(gateways):
+        graph.setdefault(g.regions[0], []).append((g.regions[1], g.delay + HOP_WEIGHT, k))
+        graph.setdefault(g.regions[1], []).append((g.regions[0], g.delay + HOP_WEIGHT, k))
+    return graph
+
+
+def destinations(network, gateways, subnets):
+    """
+    Return the destinations of every region to be routed through the gateways
+
+    These are the subnet of the region and the networks of its explicitly addressed hosts.
+    A network overlapping one of another region, such as one flat network configured
+    for all hosts, is replaced by the host routes of the hosts and gateways of the
+    region in it.
+
+    Returns
+    -------
+    tuple
+        (dests, hosts) where `dests` is a dictionary of region to a list of networks and
+        `hosts` a dictionary of host Mininet name to its region and configured network
+    """
+    nets = {region: [net] for region, net in subnets.items()}
+    addrs = {}
+    hosts = {}
+    for item in (network.PDC, network.PMU):
+        for name, region, ip in zip(item.mn_name, item.region, item.ip):
+            if not ip:
+                continue
+            own = host_network(ip)
+            hosts[name] = (region, own)
+            addrs.setdefault(region, []).append(ipaddress.ip_address(ip.split('/')[0]))
+            region_nets = nets.setdefault(region, [])
+            if not any(own.subnet_of(net) for net in region_nets):
+                region_nets.append(own)
+    for g in gateways:
+        for region, ip in zip(g.regions, g.ips):
+            addrs.setdefault(region, []).append(ipaddress.ip_address(ip.split('/')[0]))
+
+    dests = {}
+    for region, region_nets in nets.items():
+        shared = [net for net in region_nets
+                  if any(net.overlaps(other) for r, others in nets.items() if r != region for other in others)]
+        dests[region] = [net for net in region_nets if net not in shared]
+        dests[region].extend(ipaddress.ip_network(addr) for addr in addrs.get(region, ())
+                             if any(addr in net for net in shared))
+    return dests, hosts
+
+
+def next_hops(gateways, regions):
+    """
+    Return the shortest paths over the region graph
+
+    Returns
+    -------
+    tuple
+        (dist, first) where `dist[region][dest]` is the path weight from `region` to `dest`
+        and `first[region][dest]` the position of the first gateway on the path
+    """
+    graph = region_graph(gateways)
+    dist = {}
+    first = {}
+    for region in regions:
+        dist[region], prev = shortest_paths(graph, region)
+        first[region] = {}
+        for dest in dist[region]:
+            if dest != region:
+                first[region][dest] = trace(prev, region, dest)[1][0]
+    return dist, first
+
+
+def region_routes(network):
+    """Return a dictionary of region to the (destination network, gateway position) pairs it
+    reaches through the gateways of the set-up `network`"""
+    subnets = {region: net for region, net in network.subnets.items() if not isinstance(region, tuple)}
+    dests, _ = destinations(network, network.gateways, subnets)
+    dist, first = next_hops(network.gateways, dests)
+    return {region: [(net, first[region][dest]) for dest in sorted(first[region]) for net in dests[dest]]
+            for region in dests}
+
+
+def routes(network, gateways, subnets, extra=()):
+    """
+    Return the routes of every host and gateway
+
+    Parameters
+    ----------
+    network
+        `Network` with assigned host addresses
+    gateways
+        list of `Gateway` from `plan`
+    subnets
+        dictionary of region to its allocated subnet
+    extra
+        additional networks, such as the DiME server LAN, to be reachable on-link from
+        every host
+
+    Returns
+    -------
+    dict
+        node Mininet name to a list of (destination, gateway address or None for on-link,
+        interface name or None for the default interface)
+    """
+    dests, hosts = destinations(network, gateways, subnets)
+    dist, first = next_hops(gateways, dests)
+
+    def via(region, dest):
+        """Address on the `region` side of its first gateway toward `dest`"""
+        g = gateways[first[region][dest]]
+        return g.ips[g.regions.index(region)].split('/')[0]
+
+    extra = [ipaddress.ip_network(x) for x in extra]
+    out = {}
+    shared = {}  # (region, network) to the routes of its hosts
+    for name, (region, own) in hosts.items():
+        entries = shared.get((region, own))
+        if entries is None:
+            entries = [(str(net), None, None) for net in dests[region] + extra if not net.subnet_of(own)]
+            for dest in sorted(first[region]):
+                hop = via(region, dest)
+                entries.extend((str(net), hop, None) for net in dests[dest])
+            shared[region, own] = entries
+        out[name] = entries
+
+    for g in gateways:
+        entries = []
+        for side, region in enumerate(g.regions):
+            own = host_network(g.ips[side])
+            entries.extend((str(net), None, intf_name(g, side)) for net in dests.get(region, ())
+                           if not net.subnet_of(own))
+        for dest in dests:
+            if dest in g.regions:
+                continue
+            d = [dist[r].get(dest, float('inf')) for r in g.regions]
+            if min(d) == float('inf'):
+                continue
+            side = 0 if d[0] <= d[1] else 1
+            hop = via(g.regions[side], dest)
+            entries.extend((str(net), hop, intf_name(g, side)) for net in dests[dest])
+        out[g.name] = entries
+    return out
@@ -0,0 +1,211 @@
+"""Synthetic LTBNet config generator for scale testing.
+
+A generated network has `regions` regions placed at random in a longitude/latitude
+box. Each region has `switches` switches, connected to the first (core) switch in a
+star or in a chain, one PDC on the core switch, and `pmus` PMUs per switch placed
+around the region center. The cores of the regions form a ring, and every region is
+linked to `mesh` more regions at random. Inter-region delays follow the distance
+between the region centers.
+
+Rows are yielded one at a time and written as they are generated, so configs of any
+size are produced in constant memory. The output is deterministic for a given seed.
+IP fields are left empty for `Network.assign_ip`.
+
+Example::
+
+    ltbnet-gen --regions 50 --switches 20 --pmus 100 --mesh 2 --seed 1 -o big.csv
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import random
+import argparse
+
+from ltbnet.parser import FIELDS, format_delay
+
+BBOX = (-125., -105., 31., 49.)  # longitude and latitude range of the region centers
+KM_PER_DEGREE = 111.
+KM_PER_MS = 200.  # propagation speed in fiber
+
+
+def row(**fields):
+    out = dict.fromkeys(FIELDS)
+    out.update(fields)
+    return out
+
+
+def distance(a, b):
+    """Return the approximate distance in km between (longitude, latitude) points"""
+    dx = (a[0] - b[0]) * math.cos(math.radians((a[1] + b[1]) / 2))
+    dy = a[1] - b[1]
+    return math.hypot(dx, dy) * KM_PER_DEGREE
+
+
+def generate(regions=2, switches=1, pmus=5, switch_topo='star', mesh=0, delay=(1., 5.), bw=None,
+             loss=None, jitter=None, inter_bw=None, inter_delay=1., bbox=BBOX, seed=None):
+    """
+    Yield the rows of a synthetic config as dictionaries of typed values
+
+    Parameters
+    ----------
+    regions
+        number of regions
+    switches
+        switches per region
+    pmus
+        PMUs per switch
+    switch_topo
+        `star` to link every switch to the core switch, or `chain`
+    mesh
+        extra links from every region to randomly chosen other regions
+    delay
+        (min, max) delay in ms of links within regions
+    bw, loss, jitter
+        bandwidth in Mbps, loss and jitter in % of links within regions
+    inter_bw
+        bandwidth in Mbps of links between regions
+    inter_delay
+        fixed delay in ms added to the propagation delay of links between regions
+    bbox
+        (lon_min, lon_max, lat_min, lat_max) of the region centers
+    seed
+        random seed
+    """
+    rng = random.Random(seed)
+    centers = [(rng.uniform(bbox[0], bbox[1]), rng.uniform(bbox[2], bbox[3])) for _ in range(regions)]
+    spread = min(bbox[1] - bbox[0], bbox[3] - bbox[2]) / max(2 * math.sqrt(regions), 1)
+
+    def around(center):
+        return (round(center[0] + rng.uniform(-spread, spread), 6),
+                round(center[1] + rng.uniform(-spread, spread), 6))
+
+    def link(idx, region, fr, to):
+        return row(Idx=idx, Type='Link', Region=region, Name=idx, From=fr, To=to,
+                   Delay=rng.uniform(*delay) * 1e-3, BW=bw, Loss=loss, Jitter=jitter)
+
+    for r, (lon, lat) in enumerate(centers):
+        name = 'R{}'.format(r)
+        yield row(Idx=name, Type='Region', Region=name, Name=name, Longitude=round(lon, 6), Latitude=round(lat, 6))
+
+    pmu_idx = 0
+    for r, center in enumerate(centers):
+        region = 'R{}'.format(r)
+        core = 'S{}_0'.format(r)
+
+        for s in range(switches):
+            sw = 'S{}_{}'.format(r, s)
+            lon, lat = around(center) if s else (round(center[0], 6), round(center[1], 6))
+            yield row(Idx=sw, Type='Switch', Region=region, Name=sw, Longitude=lon, Latitude=lat)
+            if s:
+                parent = core if switch_topo == 'star' else 'S{}_{}'.format(r, s - 1)
+                yield link('L_{}'.format(sw), region, sw, parent)
+
+        pdc = 'C{}'.format(r)
+        yield row(Idx=pdc, Type='PDC', Region=region, Name=pdc,
+                  Longitude=round(center[0], 6), Latitude=round(center[1], 6))
+        yield link('L_{}'.format(pdc), region, pdc, core)
+
+        for s in range(switches):
+            sw = 'S{}_{}'.format(r, s)
+            for _ in range(pmus):
+                pmu_idx += 1
+                pmu = 'P{}'.format(pmu_idx)
+                lon, lat = around(center)
+                yield row(Idx=pmu, Type='PMU', Region=region, Name=pmu, Longitude=lon, Latitude=lat,
+                          PMU_IDX=pmu_idx)
+                yield link('L_{}'.format(pmu), region, pmu, sw)
+
+    # ring of region cores and random extra links
+    pairs = set()
+    if regions > 1:
+        for r in range(regions):
+            pairs.add(tuple(sorted((r, (r + 1) % regions))))
+    for r in range(regions):
+        others = [o for o in range(regions) if o != r]
+        for o in rng.sample(others, min(mesh, len(others))):
+            pairs.add(tuple(sorted((r, o))))
+
+    for a, b in sorted(pairs):
+        idx = 'L_R{}_R{}'.format(a, b)
+        ms = inter_delay + distance(centers[a], centers[b]) / KM_PER_MS
+        yield row(Idx=idx, Type='Link', Name=idx, From='S{}_0'.format(a), To='S{}_0'.format(b),
+                  Delay=ms * 1e-3, BW=inter_bw)
+
+
+def _fmt(field, value):
+    if value is None:
+        return 'None'
+    if field == 'Delay':
+        return format_delay(value)
+    return value
+
+
+def write_csv(rows, f):
+    """Write `rows` to the file object `f` in CSV format and return the number of rows"""
+    writer = csv.writer(f, lineterminator='\n')
+    writer.writerow(FIELDS)
+    n = 0
+    for r in rows:
+        writer.writerow([_fmt(k, r[k]) for k in FIELDS])
+        n += 1
+    return n
+
+
+def write_json(rows, f):
+    """Write `rows` to the file object `f` as a JSON list, one component per line, and return the number of rows"""
+    f.write('[')
+    n = 0
+    for r in rows:
+        f.write(',\n ' if n else '\n ')
+        f.write(json.dumps({k: _fmt(k, r[k]) for k in FIELDS}))
+        n += 1
+    f.write('\n]\n')
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic LTBNet config')
+    parser.add_argument('-o', '--output', help='output file; .csv or .json. Defaults to CSV on stdout')
+    parser.add_argument('--format', choices=('csv', 'json'), help='output format if not given by the file name')
+    parser.add_argument('--regions', type=int, default=2, help='number of regions')
+    parser.add_argument('--switches', type=int, default=1, help='switches per region')
+    parser.add_argument('--pmus', type=int, default=5, help='PMUs per switch')
+    parser.add_argument('--switch_topo', choices=('star', 'chain'), default='star',
+                        help='links between the switches of a region')
+    parser.add_argument('--mesh', type=int, default=0, help='extra links from every region to random regions')
+    parser.add_argument('--delay', type=float, nargs=2, default=(1., 5.), metavar=('MIN', 'MAX'),
+                        help='delay range in ms of links within regions')
+    parser.add_argument('--bw', type=float, help='bandwidth in Mbps of links within regions')
+    parser.add_argument('--loss', type=float, help='loss in %% of links within regions')
+    parser.add_argument('--jitter', type=float, help='jitter in %% of links within regions')
+    parser.add_argument('--inter_bw', type=float, help='bandwidth in Mbps of links between regions')
+    parser.add_argument('--inter_delay', type=float, default=1., help='delay in ms added to the propagation '
+                                                                      'delay of links between regions')
+    parser.add_argument('--bbox', type=float, nargs=4, default=BBOX,
+                        metavar=('LON_MIN', 'LON_MAX', 'LAT_MIN', 'LAT_MAX'), help='area of the region centers')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = 'json' if args.output and os.path.splitext(args.output)[1] == '.json' else 'csv'
+
+    rows = generate(regions=args.regions, switches=args.switches, pmus=args.pmus, switch_topo=args.switch_topo,
+                    mesh=args.mesh, delay=args.delay, bw=args.bw, loss=args.loss, jitter=args.jitter,
+                    inter_bw=args.inter_bw, inter_delay=args.inter_delay, bbox=args.bbox, seed=args.seed)
+
+    f = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        n = write_json(rows, f) if fmt == 'json' else write_csv(rows, f)
+    finally:
+        if args.output:
+            f.close()
+
+    sys.stderr.write('{n} components written to {o}\n'.format(n=n, o=args.output or 'stdout'))
+
+
+if __name__ == '__main__':
+    main()
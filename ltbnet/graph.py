@@ -1,22 +1,83 @@
-import networkx as nx
-from matplotlib import pyplot as plt
+import math
 
-import matplotlib.pyplot as plt
 import networkx as nx
-try:
-    import pygraphviz
-    from networkx.drawing.nx_agraph import graphviz_layout
-except ImportError:
+import matplotlib.pyplot as plt
+
+from matplotlib.collections import LineCollection
+
+from mininet import log
+
+
+def graphviz_layout(G):
+    """Return node positions from graphviz. Requires pygraphviz or pydot"""
     try:
-        import pydot
-        from networkx.drawing.nx_pydot import graphviz_layout
+        import pygraphviz
+        from networkx.drawing.nx_agraph import graphviz_layout as layout
     except ImportError:
-        raise ImportError("This example needs Graphviz and either "
-                          "PyGraphviz or pydot")
+        try:
+            import pydot
+            from networkx.drawing.nx_pydot import graphviz_layout as layout
+        except ImportError:
+            raise ImportError("The graphviz layout needs Graphviz and either "
+                              "PyGraphviz or pydot. Use the geo layout instead.")
+    return layout(G)
 
 
-def make_graph(network):
+def geo_layout(network, jitter=None):
+    """
+    Return node positions (longitude, latitude) from the `coords` of the records
+
+    Co-located nodes are spread on a small circle of radius `jitter`, which defaults to
+    0.5% of the extent of the coordinates. Nodes without coordinates are placed next to
+    a linked node. A latitude beyond 90 degrees is taken as swapped `Longitude` and
+    `Latitude` fields and the two values are exchanged with a warning.
+    """
+    groups = {}
+    swapped = []
+    for item in (network.Switch, network.PDC, network.PMU):
+        for idx, (lat, lon) in zip(item.idx, item.coords):
+            if lat is not None and lon is not None:
+                if abs(lat) > 90 >= abs(lon):
+                    lat, lon = lon, lat
+                    swapped.append(idx)
+                groups.setdefault((lon, lat), []).append(idx)
+
+    if swapped:
+        log.warn('*** Longitude and Latitude of {n} node(s) such as <{i}> are swapped in the config\n'.format(
+            n=len(swapped), i=swapped[0]))
+
+    if jitter is None:
+        xs = [x for x, y in groups] or [0.]
+        ys = [y for x, y in groups] or [0.]
+        jitter = 0.005 * max(max(xs) - min(xs), max(ys) - min(ys), 1.)
+
+    pos = {}
+    for (x, y), nodes in groups.items():
+        n = len(nodes)
+        for k, node in enumerate(nodes):
+            if n == 1:
+                pos[node] = (x, y)
+            else:
+                angle = 2 * math.pi * k / n
+                pos[node] = (x + jitter * math.cos(angle), y + jitter * math.sin(angle))
+
+    for fr, to in zip(network.Link.fr, network.Link.to):
+        for a, b in ((fr, to), (to, fr)):
+            if a not in pos and b in pos:
+                pos[a] = (pos[b][0] + jitter, pos[b][1] + jitter)
+
+    return pos
+
+
+def make_graph(network, layout='graphviz'):
     """Graph visualization of a Network object
+
+    Parameters
+    ----------
+    network
+        a set-up Network
+    layout
+        `graphviz` for a graphviz layout, or `geo` to place nodes by their coordinates
     """
     G = nx.Graph()
 
@@ -24,45 +85,63 @@ def make_graph(network):
     G.add_nodes_from(network.PMU.idx, color='green', size=80)
     G.add_nodes_from(network.PDC.idx, color='blue', size=160)
 
-    for f, t in zip(network.Link.fr, network.Link.to):
-        G.add_edge(f, t)
+    for f, t, d in zip(network.Link.fr, network.Link.to, network.Link.delay):
+        G.add_edge(f, t, delay=d or 0.)
 
     print("graph has %d nodes with %d edges"
           % (nx.number_of_nodes(G), nx.number_of_edges(G)))
     print(nx.number_connected_components(G), "connected components")
 
-    colors = [G.node[i]['color'] for i in G.nodes()]
-    sizes = [G.node[i]['size'] for i in G.nodes()]
-
     plt.figure(figsize=(8, 8))
-    # use graphviz to find radial layout
-    # pos = graphviz_layout(G, prog='sfdp', root='S_CAIS')
-    pos = graphviz_layout(G)
-    # draw nodes, coloring by rtt ping time
-    nx.draw(G, pos,
-            node_color=colors,
-            with_labels=False,
-            alpha=0.6,
-            node_size=sizes
-            )
+    if layout == 'geo':
+        pos = geo_layout(network)
+    else:
+        # use graphviz to find radial layout
+        # pos = graphviz_layout(G, prog='sfdp', root='S_CAIS')
+        pos = graphviz_layout(G)
+
+    draw(G, pos)
+    if layout == 'geo' and pos:
+        # equal ground distances on both axes at the mean latitude
+        lat = sum(y for x, y in pos.values()) / len(pos)
+        plt.gca().set_aspect(1. / max(math.cos(math.radians(lat)), 0.1))
+
+    ax = plt.gca()
+    for i in network.Switch.idx:
+        if i in pos:
+            ax.text(pos[i][0], pos[i][1], i, fontsize=16, color='black',
+                    horizontalalignment='center', verticalalignment='center')
 
-    labels = {i: i for i in network.Switch.idx}
+    return G, pos
 
-    nx.draw_networkx_labels(G, pos, labels, font_size=16, font_color='black')
 
-    return G, pos
+def draw(G, pos, alpha=0.6):
+    """Draw the nodes and edges of `G` with one collection each instead of per-element artists"""
+    ax = plt.gca()
+
+    segments = [(pos[u], pos[v]) for u, v in G.edges() if u in pos and v in pos]
+    ax.add_collection(LineCollection(segments, colors='black', linewidths=1, alpha=alpha, zorder=1))
+
+    nodes = [n for n in G.nodes() if n in pos]
+    ax.scatter([pos[n][0] for n in nodes], [pos[n][1] for n in nodes],
+               c=[G.nodes[n].get('color', 'gray') for n in nodes],
+               s=[G.nodes[n].get('size', 80) for n in nodes],
+               alpha=alpha, zorder=2)
+
+    ax.autoscale_view()
+    ax.set_axis_off()
 
 
 def draw_shortest_path(G, pos, source, target, labels=False):
     """
-    Find the shortest path between `source` and `target`, and draw on the graph
+    Find the delay-weighted shortest path between `source` and `target`, and draw on the graph
 
     Parameters
     ----------
     G
         graph on which the source and target exist
     pos
-        position of nodes generated by `graphviz_layout`
+        position of nodes generated by `graphviz_layout` or `geo_layout`
     source
         name of the source node
     target
@@ -73,7 +152,7 @@ def draw_shortest_path(G, pos, source, target, labels=False):
     graph
 
     """
-    path = nx.shortest_path(G, source=source, target=target)
+    path = nx.shortest_path(G, source=source, target=target, weight='delay')
 
     print(path)
 
@@ -82,4 +161,4 @@ def draw_shortest_path(G, pos, source, target, labels=False):
     nx.draw_networkx_nodes(G, pos, nodelist=path, node_color='r', node_size=240, alpha=0.5)
     nx.draw_networkx_edges(G, pos, edgelist=path_edges, edge_color='r', width=10, alpha=0.4)
 
-    return G
\ No newline at end of file
+    return G
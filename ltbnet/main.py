@@ -1,21 +1,19 @@
-"""Main function of the LTBNet executable"""
+"""Main function of the LTBNet executable
+
+Heavy dependencies (matplotlib, networkx and graphviz for `--graph`, and the Mininet
+runtime for the emulation) are imported only on the code paths that need them so that
+`ltbnet --parse_only` starts quickly.
+"""
 
 import os
 import argparse
 
-from ltbnet.network import Network
-from ltbnet.parser import parse_config
-from ltbnet.graph import make_graph, draw_shortest_path, plt
+from ltbnet import cache
+from ltbnet.analysis import PathAnalysis
+from ltbnet.capacity import CapacityPlan
 
 from mininet import log
 
-from mininet.node import ( Node, Host, OVSKernelSwitch, DefaultController, RemoteController,
-                           Controller )
-
-from mininet.link import TCLink
-from mininet.net import Mininet
-from mininet.cli import CLI
-
 
 def main(*args, **kwargs):
     """LTBNet Main function"""
@@ -25,20 +23,71 @@ def main(*args, **kwargs):
                         help='clean MiniPMU and Mininet processes')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='enable INFO level verbose logging')
-    parser.add_argument('--runpmu', help='run LTBPMU processes on the specified PMU hosts',
-                        action='store_true')
+    parser.add_argument('--runpmu', help='run LTBPMU processes on the specified PMU hosts and MiniPDC '
+                                         'processes on the PDC hosts', action='store_true')
+    parser.add_argument('--dime', help='DiME address passed to the MiniPMUs, such as local:///tmp/ltbnet-dime '
+                                       'for the local broker of ltbnet-fakesim')
     parser.add_argument('--graph', help='show graph visualization', action='store_true')
+    parser.add_argument('--layout', choices=('graphviz', 'geo'), default='graphviz',
+                        help='graph layout: graphviz, or geo to place nodes by their coordinates')
+    parser.add_argument('--graph_output', help='write the graph visualization to an image file')
     parser.add_argument('--source_node', help='name of the source node')
     parser.add_argument('--target_node', help='name of the destination node')
 
+    parser.add_argument('--analyze', action='store_true',
+                        help='report the latency budget of PMU-to-PDC paths without starting the network')
+    parser.add_argument('--plan', action='store_true',
+                        help='report the bandwidth utilization of links by PMU streams without starting '
+                             'the network')
     parser.add_argument('--parse_only', help='parse the input file only without '
                                              'creating topology', action='store_true')
 
     parser.add_argument('--remote', '-r', action='store_true',
                         help='use remote controller (Ryu tested)')
+    parser.add_argument('--proactive', action='store_true',
+                        help='install static shortest-path flows instead of using a controller and report the '
+                             'time for a first ping from every PMU to reach its PDC')
+    parser.add_argument('--probe', metavar='FILE',
+                        help='probe RTT, jitter and loss from every PMU to its PDC after startup and write '
+                             'the matrix to a csv file')
+    parser.add_argument('--probe_regions', action='store_true',
+                        help='with --probe, also probe between the PDCs of all region pairs')
+    parser.add_argument('--counters', metavar='FILE',
+                        help='sample the traffic counters of all switch ports and write them to a .npz file '
+                             'on exit')
+    parser.add_argument('--counter_rate', type=float, default=100, help='counter sampling rate in Hz')
+    parser.add_argument('--counter_window', type=float, default=30,
+                        help='seconds of counter samples kept in memory')
+    parser.add_argument('--workers', help='run the network distributed on ltbnet-worker agents, given as '
+                                          'host[:port],host[:port]')
+    parser.add_argument('--partition', choices=('region', 'mincut'), default='region',
+                        help='with --workers, assign whole regions to workers or minimize the cut links')
+    parser.add_argument('--tunnel', choices=('vxlan', 'gretap'), default='vxlan',
+                        help='with --workers, tunnel type of links between workers')
     parser.add_argument('--dump_sw', action='store_true', help="dump switch-port-node mapping to a csv file")
+    parser.add_argument('--no_cache', action='store_true',
+                        help='always parse the config file instead of using the topology cache')
+    parser.add_argument('--supernet', default='10.0.0.0/8',
+                        help='address space for the per-region subnets of hosts without an IP')
+    parser.add_argument('--region_prefix', type=int, default=16, help='prefix length of each region subnet')
+    parser.add_argument('--switch_prefix', type=int,
+                        help='prefix length of per-switch subnets within a region (default: none)')
+    parser.add_argument('--route', action='append', default=[],
+                        help='additional network reachable from every host, such as the DiME LAN. '
+                             'Can be repeated')
+    parser.add_argument('--gateways', action='store_true',
+                        help='replace the links between regions with Linux routers so that every region '
+                             'is its own broadcast domain')
 
     cli_args = parser.parse_args()
+    if cli_args.workers:
+        unsupported = [flag for flag, value in (('--remote', cli_args.remote), ('--proactive', cli_args.proactive),
+                                                ('--probe', cli_args.probe), ('--probe_regions', cli_args.probe_regions),
+                                                ('--counters', cli_args.counters), ('--dump_sw', cli_args.dump_sw),
+                                                ('--gateways', cli_args.gateways))
+                       if value]
+        if unsupported:
+            parser.error('{} cannot be used with --workers'.format(', '.join(unsupported)))
 
     if cli_args.verbose:
         log.setLogLevel('info')
@@ -46,21 +95,71 @@ def main(*args, **kwargs):
         clean()
         return
 
-    config = parse_config(cli_args.config)
-    network = Network().setup(config)
+    options = dict(supernet=cli_args.supernet, region_prefix=cli_args.region_prefix,
+                   switch_prefix=cli_args.switch_prefix, routes=tuple(cli_args.route), gateways=cli_args.gateways)
+    network, cache_hit = cache.load_network(cli_args.config, use_cache=not cli_args.no_cache, **options)
+    if cache_hit:
+        log.info('*** Topology loaded from cache\n')
 
-    if cli_args.graph:
-        network_graph, node_pos = make_graph(network)
+    if cli_args.graph or cli_args.graph_output:
+        if cli_args.graph_output:
+            import matplotlib
+            matplotlib.use('Agg')
+        from ltbnet.graph import make_graph, draw_shortest_path, plt
+
+        network_graph, node_pos = make_graph(network, layout=cli_args.layout)
         if cli_args.source_node and cli_args.target_node:
             network_graph = draw_shortest_path(network_graph, node_pos,
                                                cli_args.source_node, cli_args.target_node)
-        plt.show()
+        if cli_args.graph_output:
+            plt.savefig(cli_args.graph_output)
+        else:
+            plt.show()
+
+    if cli_args.analyze:
+        PathAnalysis(network).report()
+        return
+
+    if cli_args.plan:
+        plan = CapacityPlan(network)
+        plan.report()
+        return 1 if plan.oversubscribed() else 0
 
     if cli_args.parse_only:
+        cold, warm = cache.profile(cli_args.config, **options)
+        print('Parsed {f} in {c:.4f}s (cold), loaded from cache in {w:.4f}s (warm)'
+              .format(f=cli_args.config, c=cold, w=warm))
         log.debug('Parse input file only. Exiting.')
         return
 
-    if cli_args.remote:
+    for usage in CapacityPlan(network).oversubscribed():
+        log.warn('*** Link <{i}> is oversubscribed: {l:.2f} Mbps of PMU streams over {b:g} Mbps\n'.format(
+            i=usage.idx, l=usage.load, b=usage.bw))
+
+    if cli_args.workers:
+        from ltbnet.distributed import Coordinator, parse_workers
+
+        coordinator = Coordinator(cli_args.config, parse_workers(cli_args.workers), method=cli_args.partition,
+                                  tunnel=cli_args.tunnel, options=options, runpmu=cli_args.runpmu,
+                                  dime=cli_args.dime, network=network)
+        coordinator.start()
+        coordinator.report()
+        print('LTBNet Ready')
+        try:
+            input('Press Enter to stop the workers\n')
+        except (EOFError, KeyboardInterrupt):
+            pass
+        coordinator.stop()
+        return
+
+    from mininet.node import DefaultController, RemoteController
+    from mininet.link import TCLink
+    from mininet.net import Mininet
+    from mininet.cli import CLI
+
+    if cli_args.proactive:
+        controller = None
+    elif cli_args.remote:
         controller = RemoteController
     else:
         controller = DefaultController
@@ -76,20 +175,51 @@ def main(*args, **kwargs):
         network.dump_sw_port_node(net)
 
     net.start()
+    network.add_routes(net)
+    if cli_args.proactive:
+        from ltbnet import flows
+
+        flows.install(network, net)
+        flows.report_first_packet(flows.time_to_first_packet(network, net))
     print('LTBNet Ready')
+
+    sampler = None
+    if cli_args.counters:
+        from ltbnet.counters import CounterSampler, switch_port_bw
+
+        ports = switch_port_bw(network, net)
+        sampler = CounterSampler([p[0] for p in ports], rate=cli_args.counter_rate,
+                                 window=cli_args.counter_window)
+        sampler.start()
+
+    if cli_args.probe:
+        from ltbnet.probe import run_matrix
+
+        run_matrix(network, net, cli_args.probe, regions=cli_args.probe_regions)
+        print('Probe matrix written to {}'.format(cli_args.probe))
     if cli_args.runpmu:
-        network.PMU.run_pmu(net)
+        network.PMU.run_pmu(net, dime_address=cli_args.dime)
+        network.PDC.run_pdc(net, network)
     CLI(net)
 
+    if sampler is not None:
+        from ltbnet.counters import summarize
+
+        sampler.stop()
+        sampler.dump(cli_args.counters)
+        summarize(sampler, ports)
+
     print('Stopping MiniPMUs - enter your root password if prompted')
     os.system("sudo pkill minipmu")
+    os.system("sudo pkill minipdc")
     net.stop()
 
 
 def clean(*args, **kwargs):
-    """Clean up MiniPmu processes and Mininet sessions"""
+    """Clean up MiniPmu and MiniPDC processes and Mininet sessions"""
     os.system("sudo mn -c")
     os.system("sudo pkill minipmu")
+    os.system("sudo pkill minipdc")
 
 
 if __name__ == '__main__':
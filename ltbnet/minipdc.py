@@ -0,0 +1,327 @@
+"""MiniPDC: regional phasor data concentrator re-streaming C37.118.
+
+A MiniPDC connects to the PMUs of its region with `MultiPdc`, aligns their frames
+with a `Concentrator` and republishes every time slice as one data frame of a
+multi-PMU stream on its own C37.118 server port. Upstream streams may themselves be
+multi-PMU, so MiniPDCs can be stacked: a control-center MiniPDC connects to the
+regional MiniPDCs instead of to every PMU.
+
+The republished stream has one data block per PMU with the first phasor, frequency and
+ROCOF in floating point. Blocks of PMUs missing from a slice are NaN with the data
+error bits of STAT set.
+
+The stream layout is rebuilt whenever an upstream configuration is received late or
+changes. The first data frame with the new layout has the configuration-change bit of
+STAT set, and archiving continues in a new directory `DIR.1`, `DIR.2`, ... since an
+archive has a fixed number of PMUs.
+
+Usage::
+
+    minipdc --pmu 10.1.0.2,10.1.0.3 --port 4712 --rate 30 --wait 0.05
+    minipdc --pmu 10.1.0.1,10.2.0.1 --pmu_port 4712 --port 4712
+"""
+
+import time
+import socket
+import logging
+import argparse
+import selectors
+
+from ltbnet import c37118
+from ltbnet.pdc import MultiPdc
+from ltbnet.archive import ArchiveWriter
+from ltbnet.concentrator import Concentrator
+
+logger = logging.getLogger(__name__)
+
+PORT = 4712
+
+FIELDS = ('magnitude', 'angle', 'frequency', 'rocof')
+
+STAT_DATA_ERROR = 0xC000
+
+# polar, floating-point phasors, analogs and frequency
+FORMAT = 0xF
+
+
+class Publisher(object):
+    """
+    C37.118 server of one stream to any number of clients
+
+    Clients are sent the header and configuration frames on request and data frames
+    after the start command. A client that cannot keep up is disconnected.
+    """
+    def __init__(self, idcode, cfg, header='', port=PORT, host='0.0.0.0'):
+        self.idcode = idcode
+        self.cfg = cfg
+        self.header = header
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(16)
+        self.sock.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ, None)
+        self.clients = {}  # socket -> [receive buffer, streaming]
+
+    def _drop(self, sock):
+        self.selector.unregister(sock)
+        self.clients.pop(sock, None)
+        sock.close()
+
+    def _send(self, sock, data):
+        try:
+            sock.sendall(data)
+        except OSError as e:
+            logger.warning('Dropping PDC client: {}'.format(e))
+            self._drop(sock)
+
+    def _on_command(self, sock, frame):
+        if c37118.frame_type(frame) != c37118.COMMAND or len(frame) < c37118.COMMON.size + 4:
+            return
+        cmd = (frame[c37118.COMMON.size] << 8) | frame[c37118.COMMON.size + 1]
+        if cmd == c37118.CMD_START:
+            self.clients[sock][1] = True
+        elif cmd == c37118.CMD_STOP:
+            self.clients[sock][1] = False
+        elif cmd == c37118.CMD_HEADER:
+            self._send(sock, c37118.header_frame(self.idcode, self.header))
+        elif cmd in (c37118.CMD_CFG1, c37118.CMD_CFG2, c37118.CMD_CFG3):
+            ftype = c37118.CFG1 if cmd == c37118.CMD_CFG1 else c37118.CFG2
+            self._send(sock, c37118.config_frame(self.cfg, ftype))
+
+    def poll(self, timeout=0):
+        """Accept clients and handle their commands"""
+        for key, mask in self.selector.select(timeout):
+            if key.fileobj is self.sock:
+                try:
+                    sock, addr = self.sock.accept()
+                except BlockingIOError:
+                    continue
+                sock.setblocking(False)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.selector.register(sock, selectors.EVENT_READ, None)
+                self.clients[sock] = [bytearray(), False]
+                logger.info('PDC client {} connected'.format(addr))
+                continue
+
+            sock = key.fileobj
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                data = b''
+            if not data:
+                self._drop(sock)
+                continue
+
+            buf = self.clients[sock][0]
+            buf += data
+            frames, used = c37118.split_frames(buf)
+            del buf[:used]
+            for frame in frames:
+                if sock in self.clients:
+                    self._on_command(sock, frame)
+
+    def publish(self, frame):
+        """Send a data frame to every streaming client"""
+        for sock, (buf, streaming) in list(self.clients.items()):
+            if not streaming:
+                continue
+            try:
+                sent = sock.send(frame)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                sent = -1
+            if sent != len(frame):
+                # a partial frame would corrupt the stream
+                logger.warning('Dropping slow PDC client')
+                self._drop(sock)
+
+    def close(self):
+        for sock in list(self.clients):
+            self._drop(sock)
+        self.selector.close()
+        self.sock.close()
+
+
+class MiniPDC(object):
+    """
+    Regional PDC concentrating upstream streams into one multi-PMU stream
+
+    Parameters
+    ----------
+    pmus
+        IP addresses of the PMUs or of lower-level MiniPDCs
+    idcode
+        IDCODE of the republished stream
+    rate
+        reporting rate in frames per second
+    wait
+        seconds to wait for the slowest PMU of a time slice
+    cfg_timeout
+        seconds to wait for the configuration of all upstream streams before
+        republishing the ones received
+    archive
+        directory to archive the aligned snapshots in, see `ltbnet.archive`
+    """
+    def __init__(self, pmus, idcode=1, name='MiniPDC', pmu_port=1410, port=PORT, rate=30, wait=0.1,
+                 cfg_timeout=5., archive=None):
+        self.name = name
+        self.idcode = idcode
+        self.port = port
+        self.rate = rate
+        self.wait = wait
+        self.cfg_timeout = cfg_timeout
+        self.archive = archive
+        self.writer = None
+
+        self.pdc = MultiPdc(pmus, port=pmu_port)
+        self.pdc.add_callback(self.on_data)
+        self.pdc.add_config_callback(self.on_config)
+
+        self.columns = {}  # upstream key -> concentrator column of each data block
+        self.stations = []
+        self.layout = None  # upstream key -> station identities the stream was built from
+        self.layouts = 0    # number of layouts built
+        self.cfg = None
+        self.concentrator = None
+        self.publisher = None
+        self.changed = False  # set the configuration-change bit in the next data frame
+        self.published = 0
+
+    @staticmethod
+    def _layout(config):
+        return {key: tuple((s.idcode, s.name, s.cfgcnt, s.fnom) for s in cfg.stations)
+                for key, cfg in config.items()}
+
+    def build(self):
+        """Build the republished configuration from the upstream configurations received,
+        replacing the previous layout if there is one"""
+        config = self.pdc.config
+        self.layout = self._layout(config)
+
+        columns, stations = {}, []
+        for key in sorted(config):
+            cols = []
+            for s in config[key].stations:
+                cols.append(len(stations))
+                stations.append(c37118.Station(s.name, s.idcode, FORMAT, 1, 0, 0, [(s.channels or ['V'])[0]],
+                                               [0], [], [], s.fnom, s.cfgcnt))
+            columns[key] = cols
+
+        missing = [c.address[0] for c in self.pdc.connections if c.key not in config]
+        if missing:
+            logger.warning('No configuration from {}; not republished'.format(', '.join(missing)))
+
+        released = None
+        if self.concentrator is not None:
+            # publish what was aligned with the old layout first
+            self.concentrator.flush()
+            released = self.concentrator.released
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+        self.columns, self.stations = columns, stations
+        self.cfg = c37118.Config(self.idcode, 0, 0, c37118.TIME_BASE, self.stations, self.rate)
+        self.concentrator = Concentrator(len(self.stations), rate=self.rate, wait=self.wait, fields=FIELDS)
+        self.concentrator.released = released
+        self.concentrator.add_callback(self.on_snapshot)
+
+        if self.archive:
+            path = self.archive if not self.layouts else '{}.{}'.format(self.archive, self.layouts)
+            self.writer = ArchiveWriter(path, len(self.stations), fields=FIELDS,
+                                        pmus=[s.idcode for s in self.stations], rate=self.rate)
+            self.concentrator.add_callback(self.writer.feed)
+            if self.layouts:
+                logger.info('Archiving the new layout to {}'.format(path))
+
+        header = '{} concentrating {} PMUs'.format(self.name, len(self.stations))
+        if self.publisher is None:
+            self.publisher = Publisher(self.idcode, self.cfg, header, self.port)
+        else:
+            self.publisher.cfg = self.cfg
+            self.publisher.header = header
+        self.layouts += 1
+        self.changed = self.layouts > 1
+        logger.info(header)
+
+    def on_config(self, key, cfg):
+        """Rebuild the layout for a configuration received after the build or changed since"""
+        if self.layout is not None and self._layout(self.pdc.config) != self.layout:
+            logger.info('Upstream configuration of {}:{} is new or changed; rebuilding'.format(
+                *self.pdc.connections[key].address))
+            self.build()
+
+    def on_data(self, key, measurements):
+        cols = self.columns.get(key)
+        if cols is None:
+            return
+        t = measurements['time']
+        for col, block in zip(cols, measurements['measurements']):
+            phasor = block['phasors'][0] if block['phasors'] else (float('nan'), float('nan'))
+            self.concentrator.add(col, t, (phasor[0], phasor[1], block['frequency'], block['rocof']))
+
+    def on_snapshot(self, snapshot):
+        values = []
+        mag, ang = snapshot.values['magnitude'], snapshot.values['angle']
+        freq, rocof = snapshot.values['frequency'], snapshot.values['rocof']
+        change = c37118.STAT_CFG_CHANGE if self.changed else 0
+        self.changed = False
+        for i, present in enumerate(snapshot.present):
+            values.extend(((0 if present else STAT_DATA_ERROR) | change, mag[i], ang[i], freq[i], rocof[i]))
+        self.publisher.publish(c37118.data_frame(self.cfg, values, t=snapshot.t))
+        self.published += 1
+
+    def run(self, duration=None, timeout=0.005):
+        """Connect upstream and republish until `duration` seconds have passed or interrupted"""
+        # connections are retried until the MiniPMUs start their servers with the simulation
+        self.pdc.connect()
+        start = time.monotonic()
+        deadline = None if duration is None else start + duration
+
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                self.pdc.poll(timeout)
+                if self.cfg is None:
+                    if len(self.pdc.config) == len(self.pdc) or time.monotonic() - start >= self.cfg_timeout:
+                        if self.pdc.config:
+                            self.build()
+                    continue
+                self.concentrator.poll()
+                self.publisher.poll(0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pdc.stop()
+            if self.publisher is not None:
+                self.publisher.close()
+            if self.writer is not None:
+                self.writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MiniPDC: concentrate PMU streams and re-stream C37.118')
+    parser.add_argument('--pmu', required=True, help='comma-separated IP addresses of PMUs or MiniPDCs')
+    parser.add_argument('-n', '--name', default='MiniPDC', help='PDC instance name')
+    parser.add_argument('--idcode', type=int, default=1, help='IDCODE of the republished stream')
+    parser.add_argument('--pmu_port', type=int, default=1410, help='TCP port of the upstream streams')
+    parser.add_argument('--port', type=int, default=PORT, help='TCP port of the republished stream')
+    parser.add_argument('--rate', type=int, default=30, help='reporting rate in frames per second')
+    parser.add_argument('--wait', type=float, default=0.1,
+                        help='seconds to wait for the slowest PMU of a time slice')
+    parser.add_argument('--archive', metavar='DIR', help='archive the aligned snapshots to a new directory')
+    parser.add_argument('--duration', type=float, help='run time in seconds (default: until interrupted)')
+
+    args = parser.parse_args()
+
+    pdc = MiniPDC(args.pmu.split(','), idcode=args.idcode, name=args.name, pmu_port=args.pmu_port,
+                  port=args.port, rate=args.rate, wait=args.wait, archive=args.archive)
+    pdc.run(args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,16 @@
 """Python module to request PMU data from a running ANDES
+
+NumPy, DiME and PyPMU are imported where they are first used so that the `minipmu`
+entry point can parse its arguments without loading them.
 """
 
 import logging
 import time
 import argparse
-import numpy as np
 
 from math import pi
 from enum import Enum
 
-from andes_addon.dime import Dime
-
-from numpy import array, ndarray, zeros
-
-from synchrophasor.pmu import Pmu
-from synchrophasor.frame import ConfigFrame2, HeaderFrame
-
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
 
@@ -32,6 +27,14 @@ logger.setLevel(logging.WARNING)
 # -----------------------------
 
 
+# Layout of the C37.118 frames streamed by MiniPMU. See `MiniPMU.config_pmu`
+DATA_FORMAT = (True, True, True, True)  # Data format - POLAR; PH - REAL; AN - REAL; FREQ - REAL;
+PHASOR_NUM = 1
+ANALOG_NUM = 1
+DIGITAL_NUM = 1
+DATA_RATE = 30
+
+
 class RecordState(Enum):
     """PMU record-replay state"""
     IDLE = 0
@@ -76,7 +79,10 @@ class MiniPMU(object):
 
         self.reset_var()
 
-        self.dimec = Dime(self.name, self.dime_address)
+        from ltbnet.dime import make_dime
+        from synchrophasor.pmu import Pmu
+
+        self.dimec = make_dime(self.name, self.dime_address)
         self.pmu = Pmu(ip=pmu_ip, port=pmu_port)
 
     def reset_var(self, retain_data=False):
@@ -87,11 +93,14 @@ class MiniPMU(object):
         if not self.reset:
             return
 
+        from numpy import ndarray
+
         self.bus_name = []
         self.var_idx = {'am': [],
                         'vm': [],
                         'w': [],
                         }
+        self.vgsvaridx = ndarray([0], dtype=int)
 
         self.fn = 60
         self.Vn = []
@@ -177,16 +186,17 @@ class MiniPMU(object):
 
         :return: None
         """
+        from synchrophasor.frame import ConfigFrame2, HeaderFrame
 
         self.cfg = ConfigFrame2(pmu_id_code=self.pmu_idx[0],  # PMU_ID
                            time_base=1000000,  # TIME_BASE
                            num_pmu=1,  # Number of PMUs included in data frame
                            station_name=self.bus_name[0],  # Station name
                            id_code=self.pmu_idx[0],  # Data-stream ID(s)
-                           data_format=(True, True, True, True),  # Data format - POLAR; PH - REAL; AN - REAL; FREQ - REAL;
-                           phasor_num=1,  # Number of phasors
-                           analog_num=1,  # Number of analog values
-                           digital_num=1,  # Number of digital status words
+                           data_format=DATA_FORMAT,  # Data format - POLAR; PH - REAL; AN - REAL; FREQ - REAL;
+                           phasor_num=PHASOR_NUM,  # Number of phasors
+                           analog_num=ANALOG_NUM,  # Number of analog values
+                           digital_num=DIGITAL_NUM,  # Number of digital status words
                             channel_names=["V_PHASOR", "ANALOG1", "BREAKER 1 STATUS",
                             "BREAKER 2 STATUS", "BREAKER 3 STATUS", "BREAKER 4 STATUS", "BREAKER 5 STATUS",
                             "BREAKER 6 STATUS", "BREAKER 7 STATUS", "BREAKER 8 STATUS", "BREAKER 9 STATUS",
@@ -197,7 +207,7 @@ class MiniPMU(object):
                            dig_units=[(0x0000, 0xffff)],  # Mask words for digital status words
                            f_nom=60.0,  # Nominal frequency
                            cfg_count=1,  # Configuration change count
-                           data_rate=30)  # Rate of phasor data transmission)
+                           data_rate=DATA_RATE)  # Rate of phasor data transmission)
 
         self.hf = HeaderFrame(self.pmu_idx[0],  # PMU_ID
                               "MiniPMU <{name}> {pmu_idx}".format(name=self.name, pmu_idx = self.pmu_idx))  # Header Message
@@ -226,12 +236,9 @@ class MiniPMU(object):
         self.var_idx['am'] = [npmu + int(i) - 1 for i in self.pmu_idx]
         self.var_idx['w'] = [2 * npmu + int(i) - 1 for i in self.pmu_idx]
 
-    # TODO: make it static
-    @property
-    def vgsvaridx(self):
-        return array(self.var_idx['vm'] +
-                     self.var_idx['am'] +
-                     self.var_idx['w'], dtype=int)
+        # column indices of the PMU variables in ``pmudata``, built once per reset
+        from numpy import array
+        self.vgsvaridx = array(self.var_idx['vm'] + self.var_idx['am'] + self.var_idx['w'], dtype=int)
 
     def init_storage(self, flush=False):
         """
@@ -239,10 +246,11 @@ class MiniPMU(object):
 
         :return: if the storage has been reset
         """
-        # TODO: make it more efficient??
         ret = False
 
         if self.count % self.max_store == 0:
+            from numpy import zeros  # only on a reset, not for every frame
+
             self.t = zeros(shape=(self.max_store, 1), dtype=float)
             self.data = zeros(shape=(self.max_store, len(self.pmu_idx * 3)),
                               dtype=float)
@@ -252,6 +260,8 @@ class MiniPMU(object):
             ret = False
 
         if (self.count_record % self.max_store_record == 0) or (flush is True):
+            from numpy import zeros
+
             self.t_record = zeros(shape=(self.max_store_record, 1),
                                   dtype=float)
             self.data_record = zeros(shape=(self.max_store_record,
@@ -310,51 +320,7 @@ class MiniPMU(object):
             self.reset_var(retain_data=True)
 
         elif var == 'pmucmd' and isinstance(data, dict):
-            cmd = ''
-            if data.get('record', 0) == 1:
-                # start recording
-                if self.record_state == RecordState.IDLE \
-                        or self.record_state == RecordState.RECORDED:
-
-                    self.record_state = RecordState.RECORDING
-                    cmd = 'start recording'
-                # else:
-                #     logger.warning('cannot start recording in state {}'
-                #                    .format(self.record_state))
-
-            elif data.get('record', 0) == 2:
-                # stop recording if started
-                if self.record_state == RecordState.RECORDING:
-                    cmd = 'stop recording'
-                    self.record_state = RecordState.RECORDED
-                # else:
-                #     logger.warning('cannot stop recording in state {}'
-                #                    .format(self.record_state))
-
-            if data.get('replay', 0) == 1:
-                # start replay
-                if self.record_state == RecordState.RECORDED:
-                    cmd = 'start replay'
-                    self.record_state = RecordState.REPLAYING
-                # else:
-                #     logger.warning('cannot start replaying in state {}'
-                #                    .format(self.record_state))
-            if data.get('replay', 0) == 2:
-                # stop replay but retain the saved data
-                if self.record_state == RecordState.REPLAYING:
-                    cmd = 'stop replay'
-                    self.record_state = RecordState.RECORDED
-                # else:
-                #     logger.warning('cannot stop replaying in state {}'
-                #                    .format(self.record_state))
-            if data.get('flush', 0) == 1:
-                # flush storage
-                cmd = 'flush storage'
-                self.init_storage(flush=True)
-                self.record_state = RecordState.IDLE
-
-            # if cmd:
-            #     logger.info('[{name}] <{cmd}>'.format(name=self.name, cmd=cmd))
+            self.handle_pmucmd(data)
 
         # else:
         #     logger.info('[{name}] {cmd} not handled during normal ops'
@@ -362,6 +328,74 @@ class MiniPMU(object):
 
         return var
 
+    def handle_pmucmd(self, data):
+        """
+        Apply the record/replay commands in `data`, which may be a batch with list fields,
+        and acknowledge them to the sender if they carry sequence numbers. See
+        `ltbnet.command`.
+
+        :return: list of the applied commands
+        """
+        from ltbnet.command import ack, split
+
+        cmds = [self.apply_pmucmd(item) for item in split(data)]
+        ack(self.dimec, data)
+        return cmds
+
+    def apply_pmucmd(self, data):
+        """
+        Apply one record/replay command
+
+        :return: description of the applied command, empty if none
+        """
+        cmd = ''
+        if data.get('record', 0) == 1:
+            # start recording
+            if self.record_state == RecordState.IDLE \
+                    or self.record_state == RecordState.RECORDED:
+
+                self.record_state = RecordState.RECORDING
+                cmd = 'start recording'
+            # else:
+            #     logger.warning('cannot start recording in state {}'
+            #                    .format(self.record_state))
+
+        elif data.get('record', 0) == 2:
+            # stop recording if started
+            if self.record_state == RecordState.RECORDING:
+                cmd = 'stop recording'
+                self.record_state = RecordState.RECORDED
+            # else:
+            #     logger.warning('cannot stop recording in state {}'
+            #                    .format(self.record_state))
+
+        if data.get('replay', 0) == 1:
+            # start replay
+            if self.record_state == RecordState.RECORDED:
+                cmd = 'start replay'
+                self.record_state = RecordState.REPLAYING
+            # else:
+            #     logger.warning('cannot start replaying in state {}'
+            #                    .format(self.record_state))
+        if data.get('replay', 0) == 2:
+            # stop replay but retain the saved data
+            if self.record_state == RecordState.REPLAYING:
+                cmd = 'stop replay'
+                self.record_state = RecordState.RECORDED
+            # else:
+            #     logger.warning('cannot stop replaying in state {}'
+            #                    .format(self.record_state))
+        if data.get('flush', 0) == 1:
+            # flush storage
+            cmd = 'flush storage'
+            self.init_storage(flush=True)
+            self.record_state = RecordState.IDLE
+
+        # if cmd:
+        #     logger.info('[{name}] <{cmd}>'.format(name=self.name, cmd=cmd))
+
+        return cmd
+
     def handle_measurement_data(self, data):
         """
         Store synced data into self.data and return in a tuple of (t, values)
@@ -501,7 +535,7 @@ def main():
                         help='PMU instance name', type=str)
     parser.add_argument('-a', '--dime_address',
                         default='tcp://192.168.1.200:5000',
-                        help='DiME server address')
+                        help='DiME server address, or local:///path for the local broker')
     parser.add_argument('--fn', default=60,
                         help='nominal frequency (Hz)', type=int)
     parser.add_argument('--vn', default=1, help='voltage base (kV)')
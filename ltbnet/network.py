@@ -8,10 +8,12 @@ from mininet.topo import Topo
 from mininet.link import Intf, TCIntf
 
 from mininet import log
-from mininet.node import Node
 
+from ltbnet import validate
 from ltbnet.utils import check_intf
-from ltbnet.minipmu import MiniPMU
+from ltbnet.parser import FIELDS, format_delay
+from ltbnet import gateways as gw
+from ltbnet.addressing import SubnetAllocator
 
 
 class Network(Topo):
@@ -28,6 +30,9 @@ class Network(Topo):
         self.TCHwIntf = TCHwIntf()
 
         self.components = []
+        self.subnets = {}  # region, or (region, switch), to the allocated subnet
+        self.routes = {}  # node mn_name to the (destination, gateway, interface) routes
+        self.gateways = []  # `ltbnet.gateways.Gateway` between regions
 
     def add(self, config, **kwargs):
         for item in config:
@@ -38,12 +43,14 @@ class Network(Topo):
                 if ty not in self.components:
                     self.components.append(ty)
 
-    def setup(self, config):
-        """Convenient function wrapper to setup a network from config"""
+    def setup(self, config, **kwargs):
+        """Convenient function wrapper to setup a network from config. `kwargs` are passed to `assign_ip`.
+        Raises a `ConfigError` with all reference and connectivity errors before any setup"""
         self.add(config)
+        validate.check(self)
         self.setup_by_region()
         self.build_mn_name()
-        self.assign_ip()
+        self.assign_ip(**kwargs)
         self.add_node_to_mn()
         self.add_link_to_mn()
         return self
@@ -54,9 +61,7 @@ class Network(Topo):
         """
         lines = []
 
-        header = ['Idx', 'Type', 'Region', 'Name', 'Longitude', 'Latitude', 'MAC', 'IP',
-                  'PMU_IDX', 'From', 'To', 'Delay', 'BW', 'Loss', 'Jitter']
-        lines.append(header)
+        lines.append(list(FIELDS))
 
         for item in self.components:
             lines.extend(self.__dict__[item].dump())
@@ -119,35 +124,99 @@ class Network(Topo):
         for item in self.components:
             self.__dict__[item].build_mn_name()
 
-    def assign_ip(self, base='192.168.1.'):
-        """Assign IP address in a LAN"""
+    def assign_ip(self, supernet='10.0.0.0/8', region_prefix=16, switch_prefix=None, routes=(), gateways=False):
+        """
+        Assign IP addresses to PDCs and PMUs from one subnet per region, and optionally per switch
+
+        Explicit `IP` fields are kept. The routes between the subnets are stored in `self.routes`
+        and installed by `add_routes` once the network is started. Without gateways, the subnets
+        are joined by on-link routes in one layer-2 broadcast domain. With gateways, the links
+        between regions are replaced by the routers in `self.gateways`; see `ltbnet.gateways`.
+
+        Parameters
+        ----------
+        supernet
+            address space of the allocated subnets
+        region_prefix
+            prefix length of the subnet of each region
+        switch_prefix
+            prefix length of the subnet of each switch. Use None for one subnet per region
+        routes
+            additional networks, such as the DiME server LAN, to be reachable from every host
+        gateways
+            bound the broadcast domain of every region with gateways between regions
+        """
+        allocator = SubnetAllocator(supernet, region_prefix, switch_prefix)
+        hosts = (self.PDC, self.PMU)
 
-        # for item in self.components:
-        #     self.__dict__[item].ip = [''] * self.__dict__[item].n
+        for item in hosts:
+            for ip in item.ip:
+                if ip:
+                    allocator.reserve(ip)
 
-        count = 1
+        switch_of = self.host_switch() if switch_prefix is not None else {}
 
-        # for PDCs
-        # self.PDC.ip = [''] * self.PDC.n
-        for i in range(self.PDC.n):
-            count += 1
-            if self.PDC.ip[i]:
-                continue
-            self.PDC.ip[i] = base + str(count)
+        for item in hosts:
+            for i in range(item.n):
+                if item.ip[i]:
+                    continue
+                item.ip[i] = allocator.allocate(item.region[i], switch_of.get(item.idx[i]))
 
-        # for PMUs
-        # self.PMU.ip = [''] * self.PMU.n
-        for i in range(self.PMU.n):
-            count += 1
-            if self.PMU.ip[i]:
-                continue
+        self.subnets = dict(allocator.region_subnets)
+        self.subnets.update(allocator.switch_subnets)
 
-            self.PMU.ip[i] = base + str(count)
+        if gateways:
+            self.gateways = gw.plan(self, allocator)
+            self.routes = gw.routes(self, self.gateways, allocator.region_subnets, routes)
+            self.subnets = dict(allocator.region_subnets)
+            self.subnets.update(allocator.switch_subnets)
+            return
+
+        host_ip = {}
+        for item in hosts:
+            host_ip.update(zip(item.mn_name, item.ip))
+        self.routes = {name: [(dest, None, None) for dest in dests]
+                       for name, dests in allocator.routes(host_ip, routes).items()}
+
+    def host_switch(self):
+        """Return a dictionary of host Idx to the Idx of the switch it is linked to"""
+        out = {}
+        for fr, to in zip(self.Link.fr, self.Link.to):
+            if fr in self.Switch.index and to not in self.Switch.index:
+                out[to] = fr
+            elif to in self.Switch.index and fr not in self.Switch.index:
+                out[fr] = to
+        return out
+
+    def region_pdc(self):
+        """Return a dictionary of PMU Idx to the Idx of the (first) PDC in the same region"""
+        pdc_of_region = {}
+        for idx, region in zip(self.PDC.idx, self.PDC.region):
+            pdc_of_region.setdefault(region, idx)
+
+        return {idx: pdc_of_region[region] for idx, region in zip(self.PMU.idx, self.PMU.region)
+                if region in pdc_of_region}
+
+    def add_routes(self, net, hosts=None):
+        """Install the routes in `self.routes` on the started Mininet hosts and gateways, or on `hosts` only"""
+        for name, entries in self.routes.items():
+            if not entries or (hosts is not None and name not in hosts):
+                continue
+            node = net.get(name)
+            cmds = []
+            for dest, via, intf in entries:
+                cmd = 'ip route add {d}'.format(d=dest)
+                if via:
+                    cmd += ' via {g}'.format(g=via)
+                cmds.append(cmd + ' dev {i}'.format(i=intf or node.defaultIntf()))
+            node.cmd('; '.join(cmds))
 
     def add_node_to_mn(self):
         for item in self.components:
             # log.info('Adding {n} <{ty}> to the network...'.format(n=self.__dict__[item].n, ty=item))
             self.__dict__[item].add_node_to_mn(self)
+        for g in self.gateways:
+            self.addHost(g.name, cls=gw.LinuxRouter, ip=g.ips[0])
 
     def add_link_to_mn(self):
         for item in self.components:
@@ -155,42 +224,60 @@ class Network(Topo):
             self.__dict__[item].add_link_to_mn(self)
 
     def to_canonical(self, idx):
-        if idx in self.Switch.idx:
-            return self.Switch.mn_name[self.Switch.idx.index(idx)]
+        if idx in self.Switch.index:
+            return self.Switch.mn_name[self.Switch.index[idx]]
         else:
             return idx
 
-    def add_hw_intf(self, net):
-        """Add hardware interfaces from Network.HwIntf records"""
+    def add_hw_intf(self, net, nodes=None):
+        """Add hardware interfaces from Network.HwIntf records, or those on switches with Idx
+        in `nodes`"""
         for i, name, to in zip(range(self.HwIntf.n), self.HwIntf.name, self.HwIntf.to):
+            if nodes is not None and to not in nodes:
+                continue
             switch_index = self.Switch.lookup_index(to)
             log.info('*** Adding hardware interface', name, 'to switch', to, '\n')
 
-            r = Intf(name, node=net.switches[switch_index])
+            r = Intf(name, node=net.get(self.Switch.mn_name[switch_index]))
 
-    def add_tc_hw_intf(self, net):
-        """Add traffic controlled hardware interfaces from Network.TCHwIntf records"""
+    def add_tc_hw_intf(self, net, nodes=None):
+        """Add traffic controlled hardware interfaces from Network.TCHwIntf records, or those on
+        switches with Idx in `nodes`"""
         for i, name, to, delay, bw, loss, jitter in zip(
                 range(self.TCHwIntf.n), self.TCHwIntf.name, self.TCHwIntf.to, self.TCHwIntf.delay, self.TCHwIntf.bw,
                       self.TCHwIntf.loss, self.TCHwIntf.jitter):
+            if nodes is not None and to not in nodes:
+                continue
             switch_index = self.Switch.lookup_index(to)
 
-            d = delay
-            b = float(bw) if bw is not None else None
-            l = float(loss) if loss is not None else None
-            j = float(jitter) if jitter is not None else None
+            d = format_delay(delay)
+            b = bw
+            l = loss
+            j = jitter
 
             log.info('*** Adding traffic controlled hardware interface', name, 'to switch', to, '\n')
             log.info('')
-            r = TCIntf(name, node=net.switches[switch_index], delay=d, loss=l, bw=b, jitter=j)
+            r = TCIntf(name, node=net.get(self.Switch.mn_name[switch_index]), delay=d, loss=l, bw=b, jitter=j)
 
-    def dump_sw_port_node(self, net):
+    def dump_sw_port_node(self, net, path='sw_port_node.csv'):
+        """Dump the switch-port-host mapping from `sw_port_node` to a csv file"""
+        header, rows = self.sw_port_node(net)
+
+        with open(path, 'w') as f:
+            writer = csv.writer(f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+            writer.writerow(header)
+            for item in rows:
+                writer.writerow(item)
+
+    def sw_port_node(self, net):
         """
-        Dump the switch-port-host mapping
+        Return the switch-port-host mapping
 
         Returns
         -------
-
+        tuple
+            (header, rows) where each row has the fields in `header`
         """
         idx_list = []
         sw_list = []
@@ -243,13 +330,9 @@ class Network(Topo):
                 target_intf_name_list.append(target_intf_name)
                 target_node_name_list.append(target_name)
 
-        with open("sw_port_node.csv", 'w') as f:
-            writer = csv.writer(f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-
-            writer.writerow(header)
-            for item in zip(idx_list, sw_list, sw_id_list, sw_mac_list, sw_intf_id_list, sw_intf_name_list,
-                                 target_intf_name_list, target_node_name_list):
-                writer.writerow(item)
+        rows = list(zip(idx_list, sw_list, sw_id_list, sw_mac_list, sw_intf_id_list, sw_intf_name_list,
+                        target_intf_name_list, target_node_name_list))
+        return header, rows
 
 
 
@@ -264,6 +347,7 @@ class Record(object):
 
         self.n = 0
         self.idx = []
+        self.index = {}  # idx to position in the record lists
         self.name = []
         self.coords = []
         self.mac = []
@@ -288,8 +372,9 @@ class Record(object):
         pass
 
     def add(self, Type=None, Longitude=None, Latitude=None, MAC=None,
-            Idx=None, Name='', Region='', IP='',
-            PMU_IDX='', Delay='', BW='', Loss='', Jitter='', From='', To='', **kwargs):
+            Idx=None, Name='', Region=None, IP=None,
+            PMU_IDX=None, Delay=None, BW=None, Loss=None, Jitter=None, From=None, To=None, **kwargs):
+        """Add a record from a typed config row as produced by `ltbnet.parser.parse_config`"""
 
         if not self._name:
             log.error('Device name not initialized')
@@ -298,81 +383,66 @@ class Record(object):
         if Type != self._name:
             return
 
-        mac = None if MAC == 'None' else MAC
         idx = self._name + '_' + str(self.n) if not Idx else Idx
-        pmu_idx = None if PMU_IDX == 'None' else int(PMU_IDX)
 
-        if idx in self.idx:
+        if idx in self.index:
             log.error('PMU Idx <{i}> conflict.'.format(i=idx))
-
-        def to_type(var):
-            """Helper function to convert field to a list or a None object """
-            if var == 'None':
-                out = None
-            else:
-                out = var
-            return out
-
-        delay = to_type(Delay)
-        bw = to_type(BW)
-        loss = to_type(Loss)
-        jitter = to_type(Jitter)
-        fr = to_type(From)
-        to = to_type(To)
-
-        lat = None if Latitude == 'None' else float(Latitude)
-        lon = None if Longitude == 'None' else float(Longitude)
+        else:
+            self.index[idx] = self.n
 
         self.name.append(Name)
         self.region.append(Region)
-        self.coords.append((lat, lon))
+        self.coords.append((Latitude, Longitude))
         self.ip.append(IP)
 
-        self.mac.append(mac)
+        self.mac.append(MAC)
         self.idx.append(idx)
         # self.connections.append(conn)
 
-        self.pmu_idx.append(pmu_idx)
-        self.delay.append(delay)
-        self.bw.append(bw)
-        self.loss.append(loss)
-        self.jitter.append(jitter)
-        self.fr.append(fr)
-        self.to.append(to)
+        self.pmu_idx.append(PMU_IDX)
+        self.delay.append(Delay)
+        self.bw.append(BW)
+        self.loss.append(Loss)
+        self.jitter.append(Jitter)
+        self.fr.append(From)
+        self.to.append(To)
 
         self.n += 1
 
     def lookup_index(self, idx, canonical=False):
         """Return the numerical index of the the element `idx`"""
-        records = self.idx
-        if canonical:
-            records = self.mn_name
+        if not canonical:
+            return self.index.get(idx, -1)
 
+        records = self.mn_name
         if idx not in records:
             return -1
         return records.index(idx)
 
     def dump(self):
-        """Return a string of the dumped records in csv format"""
+        """Return the records as lists of fields in the order of `ltbnet.parser.FIELDS`"""
         ret = []
 
-        # TODO: fix deprecated function
+        def fmt(value):
+            return 'None' if value is None else value
 
         for i in range(self.n):
 
             line = [self.idx[i],
                     self._name,
-                    self.region[i],
-                    self.name[i],
-                    str(self.coords[i][1]),
-                    str(self.coords[i][0]),
-                    self.mac[i] if self.mac[i] else 'None',
-                    self.ip[i] if self.ip[i] else 'None',
-                    self.pmu_idx[i] if self.pmu_idx[i] else 'None',
-                    self.delay[i] if self.pmu_idx[i] else 'None',
-                    self.bw[i] if self.bw[i] else 'None',
-                    self.loss[i] if self.loss[i] else 'None',
-                    self.jitter[i] if self.jitter[i] else 'None'
+                    fmt(self.region[i]),
+                    fmt(self.name[i]),
+                    fmt(self.coords[i][1]),
+                    fmt(self.coords[i][0]),
+                    fmt(self.mac[i]),
+                    fmt(self.ip[i]),
+                    fmt(self.pmu_idx[i]),
+                    fmt(self.fr[i]),
+                    fmt(self.to[i]),
+                    fmt(format_delay(self.delay[i])),
+                    fmt(self.bw[i]),
+                    fmt(self.loss[i]),
+                    fmt(self.jitter[i]),
                     ]
 
             ret.append(line)
@@ -419,10 +489,16 @@ class Region(Record):
 
 class PMU(Record):
     """Data streaming PMU node class"""
-    def run_pmu(self, network):
-        """Run MiniPMU on the defined PMU nodes"""
+    def run_pmu(self, network, dime_address=None, nodes=None):
+        """Run MiniPMU on the defined PMU nodes, or on those with Idx in `nodes`, connecting to
+        `dime_address` if given. Return the started processes"""
         run_minipmu = 'minipmu {port} {pmu_idx} -n={name}'
+        if dime_address:
+            run_minipmu += ' -a={}'.format(dime_address)
+        procs = []
         for i in range(self.n):
+            if nodes is not None and self.idx[i] not in nodes:
+                continue
             name = self.mn_name[i]
             node = network.get(name)
             pmu_name = self.name[i]
@@ -435,14 +511,38 @@ class PMU(Record):
                                           name=pmu_name,
                                           )
 
-            node.popen(call_str)
+            procs.append(node.popen(call_str))
             log.info('{name} idx={idx} started\n'.format(name=pmu_name, idx=pmu_idx))
             time.sleep(0.02)
+        return procs
 
 
 class PDC(Record):
     """Data streaming PDC class"""
-    pass
+    def run_pdc(self, net, network, nodes=None):
+        """Run MiniPDC on the defined PDC nodes, or on those with Idx in `nodes`, to concentrate and
+        re-stream the PMUs of their regions. Return the started processes"""
+        run_minipdc = 'minipdc --pmu {pmu} --idcode {idcode} -n={name}'
+        members = {}
+        for pmu, pdc in network.region_pdc().items():
+            ip = network.PMU.ip[network.PMU.index[pmu]]
+            if ip:
+                members.setdefault(pdc, []).append(ip.split('/')[0])
+
+        procs = []
+        for i in range(self.n):
+            pmus = members.get(self.idx[i])
+            if not pmus or (nodes is not None and self.idx[i] not in nodes):
+                continue
+            name = self.mn_name[i]
+            call_str = run_minipdc.format(pmu=','.join(pmus),
+                                          idcode=i + 1,
+                                          name='PDC_' + name,
+                                          )
+
+            procs.append(net.get(name).popen(call_str))
+            log.info('PDC_{name} started with {n} PMUs\n'.format(name=name, n=len(pmus)))
+        return procs
 
 
 class Switch(Record):
@@ -466,29 +566,26 @@ class Link(Record):
         super(Link, self).__init__()
         self.links = []
         self.obj = []
+        self.directed = set()  # registered (fr, to) pairs
+        self.undirected = set()  # frozensets of registered endpoints
 
     def register(self, fr, to, idx):
         self.links.append((fr, to))
         self.obj.append(idx)
+        self.directed.add((fr, to))
+        self.undirected.add(frozenset((fr, to)))
 
     def exist_undirectioned(self, fr, to):
         """Check if the undirectional path from `fr` to `to` exists"""
-
-        if self.exist_directioned(fr, to) or self.exist_directioned(to, fr):
-            return True
-        else:
-            return False
+        return frozenset((fr, to)) in self.undirected
 
     def exist_directioned(self, fr, to):
         """Check if the directional path from `fr` to `to` exists"""
-        ret = False
-        if (fr, to) in self.links:
-            ret = True
-
-        return ret
+        return (fr, to) in self.directed
 
     def add_link_to_mn(self, network):
         """Method to add links from each element to the connections"""
+        border = {g.link: g for g in network.gateways}
 
         for i, name, fr, to, delay, bw, loss, jitter in \
                 zip(range(self.n), self.mn_name, self.fr, self.to, self.delay, self.bw, self.loss, self.jitter):
@@ -497,19 +594,23 @@ class Link(Record):
             to = network.to_canonical(to)
 
             # check for optional link configs
-            d = delay
-            b = float(bw) if bw is not None else None
-
-            l = None
-            if loss:
-                l = float(loss)
-            j = float(jitter) if jitter is not None else None
+            d = format_delay(delay)
+            b = bw
+            l = loss if loss else None
+            j = jitter
 
-            if not network.Link.exist_undirectioned(fr, to):
+            if network.Link.exist_undirectioned(fr, to):
+                continue
+            if i in border:
+                # the gateway takes the place of the link, shaped on its leg toward `fr`
+                g = border[i]
+                r = network.addLink(fr, g.name, delay=d, bw=b, loss=l, jitter=j, params2={'ip': g.ips[0]})
+                network.addLink(g.name, to, params1={'ip': g.ips[1]})
+            else:
                 r = network.addLink(fr, to, delay=d, bw=b, loss=l, jitter=j)
-                # register the link element to the LTBNet object
-                network.Link.register(fr, to, r)
-                # log.debug('Adding link <{fr}> to <{to}>.'.format(fr=name, to=c))
+            # register the link element to the LTBNet object
+            network.Link.register(fr, to, r)
+            # log.debug('Adding link <{fr}> to <{to}>.'.format(fr=name, to=c))
 
 
 class HwIntf(Record):
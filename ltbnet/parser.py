@@ -1,51 +1,330 @@
+"""Streaming parsers for LTBNet config files.
+
+Both formats yield one row at a time as a dictionary of typed values (floats, ints,
+delay in seconds and None for `'None'` or empty fields) according to the per-`Type`
+schema below. Validation errors are collected with line numbers while streaming and
+raised together in a single `ConfigError` once the file is exhausted.
+"""
+
 import os
+import re
+import csv
 import json
+import warnings
 
+FIELDS = ('Idx', 'Type', 'Region', 'Name', 'Longitude', 'Latitude', 'MAC', 'IP',
+          'PMU_IDX', 'From', 'To', 'Delay', 'BW', 'Loss', 'Jitter')
 
-def parse_config_csv(file, path=''):
-    """Parses an LTBNet config.csv file and return the contents in a list of dictionaries"""
-    keys = list()
-    out = list()
-    flag = False
-    with open(os.path.join(path, file)) as f:
-        for num, line in enumerate(f):
-            if not line.strip():
-                continue
+# fields that apply to every component type
+COMMON = ('Idx', 'Type', 'Region', 'Name', 'Longitude', 'Latitude', 'MAC', 'IP')
+
+# per-`Type` schema: (additional fields, required fields)
+SCHEMA = {
+    'Region': ((), ()),
+    'Switch': ((), ()),
+    'Router': ((), ()),
+    'PDC': ((), ()),
+    'PMU': (('PMU_IDX',), ('PMU_IDX',)),
+    'Link': (('From', 'To', 'Delay', 'BW', 'Loss', 'Jitter'), ('From', 'To')),
+    'HwIntf': (('To', 'Delay', 'BW', 'Loss', 'Jitter'), ('To',)),
+    'TCHwIntf': (('To', 'Delay', 'BW', 'Loss', 'Jitter'), ('To',)),
+}
+
+DELAY_UNITS = {'s': 1., 'ms': 1e-3, 'us': 1e-6, 'usec': 1e-6, 'msec': 1e-3, 'sec': 1.}
+
+_delay_re = re.compile(r'^\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([a-z]+)\s*$')
+
+
+class ConfigError(ValueError):
+    """Errors found in an LTBNet config file. `errors` is a list of (line, message) tuples"""
+    def __init__(self, errors, file=''):
+        self.errors = list(errors)
+        self.file = file
+
+        lines = ['{n} error(s) in config{f}'.format(n=len(self.errors), f=' ' + file if file else '')]
+        for line, msg in self.errors:
+            lines.append('  line {l}: {m}'.format(l=line, m=msg) if line else '  {m}'.format(m=msg))
+        super(ConfigError, self).__init__('\n'.join(lines))
+
+
+def to_none(value):
+    """Return None for the literal `'None'`, empty strings and None, else the stripped value"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value in ('', 'None'):
+            return None
+    return value
+
+
+def to_str(value):
+    value = to_none(value)
+    return None if value is None else str(value)
+
+
+def to_float(value):
+    value = to_none(value)
+    return None if value is None else float(value)
+
+
+def to_int(value):
+    value = to_none(value)
+    if value is None:
+        return None
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError('{v} is not an integer'.format(v=value))
+    return int(value)
+
+
+def parse_delay(value):
+    """Convert a delay string with a unit, such as `5ms`, to seconds"""
+    value = to_none(value)
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        raise ValueError('delay {v} has no unit'.format(v=value))
+
+    match = _delay_re.match(value)
+    if not match or match.group(2) not in DELAY_UNITS:
+        raise ValueError('invalid delay <{v}>, expected a value with a unit such as 5ms'.format(v=value))
+
+    return float(match.group(1)) * DELAY_UNITS[match.group(2)]
+
+
+def format_delay(seconds):
+    """Format a delay in seconds as a tc/Mininet delay string such as `5ms`"""
+    if seconds is None:
+        return None
+    return '{:g}ms'.format(round(seconds * 1e3, 6))
+
+
+CONVERTERS = {
+    'Idx': to_str,
+    'Type': to_str,
+    'Region': to_str,
+    'Name': to_str,
+    'Longitude': to_float,
+    'Latitude': to_float,
+    'MAC': to_str,
+    'IP': to_str,
+    'PMU_IDX': to_int,
+    'From': to_str,
+    'To': to_str,
+    'Delay': parse_delay,
+    'BW': to_float,
+    'Loss': to_float,
+    'Jitter': to_float,
+}
+
+
+def convert_row(raw, line, errors):
+    """
+    Convert a raw row into typed values according to `SCHEMA`
+
+    Fields that do not apply to the row `Type` are set to None. Errors are appended to
+    `errors` as (line, message) tuples.
+
+    Returns
+    -------
+    dict or None
+        the typed row, or None if the row is invalid
+    """
+    ty = to_str(raw.get('Type'))
+    if ty not in SCHEMA:
+        errors.append((line, 'unknown Type <{t}>'.format(t=ty)))
+        return None
+
+    extra, required = SCHEMA[ty]
+    row = dict.fromkeys(FIELDS)
+    failed = set()
 
-            if line.startswith('#'):
+    for field in COMMON + extra:
+        try:
+            row[field] = CONVERTERS[field](raw.get(field))
+        except (TypeError, ValueError) as e:
+            errors.append((line, '{t} <{i}> field {f}: {e}'.format(t=ty, i=raw.get('Idx'), f=field, e=e)))
+            failed.add(field)
+
+    for field in required:
+        if row[field] is None and field not in failed:
+            errors.append((line, '{t} <{i}> requires field {f}'.format(t=ty, i=row['Idx'], f=field)))
+            failed.add(field)
+
+    return None if failed else row
+
+
+def iter_config_csv(file, path='', errors=None):
+    """Yield typed rows from an LTBNet config.csv file. Errors are appended to `errors`"""
+    errors = [] if errors is None else errors
+    keys = None
+
+    with open(os.path.join(path, file), newline='') as f:
+        reader = csv.reader(f)
+        for data in reader:
+            if not data or not ''.join(data).strip():
                 continue
-            data = line.strip().split(',')
+            if data[0].lstrip().startswith('#'):
+                continue
+
+            data = [x.strip() for x in data]
 
             # Use the first valid line as the keys
-            if not flag:
+            if keys is None:
                 keys = data
-                flag = True
                 continue
 
-            out.append({k: v for k, v in zip(keys, data)})
+            if len(data) < len(keys):
+                errors.append((reader.line_num, 'expected {k} fields, got {n}'.format(k=len(keys), n=len(data))))
+                continue
 
-    return out
+            row = convert_row(dict(zip(keys, data)), reader.line_num, errors)
+            if row is not None:
+                yield row
 
 
-def parse_config_json(file, path=''):
+def _value_end(buf, pos):
     """
-    Parse an LTBNet config.json file and return the data in a list of dictionaries
+    Return the end of the JSON value starting at `pos` by matching brackets and strings
+    only, or None if `buf` ends before it. A value that is not an object or a list ends
+    before the next `,` or `]`.
     """
+    depth = 0
+    string = escape = False
+    for i in range(pos, len(buf)):
+        c = buf[i]
+        if string:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == '"':
+                string = False
+        elif c == '"':
+            string = True
+        elif c in '{[':
+            depth += 1
+        elif c in '}]':
+            if depth == 0:
+                return i
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        elif c == ',' and depth == 0:
+            return i
+    return None
+
+
+def _iter_json_array(f, errors, chunk_size=1 << 16):
+    """Yield (line, object) for each element of a top-level JSON array, reading `f` in chunks"""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    line = 1
+    eof = False
+    started = False
+
+    while True:
+        # skip whitespace and separators, loading more data as needed
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                if buf[pos] == '\n':
+                    line += 1
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        if pos >= len(buf):
+            errors.append((line, 'unexpected end of file'))
+            return
+
+        if not started:
+            if buf[pos] != '[':
+                errors.append((line, 'expected a list of components'))
+                return
+            started = True
+            pos += 1
+            continue
+
+        if buf[pos] == ']':
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError as e:
+            end = _value_end(buf, pos)
+            if end is None and not eof:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+
+            # report the malformed component and resume after it
+            errors.append((line + buf.count('\n', pos, e.pos), 'invalid JSON: {e}'.format(e=e.msg)))
+            if end is None:
+                return
+            line += buf.count('\n', pos, end)
+            pos = max(end, pos + 1)
+            continue
+
+        yield line, obj
+        line += buf.count('\n', pos, end)
+        pos = end
+
+
+def iter_config_json(file, path='', errors=None):
+    """Yield typed rows from an LTBNet config.json file. Errors are appended to `errors`"""
+    errors = [] if errors is None else errors
+
     with open(os.path.join(path, file)) as f:
-        out = json.load(f)
+        for line, obj in _iter_json_array(f, errors):
+            if not isinstance(obj, dict):
+                errors.append((line, 'expected an object, got {t}'.format(t=type(obj).__name__)))
+                continue
+            row = convert_row(obj, line, errors)
+            if row is not None:
+                yield row
+
 
-    return out
+def parse_config_csv(file, path=''):
+    """Deprecated. Return the typed rows of an LTBNet config.csv file in a list; use `parse_config`"""
+    warnings.warn('parse_config_csv is deprecated; use parse_config', DeprecationWarning, stacklevel=2)
+    return list(parse_config(file, path, fmt='.csv'))
+
+
+def parse_config_json(file, path=''):
+    """Deprecated. Return the typed rows of an LTBNet config.json file in a list; use `parse_config`"""
+    warnings.warn('parse_config_json is deprecated; use parse_config', DeprecationWarning, stacklevel=2)
+    return list(parse_config(file, path, fmt='.json'))
+
+
+def _stream(iterator, file, path):
+    errors = []
+    for row in iterator(file, path, errors):
+        yield row
+
+    if errors:
+        raise ConfigError(errors, os.path.join(path, file))
 
 
 def parse_config(file, path='', fmt=None):
+    """
+    Return an iterator of typed rows from an LTBNet config file in CSV or JSON format
+
+    All validation errors are raised together as a `ConfigError` after the valid rows
+    have been yielded.
+    """
     if fmt is None:
         name, fmt = os.path.splitext(file)
 
     if fmt[1:] == 'json':
-        out = parse_config_json(file, path)
+        iterator = iter_config_json
     elif fmt[1:] == 'csv':
-        out = parse_config_csv(file, path)
+        iterator = iter_config_csv
     else:
         raise NotImplementedError('File format {} not supported'.format(fmt))
 
-    return out
\ No newline at end of file
+    return _stream(iterator, file, path)
@@ -0,0 +1,407 @@
+"""Concurrent PDC holding the C37.118 connections of many PMUs in one selector loop.
+
+Every PMU connection is a non-blocking TCP socket registered with one `selectors`
+selector, so all PMUs are connected in parallel. Frames are reassembled from the byte
+stream by FRAMESIZE, decoded with the struct codec of `ltbnet.c37118`, and the
+measurements of data frames are dispatched to callbacks as `callback(key, measurements)`,
+where `key` is the position of the PMU in the address list. A slow or silent PMU never
+blocks the others.
+
+Configuration frames are cached by PMU address, IDCODE and CFG_CNT. A connection that
+drops is retried with exponential backoff, and on reconnect streaming is started right
+away with the cached configuration. The configuration is requested again if the first
+data frame does not match it in size and IDCODE or has the configuration-change bit of
+STAT set, and if a later data frame does not match it or sets that bit again.
+
+Example::
+
+    pdc = MultiPdc(['10.1.0.2', '10.1.0.3'])
+    pdc.add_callback(lambda key, m: print(key, m['measurements'][0]['frequency']))
+    pdc.connect()
+    pdc.run(duration=10)
+    pdc.report()
+    pdc.stop()
+"""
+
+import sys
+import time
+import errno
+import socket
+import logging
+import selectors
+
+from statistics import median
+
+from ltbnet import c37118
+
+logger = logging.getLogger(__name__)
+
+PORT = 1410  # MiniPMU port
+
+CONNECTING = 'connecting'
+CONFIG = 'config'
+STREAMING = 'streaming'
+CLOSED = 'closed'
+
+
+class ConfigCache(object):
+    """Configurations keyed by PMU address, stream IDCODE and CFG_CNT; can be shared between PDCs"""
+    def __init__(self):
+        self.configs = {}  # (address, idcode) -> {cfgcnt: Config}
+        self.latest = {}   # (address, idcode) -> cfgcnt of the last stored Config
+        self.streams = {}  # address -> idcode of the last stored Config
+
+    def __len__(self):
+        return len(self.configs)
+
+    def store(self, address, cfg):
+        key = (address, cfg.idcode)
+        self.configs.setdefault(key, {})[cfg.cfgcnt] = cfg
+        self.latest[key] = cfg.cfgcnt
+        self.streams[address] = cfg.idcode
+
+    def get(self, address, idcode=None, cfgcnt=None):
+        """Return the configuration of stream `idcode` from `address` with `cfgcnt`, or the latest
+        one if None. `idcode` defaults to the last stream stored for `address`"""
+        if idcode is None:
+            idcode = self.streams.get(address)
+        key = (address, idcode)
+        if cfgcnt is None:
+            cfgcnt = self.latest.get(key)
+        return self.configs.get(key, {}).get(cfgcnt)
+
+
+class Connection(object):
+    """State of the connection to one PMU"""
+    def __init__(self, key, address, idcode):
+        self.key = key
+        self.address = address
+        self.idcode = idcode
+        self.stream = None  # IDCODE of the stream once known
+        self.sock = None
+        self.state = CLOSED
+        self.buf = bytearray()
+        self.cfg = None
+        self.verified = False  # `cfg` matched a data frame since the last (re)connect
+        self.cfg_change = False  # configuration-change bit of the last data frame
+        self.header = None
+        self.frames = 0
+        self.last_frame = None
+
+        self.attempts = 0
+        self.retry_at = None
+        self.reconnects = 0
+        self.t_start = None
+        self.t_connected = None  # first successful connection
+        self.t_first_data = None
+
+    def send(self, cmd):
+        try:
+            self.sock.send(c37118.command_frame(self.idcode, cmd))
+        except OSError as e:
+            logger.warning('PMU {} command {} failed: {}'.format(self.address, cmd, e))
+
+
+class MultiPdc(object):
+    """
+    PDC for multiple PMUs
+
+    Parameters
+    ----------
+    addresses
+        PMU IP addresses or (ip, port) tuples
+    idcodes
+        IDCODE sent in command frames to each PMU. Defaults to the last octet of the IP,
+        or to the position in `addresses` plus one if the last octets are not unique
+    cache
+        `ConfigCache` to share configurations with other PDCs
+    backoff
+        (initial, maximum) delay in seconds between reconnection attempts. Set to None
+        to disable reconnection
+    """
+    def __init__(self, addresses, idcodes=None, port=PORT, cache=None, backoff=(0.1, 10.)):
+        addresses = [(a, port) if isinstance(a, str) else tuple(a) for a in addresses]
+        if not idcodes:
+            idcodes = [int(a[0].split('.')[-1]) for a in addresses]
+            if len(set(idcodes)) < len(idcodes):
+                idcodes = list(range(1, len(addresses) + 1))
+        self.connections = [Connection(key, address, idcode)
+                            for key, (address, idcode) in enumerate(zip(addresses, idcodes))]
+
+        self.cache = ConfigCache() if cache is None else cache
+        self.backoff = backoff
+        self.callbacks = []
+        self.config_callbacks = []
+        self.selector = selectors.DefaultSelector()
+        self.stopped = False
+
+    def __len__(self):
+        return len(self.connections)
+
+    def add_callback(self, callback):
+        """Call `callback(key, measurements)` for every data frame"""
+        self.callbacks.append(callback)
+
+    def add_config_callback(self, callback):
+        """Call `callback(key, config)` for every new configuration"""
+        self.config_callbacks.append(callback)
+
+    @property
+    def config(self):
+        """Dictionary of PMU key to its `c37118.Config`"""
+        return {c.key: c.cfg for c in self.connections if c.cfg is not None}
+
+    @property
+    def header(self):
+        """Dictionary of PMU key to its header text"""
+        return {c.key: c.header for c in self.connections if c.header is not None}
+
+    def connect(self):
+        """Start non-blocking connections to all PMUs that are not connected"""
+        self.stopped = False
+        now = time.monotonic()
+        for conn in self.connections:
+            if conn.state == CLOSED:
+                if conn.t_start is None:
+                    conn.t_start = now
+                self._connect(conn)
+
+    def _connect(self, conn):
+        conn.retry_at = None
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        err = sock.connect_ex(conn.address)
+        if err not in (0, errno.EINPROGRESS):
+            sock.close()
+            self._retry(conn, errno.errorcode.get(err, str(err)))
+            return
+
+        conn.sock = sock
+        conn.state = CONNECTING
+        conn.buf.clear()
+        self.selector.register(sock, selectors.EVENT_WRITE, conn)
+
+    def _retry(self, conn, reason):
+        """Schedule the next connection attempt with exponential backoff"""
+        conn.state = CLOSED
+        if self.backoff is None or self.stopped:
+            logger.warning('PMU {} disconnected: {}'.format(conn.address, reason))
+            return
+        initial, maximum = self.backoff
+        delay = min(initial * 2 ** conn.attempts, maximum)
+        conn.attempts += 1
+        conn.retry_at = time.monotonic() + delay
+        logger.info('PMU {} disconnected: {}; retrying in {:.1f}s'.format(conn.address, reason, delay))
+
+    def _close(self, conn, reason=''):
+        if conn.sock is not None:
+            self.selector.unregister(conn.sock)
+            conn.sock.close()
+            conn.sock = None
+        conn.state = CLOSED
+        if reason:
+            self._retry(conn, reason)
+
+    def _on_connected(self, conn):
+        err = conn.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            self._close(conn, errno.errorcode.get(err, str(err)))
+            return
+
+        self.selector.modify(conn.sock, selectors.EVENT_READ, conn)
+        if conn.t_connected is None:
+            conn.t_connected = time.monotonic()
+        else:
+            conn.reconnects += 1
+        conn.verified = False
+        conn.cfg_change = False
+
+        cached = self.cache.get(conn.address, conn.stream)
+        if cached is not None:
+            # start right away; the first data frame verifies the cached configuration
+            conn.cfg = cached
+            conn.state = STREAMING
+            conn.send(c37118.CMD_START)
+        else:
+            conn.state = CONFIG
+            conn.send(c37118.CMD_HEADER)
+            conn.send(c37118.CMD_CFG2)
+
+    def _on_readable(self, conn):
+        while True:
+            try:
+                data = conn.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                self._close(conn, str(e))
+                return 0
+            if not data:
+                self._close(conn, 'connection closed')
+                return 0
+            conn.buf += data
+            if len(data) < 65536:
+                break
+
+        count = 0
+        frames, used = c37118.split_frames(conn.buf)
+        del conn.buf[:used]
+        self._resync(conn.buf)
+
+        for frame in frames:
+            count += self._on_frame(conn, frame)
+        return count
+
+    @staticmethod
+    def _resync(buf):
+        """Drop bytes that cannot start a frame from the front of `buf`"""
+        while buf:
+            if buf[0] == c37118.SYNC:
+                if len(buf) < 4 or ((buf[2] << 8) | buf[3]) >= c37118.COMMON.size + 2:
+                    return
+                start = buf.find(c37118.SYNC, 1)
+            else:
+                start = buf.find(c37118.SYNC)
+            if start < 0:
+                buf.clear()
+            else:
+                del buf[:start]
+
+    def _verify(self, conn, frame, stat):
+        """Return True if the size and IDCODE of the data frame match the configuration of
+        `conn` and the configuration-change bit of `stat` is clear"""
+        cfg = conn.cfg
+        idcode = (frame[4] << 8) | frame[5]
+        if len(frame) == cfg.frame_size and idcode == cfg.idcode and not stat & c37118.STAT_CFG_CHANGE:
+            conn.verified = True
+            return True
+
+        logger.info('PMU {} configuration changed; requesting CFG-2'.format(conn.address))
+        conn.state = CONFIG
+        conn.send(c37118.CMD_CFG2)
+        return False
+
+    def _on_frame(self, conn, frame):
+        ftype = c37118.frame_type(frame)
+        if ftype == c37118.DATA:
+            if conn.cfg is None or conn.state == CONFIG:
+                return 0
+            stat = (frame[c37118.COMMON.size] << 8) | frame[c37118.COMMON.size + 1]
+            change = bool(stat & c37118.STAT_CFG_CHANGE)
+            # a verified configuration is checked again when the frame size or IDCODE differs
+            # or the configuration-change bit is newly set
+            recheck = (not conn.verified or (change and not conn.cfg_change) or len(frame) != conn.cfg.frame_size
+                       or ((frame[4] << 8) | frame[5]) != conn.cfg.idcode)
+            conn.cfg_change = change
+            if recheck and not self._verify(conn, frame, stat):
+                conn.verified = False
+                return 0
+            measurements = c37118.parse_data(frame, conn.cfg)
+            conn.frames += 1
+            conn.last_frame = time.time()
+            conn.attempts = 0
+            if conn.t_first_data is None:
+                conn.t_first_data = time.monotonic()
+            for callback in self.callbacks:
+                callback(conn.key, measurements)
+            return 1
+
+        if ftype in (c37118.CFG1, c37118.CFG2):
+            cfg = c37118.parse_config(frame)
+            self.cache.store(conn.address, cfg)
+            conn.stream = cfg.idcode
+            conn.cfg = cfg
+            conn.verified = True
+            for callback in self.config_callbacks:
+                callback(conn.key, cfg)
+            if conn.state == CONFIG:
+                conn.send(c37118.CMD_START)
+                conn.state = STREAMING
+        elif ftype == c37118.HEADER:
+            conn.header = frame[c37118.COMMON.size:-2].decode('ascii', 'replace')
+        return 0
+
+    def _next_retry(self):
+        due = [c.retry_at for c in self.connections if c.retry_at is not None]
+        return min(due) if due else None
+
+    def poll(self, timeout=0):
+        """
+        Handle the connections that are ready within `timeout` seconds and retry the
+        connections that are due
+
+        Returns
+        -------
+        int
+            number of data frames dispatched
+        """
+        now = time.monotonic()
+        for conn in self.connections:
+            if conn.retry_at is not None and conn.retry_at <= now:
+                self._connect(conn)
+
+        retry = self._next_retry()
+        if retry is not None:
+            timeout = max(min(timeout, retry - now), 0)
+
+        count = 0
+        if not self.selector.get_map():
+            time.sleep(timeout)  # nothing to select; wait for the next retry
+            return count
+
+        for key, mask in self.selector.select(timeout):
+            conn = key.data
+            if conn.state == CONNECTING:
+                self._on_connected(conn)
+            elif mask & selectors.EVENT_READ:
+                count += self._on_readable(conn)
+        return count
+
+    def run(self, duration=None, timeout=0.1):
+        """Poll until `duration` seconds have passed, all connections are closed for good, or interrupted"""
+        deadline = None if duration is None else time.monotonic() + duration
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                if all(c.state == CLOSED and c.retry_at is None for c in self.connections):
+                    break
+                wait = timeout if deadline is None else max(min(timeout, deadline - time.monotonic()), 0)
+                self.poll(wait)
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        """Ask the PMUs to stop sending data and close all connections without retrying"""
+        self.stopped = True
+        for conn in self.connections:
+            if conn.state == STREAMING:
+                conn.send(c37118.CMD_STOP)
+            self._close(conn)
+            conn.retry_at = None
+
+    def first_data(self):
+        """Return a dictionary of PMU key to the seconds from the first connection attempt to its first data frame"""
+        return {c.key: c.t_first_data - c.t_start for c in self.connections
+                if c.t_first_data is not None and c.t_start is not None}
+
+    def report(self, file=sys.stdout):
+        """Print the time to first data of every PMU and of the fleet"""
+        ttfd = self.first_data()
+        file.write('{:<22} {:<10} {:>9} {:>11} {:>10} {:>8}\n'.format(
+            'PMU', 'State', 'Connect', 'First data', 'Reconnects', 'Frames'))
+
+        for c in self.connections:
+            connect = c.t_connected - c.t_start if c.t_connected is not None and c.t_start is not None else None
+            file.write('{:<22} {:<10} {:>9} {:>11} {:>10} {:>8}\n'.format(
+                '{}:{}'.format(*c.address), c.state,
+                '-' if connect is None else '{:.1f}ms'.format(connect * 1e3),
+                '-' if c.key not in ttfd else '{:.1f}ms'.format(ttfd[c.key] * 1e3),
+                c.reconnects, c.frames))
+
+        values = sorted(ttfd.values())
+        if values:
+            file.write('\n{n}/{t} PMUs sent data; time to first data min {lo:.1f} ms, median {med:.1f} ms, '
+                       'max {hi:.1f} ms\n'.format(n=len(values), t=len(self.connections), lo=values[0] * 1e3,
+                                                  med=median(values) * 1e3, hi=values[-1] * 1e3))
+        else:
+            file.write('\nNo PMU sent data\n')
@@ -0,0 +1,171 @@
+"""Live plotting of PDC data outside the receive loop.
+
+`LivePlot` renders in a separate process, so that drawing never stalls the frame
+processing of the PDC. Samples are passed through a bounded queue with `put_nowait`
+and dropped if the renderer falls behind. The renderer keeps the samples in a
+fixed-capacity `RingBuffer` and redraws at a capped frame rate with matplotlib
+blitting, doing a full redraw only when the axes limits have to change.
+
+Example::
+
+    plot = LivePlot(['Frequency Deviation', 'Separation Threshold'], span=30)
+    plot.start()
+    plot.push(t, [freq_diff, 0.4])
+    ...
+    plot.stop()
+"""
+
+import time
+import queue
+import multiprocessing
+
+import numpy as np
+
+
+class RingBuffer(object):
+    """
+    Fixed-capacity buffer of time-stamped rows
+
+    Every row is written twice, `capacity` apart, so that the latest `capacity` rows are
+    always a contiguous view and appending never copies or reallocates.
+    """
+    def __init__(self, capacity, ncol=1):
+        self.capacity = capacity
+        self.t = np.zeros(2 * capacity)
+        self.data = np.zeros((2 * capacity, ncol))
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, t, row):
+        pos = self.count % self.capacity
+        self.t[pos] = self.t[pos + self.capacity] = t
+        self.data[pos] = self.data[pos + self.capacity] = row
+        self.count += 1
+
+    def view(self):
+        """Return (t, data) of the buffered rows in chronological order as views"""
+        n = len(self)
+        end = self.count % self.capacity + self.capacity if self.count > self.capacity else n
+        return self.t[end - n:end], self.data[end - n:end]
+
+
+def _render(q, labels, span, fps, capacity, style):
+    import matplotlib.pyplot as plt
+
+    fontsize = style.get('fontsize')
+    buf = RingBuffer(capacity, len(labels))
+
+    fig, ax = plt.subplots()
+    lines = [ax.plot([], [], linewidth=style.get('linewidth', 2), label=label, animated=True)[0]
+             for label in labels]
+    ax.legend(fontsize=fontsize, loc='upper left')
+    if fontsize:
+        ax.xaxis.set_tick_params(labelsize=fontsize)
+        ax.yaxis.set_tick_params(labelsize=fontsize)
+    if style.get('fullscreen'):
+        plt.get_current_fig_manager().full_screen_toggle()
+    ax.set_xlim(0, span)
+    ax.set_ylim(-1, 1)
+
+    plt.show(block=False)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(ax.bbox)
+
+    period = 1. / fps
+    running = True
+    while running and plt.fignum_exists(fig.number):
+        deadline = time.monotonic() + period
+        while True:
+            try:
+                item = q.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                running = False
+                break
+            buf.append(*item)
+
+        if not len(buf):
+            fig.canvas.flush_events()
+            continue
+
+        t, data = buf.view()
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        lo, hi = np.nanmin(data), np.nanmax(data)
+
+        # full redraw only when the data leaves the axes
+        if t[-1] > x1 or lo < y0 or hi > y1:
+            if t[-1] > x1:
+                ax.set_xlim(t[-1] - span / 2, t[-1] + span / 2)
+            if lo < y0 or hi > y1:
+                margin = 0.1 * max(hi - lo, 1e-6)
+                ax.set_ylim(min(lo, y0) - margin, max(hi, y1) + margin)
+            for line in lines:
+                line.set_data([], [])
+            fig.canvas.draw()
+            background = fig.canvas.copy_from_bbox(ax.bbox)
+
+        fig.canvas.restore_region(background)
+        keep = t >= ax.get_xlim()[0]
+        for k, line in enumerate(lines):
+            line.set_data(t[keep], data[keep, k])
+            ax.draw_artist(line)
+        fig.canvas.blit(ax.bbox)
+        fig.canvas.flush_events()
+
+    plt.close(fig)
+
+
+class LivePlot(object):
+    """
+    Live line plot rendered in a separate process
+
+    Parameters
+    ----------
+    labels
+        label of each line
+    span
+        seconds of data shown
+    fps
+        maximum redraw rate
+    capacity
+        number of samples kept by the renderer
+    maxsize
+        number of samples queued before new samples are dropped
+    style
+        `fontsize`, `linewidth` and `fullscreen`
+    """
+    def __init__(self, labels, span=30., fps=20, capacity=4096, maxsize=1024, **style):
+        self.labels = list(labels)
+        self.span = span
+        self.fps = fps
+        self.capacity = capacity
+        self.style = style
+
+        # pyplot is imported in the renderer only, so forking the producer is safe
+        self.queue = multiprocessing.Queue(maxsize)
+        self.process = multiprocessing.Process(target=_render, name='ltbnet-plot', daemon=True,
+                                               args=(self.queue, self.labels, span, fps, capacity, style))
+        self.dropped = 0
+
+    def start(self):
+        self.process.start()
+
+    def push(self, t, values):
+        """Queue one sample without blocking; the sample is dropped if the queue is full"""
+        try:
+            self.queue.put_nowait((t, values))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=1.):
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
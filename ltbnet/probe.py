@@ -0,0 +1,219 @@
+"""RTT, jitter and loss probes between emulated hosts.
+
+A small UDP echo responder runs on the PDC hosts and every PMU probes its PDC
+concurrently (optionally every PDC probes every other PDC as well). Probes carry a
+sequence number and a send timestamp so that round-trip times are measured with the
+sender's monotonic clock at sub-millisecond resolution.
+
+The module can be run on a host as::
+
+    python -m ltbnet.probe serve --port 5050
+    python -m ltbnet.probe probe 10.1.0.1 --port 5050 --count 100 --interval 0.01
+"""
+
+import sys
+import csv
+import json
+import time
+import socket
+import struct
+import argparse
+import selectors
+
+from statistics import mean
+
+from ltbnet.routing import trace
+from ltbnet.analysis import PathAnalysis
+
+PORT = 5050
+
+_probe = struct.Struct('!Id')
+
+
+def serve(port=PORT):
+    """Echo every UDP datagram received on `port` back to its sender"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('0.0.0.0', port))
+    while True:
+        data, addr = sock.recvfrom(2048)
+        sock.sendto(data, addr)
+
+
+def probe(dest, port=PORT, count=100, interval=0.01, timeout=1., size=64):
+    """
+    Send `count` probes to the echo responder at `dest` every `interval` seconds
+
+    Returns
+    -------
+    dict
+        `sent`, `received` and the list of round-trip times `rtt` in seconds
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.connect((dest, port))
+
+    sel = selectors.DefaultSelector()
+    sel.register(sock, selectors.EVENT_READ)
+
+    padding = b'\0' * max(size - _probe.size, 0)
+    rtt = {}
+    sent = 0
+    start = time.perf_counter()
+    deadline = start + count * interval + timeout
+
+    while True:
+        now = time.perf_counter()
+        if sent < count and now >= start + sent * interval:
+            try:
+                sock.send(_probe.pack(sent, now) + padding)
+            except OSError:
+                pass  # e.g. no route or ARP failure yet; counted as lost
+            sent += 1
+            continue
+
+        if now >= deadline or len(rtt) == count:
+            break
+
+        wait = deadline - now
+        if sent < count:
+            wait = min(wait, start + sent * interval - now)
+
+        for key, mask in sel.select(max(wait, 0)):
+            try:
+                data = sock.recv(2048)
+            except OSError:
+                continue
+            if len(data) >= _probe.size:
+                seq, t_send = _probe.unpack_from(data)
+                rtt.setdefault(seq, time.perf_counter() - t_send)
+
+    sock.close()
+    return {'dest': dest, 'sent': sent, 'received': len(rtt), 'rtt': [rtt[k] for k in sorted(rtt)]}
+
+
+def summarize(result):
+    """Return (loss %, min, avg, max RTT and jitter in seconds) of a `probe` result"""
+    rtt = result['rtt']
+    sent = result['sent']
+    loss = 100. * (sent - len(rtt)) / sent if sent else None
+    if not rtt:
+        return loss, None, None, None, None
+
+    # mean absolute difference of consecutive round-trip times
+    jitter = mean(abs(b - a) for a, b in zip(rtt, rtt[1:])) if len(rtt) > 1 else 0.
+    return loss, min(rtt), mean(rtt), max(rtt), jitter
+
+
+def probe_pairs(network, regions=False):
+    """
+    Return the (source, destination) host Idx pairs to probe
+
+    Every PMU probes the PDC of its region. If `regions` is True, every PDC also probes
+    the PDCs of all other regions.
+    """
+    pairs = sorted(network.region_pdc().items())
+    if regions:
+        pdcs = network.PDC.idx
+        pairs.extend((a, b) for a in pdcs for b in pdcs if a != b)
+    return pairs
+
+
+def expected_rtt(network, pairs):
+    """Return a dictionary of pair to the round-trip propagation delay of the configured links"""
+    analysis = PathAnalysis(network)
+    out = {}
+    for src, dst in pairs:
+        dist, prev = analysis.tree(dst)
+        nodes, links = trace(prev, dst, src)
+        if links is not None:
+            out[(src, dst)] = 2 * analysis.link_metrics(links)[0]
+    return out
+
+
+def run_matrix(network, net, path='probe.csv', regions=False, count=100, interval=0.01, port=PORT):
+    """
+    Probe all pairs from `probe_pairs` concurrently on the started network `net`
+
+    The results are written to the csv file `path` together with the expected RTT from
+    the configured link delays.
+
+    Returns
+    -------
+    dict
+        pair to the `probe` result
+    """
+    hosts = {}
+    for item in (network.PDC, network.PMU):
+        for idx, name, ip in zip(item.idx, item.mn_name, item.ip):
+            if ip:
+                hosts[idx] = (name, ip.split('/')[0])
+
+    pairs = [p for p in probe_pairs(network, regions) if p[0] in hosts and p[1] in hosts]
+    python = sys.executable
+
+    servers = [net.get(hosts[idx][0]).popen([python, '-m', 'ltbnet.probe', 'serve', '--port', str(port)])
+               for idx in sorted({dst for src, dst in pairs})]
+    time.sleep(0.5)
+
+    procs = {}
+    for src, dst in pairs:
+        procs[(src, dst)] = net.get(hosts[src][0]).popen(
+            [python, '-m', 'ltbnet.probe', 'probe', hosts[dst][1], '--port', str(port),
+             '--count', str(count), '--interval', str(interval)])
+
+    results = {}
+    for pair, proc in procs.items():
+        out, err = proc.communicate()
+        try:
+            results[pair] = json.loads(out)
+        except ValueError:
+            results[pair] = {'dest': hosts[pair[1]][1], 'sent': 0, 'received': 0, 'rtt': []}
+
+    for proc in servers:
+        proc.terminate()
+
+    expected = expected_rtt(network, pairs)
+
+    def ms(value):
+        return '' if value is None else '{:.3f}'.format(value * 1e3)
+
+    with open(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Source', 'Destination', 'Sent', 'Received', 'Loss(%)', 'RTT_min(ms)', 'RTT_avg(ms)',
+                         'RTT_max(ms)', 'Jitter(ms)', 'Expected_RTT(ms)'])
+        for pair in pairs:
+            result = results[pair]
+            loss, lo, avg, hi, jitter = summarize(result)
+            writer.writerow([pair[0], pair[1], result['sent'], result['received'],
+                             '' if loss is None else '{:.2f}'.format(loss),
+                             ms(lo), ms(avg), ms(hi), ms(jitter), ms(expected.get(pair))])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LTBNet UDP probe')
+    sub = parser.add_subparsers(dest='command')
+
+    p_serve = sub.add_parser('serve', help='run the UDP echo responder')
+    p_serve.add_argument('--port', type=int, default=PORT)
+
+    p_probe = sub.add_parser('probe', help='probe an echo responder and print the result in json')
+    p_probe.add_argument('dest', help='IP address of the responder')
+    p_probe.add_argument('--port', type=int, default=PORT)
+    p_probe.add_argument('--count', type=int, default=100, help='number of probes')
+    p_probe.add_argument('--interval', type=float, default=0.01, help='interval between probes in seconds')
+    p_probe.add_argument('--timeout', type=float, default=1., help='time to wait for the last reply')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args.port)
+    elif args.command == 'probe':
+        result = probe(args.dest, args.port, args.count, args.interval, args.timeout)
+        sys.stdout.write(json.dumps(result))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
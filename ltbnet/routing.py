@@ -0,0 +1,106 @@
+"""Delay-weighted shortest paths over the LTBNet topology.
+
+The graph is built directly from `Network.Link` records without networkx so that path
+computations run on the `--parse_only` code path and scale to large configs.
+"""
+
+import heapq
+
+# added to every link weight so that equal-delay paths prefer fewer hops
+HOP_WEIGHT = 1e-6
+
+
+def link_graph(network, canonical=False):
+    """
+    Build an undirected adjacency dictionary from `network.Link`
+
+    Parameters
+    ----------
+    network
+        a set-up `ltbnet.network.Network`
+    canonical
+        use Mininet node names instead of Idx if True
+
+    Returns
+    -------
+    dict
+        node to a list of (neighbor, weight, link position) where the weight is the link
+        delay in seconds plus `HOP_WEIGHT`
+    """
+    graph = {}
+    for i, fr, to, delay in zip(range(network.Link.n), network.Link.fr, network.Link.to, network.Link.delay):
+        if canonical:
+            fr = network.to_canonical(fr)
+            to = network.to_canonical(to)
+        weight = (delay or 0.) + HOP_WEIGHT
+        graph.setdefault(fr, []).append((to, weight, i))
+        graph.setdefault(to, []).append((fr, weight, i))
+    return graph
+
+
+def shortest_paths(graph, source, transit=None):
+    """
+    Dijkstra's shortest paths from `source`
+
+    Parameters
+    ----------
+    graph
+        adjacency dictionary from `link_graph`
+    source
+        source node
+    transit
+        container of nodes that may forward traffic, such as switches. All nodes
+        forward if None
+
+    Returns
+    -------
+    tuple
+        (dist, prev) where `dist[node]` is the path weight and `prev[node]` is a tuple of
+        (previous node, link position) on the shortest path from `source`
+    """
+    dist = {source: 0.}
+    prev = {}
+    heap = [(0., source)]
+    done = set()
+
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        done.add(node)
+
+        if node != source and transit is not None and node not in transit:
+            continue
+
+        for nbr, weight, link in graph.get(node, ()):
+            nd = d + weight
+            if nd < dist.get(nbr, float('inf')):
+                dist[nbr] = nd
+                prev[nbr] = (node, link)
+                heapq.heappush(heap, (nd, nbr))
+
+    return dist, prev
+
+
+def trace(prev, source, target):
+    """
+    Return the path from `source` to `target` from the `prev` of `shortest_paths(graph, source)`
+
+    Returns
+    -------
+    tuple
+        (nodes, links) lists along the path, or (None, None) if `target` is unreachable
+    """
+    if target != source and target not in prev:
+        return None, None
+
+    nodes = [target]
+    links = []
+    while nodes[-1] != source:
+        node, link = prev[nodes[-1]]
+        nodes.append(node)
+        links.append(link)
+
+    nodes.reverse()
+    links.reverse()
+    return nodes, links
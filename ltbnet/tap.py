@@ -0,0 +1,293 @@
+"""Passive one-way latency tap of C37.118 streams at switch ports.
+
+Raw packet sockets are bound to chosen switch interfaces in the root namespace, and
+every TCP segment is scanned for C37.118 data frames with the struct-based fast path
+of `ltbnet.c37118`. The one-way delay of a frame at an interface is its capture time
+minus the frame time (SOC + FRACSEC / TIME_BASE), which is meaningful because all
+emulated hosts share the kernel clock.
+
+Frames seen on more than one interface are matched by (IDCODE, SOC, FRACSEC), and the
+time between consecutive captures is attributed to the hop between the two interfaces,
+e.g. the link between two switches or the queueing within one switch.
+
+Run as root while the network is up::
+
+    python -m ltbnet.tap s1-eth1 s1-eth3 s2-eth1 --duration 30 --json tap.json
+"""
+
+import sys
+import json
+import time
+import socket
+import struct
+import argparse
+import selectors
+
+from bisect import bisect_right
+from collections import OrderedDict
+
+from ltbnet import c37118
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+IPPROTO_TCP = 6
+
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+
+# histogram bin edges in milliseconds; the last bin counts everything above
+EDGES = (0., 0.05, 0.1, 0.2, 0.5, 1., 2., 5., 10., 20., 50., 100., 200., 500., 1000.)
+
+_timespec = struct.Struct('@ll')
+_ethertype = struct.Struct('!H')
+
+
+class Histogram(object):
+    """Delay histogram with fixed millisecond bins and running min/mean/max"""
+    def __init__(self, edges=EDGES):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.n = 0
+        self.total = 0.
+        self.min = None
+        self.max = None
+
+    def add(self, delay):
+        """Add a delay in seconds"""
+        ms = delay * 1e3
+        self.counts[bisect_right(self.edges, ms)] += 1
+        self.n += 1
+        self.total += delay
+        if self.min is None or delay < self.min:
+            self.min = delay
+        if self.max is None or delay > self.max:
+            self.max = delay
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+    def quantile(self, q):
+        """Return the upper edge in seconds of the bin holding the `q` quantile"""
+        if not self.n:
+            return None
+        target = q * self.n
+        running = 0
+        for i, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return min(self.edges[i] / 1e3, self.max) if i < len(self.edges) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {'n': self.n, 'min': self.min, 'mean': self.mean, 'max': self.max,
+                'edges_ms': list(self.edges), 'counts': self.counts}
+
+
+def open_socket(interface):
+    """Return a non-blocking raw packet socket bound to `interface` with kernel timestamps if available"""
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    sock.bind((interface, 0))
+    sock.setblocking(False)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        pass
+    return sock
+
+
+def tcp_payload(packet):
+    """Return (start, end) of the TCP payload in an Ethernet frame, or None for other packets"""
+    offset = 12
+    ethertype = _ethertype.unpack_from(packet, offset)[0]
+    if ethertype == ETH_P_8021Q:
+        offset += 4
+        ethertype = _ethertype.unpack_from(packet, offset)[0]
+    if ethertype != ETH_P_IP:
+        return None
+
+    ip = offset + 2
+    if len(packet) < ip + 20 or packet[ip + 9] != IPPROTO_TCP:
+        return None
+    ihl = (packet[ip] & 0x0F) * 4
+    total = (packet[ip + 2] << 8) | packet[ip + 3]
+
+    tcp = ip + ihl
+    if len(packet) < tcp + 20:
+        return None
+    start = tcp + (packet[tcp + 12] >> 4) * 4
+    end = min(ip + total, len(packet))
+    return (start, end) if end > start else None
+
+
+def iter_frames(packet, start, end):
+    """Yield (frame type, IDCODE, SOC, FRACSEC, offset) of the frames that start a TCP payload"""
+    common = c37118.COMMON
+    offset = start
+    while offset + common.size <= end and packet[offset] == c37118.SYNC:
+        sync, ftype, size, idcode, soc, fracsec = common.unpack_from(packet, offset)
+        yield (ftype >> 4) & 0x7, idcode, soc, fracsec, offset
+        if size < common.size:
+            break
+        offset += size
+
+
+class Tap(object):
+    """
+    Capture C37.118 frames on switch interfaces and collect delay histograms
+
+    Parameters
+    ----------
+    interfaces
+        switch interface names, such as `s1-eth2`
+    memory
+        number of recent frames kept for matching captures across interfaces
+    """
+    def __init__(self, interfaces, memory=65536):
+        self.interfaces = list(interfaces)
+        self.memory = memory
+
+        self.time_base = {}
+        self.streams = {}  # idcode -> Histogram of the delay at the first capture
+        self.ports = {}    # (interface, idcode) -> Histogram
+        self.hops = {}     # (interface, interface) -> Histogram
+        self.frames = 0
+
+        # (idcode, soc, fracsec) -> [last interface, last capture time, interfaces]
+        self._seen = OrderedDict()
+        self._sockets = []
+
+    def open(self):
+        self._sockets = [(open_socket(name), name) for name in self.interfaces]
+
+    def close(self):
+        for sock, name in self._sockets:
+            sock.close()
+        self._sockets = []
+
+    def capture_time(self, ancdata):
+        for level, kind, data in ancdata:
+            if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(data) >= _timespec.size:
+                sec, nsec = _timespec.unpack_from(data)
+                return sec + nsec * 1e-9
+        return time.time()
+
+    def handle(self, packet, interface, t):
+        """Record the data frames in one captured packet"""
+        span = tcp_payload(packet)
+        if span is None:
+            return
+
+        for ftype, idcode, soc, fracsec, offset in iter_frames(packet, *span):
+            if ftype == c37118.DATA:
+                self.record(interface, idcode, soc, fracsec, t)
+            elif ftype in (c37118.CFG2, c37118.CFG3) and offset + c37118.COMMON.size + 4 <= span[1]:
+                self.time_base[idcode] = c37118.cfg_time_base(packet[offset:span[1]]) or c37118.TIME_BASE
+
+    def record(self, interface, idcode, soc, fracsec, t):
+        frame = (idcode, soc, fracsec)
+        seen = self._seen.get(frame)
+        if seen is not None and interface in seen[2]:
+            return  # a retransmission, or the second capture of the same packet on loopback
+
+        delay = t - c37118.timestamp(soc, fracsec, self.time_base.get(idcode, c37118.TIME_BASE))
+        self.frames += 1
+
+        key = (interface, idcode)
+        if key not in self.ports:
+            self.ports[key] = Histogram()
+        self.ports[key].add(delay)
+
+        if seen is None:
+            if idcode not in self.streams:
+                self.streams[idcode] = Histogram()
+            self.streams[idcode].add(delay)
+            self._seen[frame] = [interface, t, {interface}]
+            if len(self._seen) > self.memory:
+                self._seen.popitem(last=False)
+            return
+
+        hop = (seen[0], interface)
+        if hop not in self.hops:
+            self.hops[hop] = Histogram()
+        self.hops[hop].add(t - seen[1])
+        seen[0], seen[1] = interface, t
+        seen[2].add(interface)
+
+    def run(self, duration=None):
+        """Capture until `duration` seconds have passed or until interrupted"""
+        if not self._sockets:
+            self.open()
+
+        sel = selectors.DefaultSelector()
+        for sock, name in self._sockets:
+            sel.register(sock, selectors.EVENT_READ, name)
+
+        ancsize = socket.CMSG_SPACE(_timespec.size)
+        deadline = None if duration is None else time.monotonic() + duration
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                for key, mask in sel.select(timeout):
+                    sock, name = key.fileobj, key.data
+                    while True:
+                        try:
+                            packet, ancdata, flags, addr = sock.recvmsg(65535, ancsize)
+                        except BlockingIOError:
+                            break
+                        self.handle(packet, name, self.capture_time(ancdata))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sel.close()
+
+    def to_dict(self):
+        return {'frames': self.frames,
+                'streams': {str(k): v.to_dict() for k, v in sorted(self.streams.items())},
+                'ports': [dict(interface=i, idcode=c, **h.to_dict()) for (i, c), h in sorted(self.ports.items())],
+                'hops': [dict(fr=a, to=b, **h.to_dict()) for (a, b), h in sorted(self.hops.items())]}
+
+    def report(self, file=sys.stdout):
+        """Print the delay statistics per stream, per port and per hop in milliseconds"""
+        def ms(value):
+            return '-' if value is None else '{:.3f}'.format(value * 1e3)
+
+        file.write('Captured {} data frames\n\n'.format(self.frames))
+        file.write('{:<10} {:>8} {:>9} {:>9} {:>9} {:>9}\n'.format('IDCODE', 'Frames', 'Min', 'Mean', 'P99', 'Max'))
+        for idcode, h in sorted(self.streams.items()):
+            file.write('{:<10} {:>8} {:>9} {:>9} {:>9} {:>9}\n'.format(
+                idcode, h.n, ms(h.min), ms(h.mean), ms(h.quantile(0.99)), ms(h.max)))
+
+        file.write('\n{:<16} {:<10} {:>8} {:>9} {:>9} {:>9}\n'.format(
+            'Intf', 'IDCODE', 'Frames', 'Min', 'Mean', 'Max'))
+        for (intf, idcode), h in sorted(self.ports.items()):
+            file.write('{:<16} {:<10} {:>8} {:>9} {:>9} {:>9}\n'.format(
+                intf, idcode, h.n, ms(h.min), ms(h.mean), ms(h.max)))
+
+        file.write('\n{:<16} {:<16} {:>8} {:>9} {:>9} {:>9} {:>9}\n'.format(
+            'From', 'To', 'Frames', 'Min', 'Mean', 'P99', 'Max'))
+        for (fr, to), h in sorted(self.hops.items(), key=lambda x: -(x[1].mean or 0.)):
+            file.write('{:<16} {:<16} {:>8} {:>9} {:>9} {:>9} {:>9}\n'.format(
+                fr, to, h.n, ms(h.min), ms(h.mean), ms(h.quantile(0.99)), ms(h.max)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LTBNet passive C37.118 latency tap')
+    parser.add_argument('interfaces', nargs='+', help='switch interfaces to capture on, such as s1-eth2')
+    parser.add_argument('--duration', type=float, help='capture duration in seconds (default: until Ctrl-C)')
+    parser.add_argument('--json', metavar='FILE', help='write the histograms to a json file')
+
+    args = parser.parse_args()
+
+    tap = Tap(args.interfaces)
+    tap.run(args.duration)
+    tap.close()
+    tap.report()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(tap.to_dict(), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
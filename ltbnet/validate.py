@@ -0,0 +1,137 @@
+"""Pre-flight validation of a Network before Mininet starts.
+
+All checks run in near-linear time on dictionaries of Idx and a union-find over the
+links, so that configuration errors are reported together in well under a second
+instead of surfacing during the Mininet bring-up:
+
+ * Idx values are unique across all component types
+ * components refer to defined regions
+ * links connect two existing nodes, are not loops and are not duplicated
+ * hardware interfaces are attached to existing switches
+ * PMU_IDX values are unique
+ * every PMU is connected to the PDC of its region
+"""
+
+from ltbnet.parser import ConfigError
+
+NODES = ('Switch', 'Router', 'PDC', 'PMU')
+REGIONAL = ('Switch', 'Router', 'PDC', 'PMU', 'HwIntf', 'TCHwIntf')
+INTERFACES = ('HwIntf', 'TCHwIntf')
+
+
+class UnionFind(object):
+    """Disjoint sets of the integers 0 to n-1 with path halving and union by size"""
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+def validate(network):
+    """
+    Check the references and connectivity of a Network populated with `Network.add`
+
+    Returns
+    -------
+    list
+        error messages, empty if the network is valid
+    """
+    errors = []
+
+    # unique Idx across types
+    owner = {}
+    for ty in ('Region', 'Link') + REGIONAL:
+        record = getattr(network, ty)
+        for idx in record.idx:
+            if idx in owner:
+                errors.append('{t} <{i}> duplicates the Idx of a {o}'.format(t=ty, i=idx, o=owner[idx]))
+            else:
+                owner[idx] = ty
+
+    # region references
+    regions = set(network.Region.idx)
+    for ty in REGIONAL:
+        record = getattr(network, ty)
+        for idx, region in zip(record.idx, record.region):
+            if region not in regions:
+                errors.append('{t} <{i}> refers to undefined region <{r}>'.format(t=ty, i=idx, r=region))
+
+    # nodes and hardware interfaces
+    node = {}
+    for ty in NODES:
+        for idx in getattr(network, ty).idx:
+            if idx not in node:
+                node[idx] = len(node)
+
+    for ty in INTERFACES:
+        record = getattr(network, ty)
+        for idx, to in zip(record.idx, record.to):
+            if to not in network.Switch.index:
+                errors.append('{t} <{i}> is attached to <{s}>, which is not a switch'.format(t=ty, i=idx, s=to))
+
+    # links, duplicates and connectivity
+    sets = UnionFind(len(node))
+    pairs = {}
+    link = network.Link
+    for idx, fr, to in zip(link.idx, link.fr, link.to):
+        if fr not in node or to not in node:
+            missing = [end for end in (fr, to) if end not in node]
+            errors.append('Link <{i}> refers to unknown node(s) {m}'.format(
+                i=idx, m=', '.join('<{}>'.format(m) for m in missing)))
+            continue
+        if fr == to:
+            errors.append('Link <{i}> connects <{f}> to itself'.format(i=idx, f=fr))
+            continue
+
+        pair = (fr, to) if fr <= to else (to, fr)
+        if pair in pairs:
+            errors.append('Link <{i}> duplicates link <{d}> between <{f}> and <{t}>'.format(
+                i=idx, d=pairs[pair], f=fr, t=to))
+            continue
+        pairs[pair] = idx
+        sets.union(node[fr], node[to])
+
+    # PMUs
+    pmu_idx = {}
+    for idx, number in zip(network.PMU.idx, network.PMU.pmu_idx):
+        if number in pmu_idx:
+            errors.append('PMU <{i}> duplicates PMU_IDX {n} of PMU <{o}>'.format(i=idx, n=number, o=pmu_idx[number]))
+        else:
+            pmu_idx[number] = idx
+
+    pdc = network.region_pdc()
+    checked = set()
+    for idx, region in zip(network.PMU.idx, network.PMU.region):
+        if region not in regions or idx in checked:
+            continue
+        checked.add(idx)
+        if idx not in pdc:
+            errors.append('PMU <{i}> has no PDC in region <{r}>'.format(i=idx, r=region))
+        elif sets.find(node[idx]) != sets.find(node[pdc[idx]]):
+            errors.append('PMU <{i}> is not connected to PDC <{p}> of region <{r}>'.format(i=idx, p=pdc[idx],
+                                                                                          r=region))
+
+    return errors
+
+
+def check(network):
+    """Raise a `ConfigError` with all errors found by `validate`"""
+    errors = validate(network)
+    if errors:
+        raise ConfigError([(None, e) for e in errors])
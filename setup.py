@@ -13,6 +13,12 @@ setup(name='ltbnet',
           'console_scripts': [
               'ltbnet = ltbnet.main:main',
               'minipmu = ltbnet.minipmu:main',
+              'minipdc = ltbnet.minipdc:main',
+              'ltbnet-tap = ltbnet.tap:main',
+              'ltbnet-dime = ltbnet.dime:main',
+              'ltbnet-fakesim = ltbnet.fakesim:main',
+              'ltbnet-gen = ltbnet.generator:main',
+              'ltbnet-worker = ltbnet.distributed:main',
           ]
       },
       )
@@ -0,0 +1,26 @@
+from ltbnet.concentrator import Concentrator
+
+
+def test_old_frame_does_not_release_newer_slice():
+    conc = Concentrator(2, rate=10, depth=4)
+    times = []
+    conc.add_callback(lambda snap: times.append(snap.t))
+
+    conc.add(0, 1.6, [60., 0.], now=0.)
+    conc.add(1, 1.2, [60., 0.], now=0.)  # same ring row as 1.6, but older
+    conc.flush()
+
+    assert times == [1.6]
+    assert conc.stats()['late'].tolist() == [0, 1]
+
+
+def test_slices_release_in_time_order():
+    conc = Concentrator(2, rate=10, depth=4)
+    times = []
+    conc.add_callback(lambda snap: times.append(snap.t))
+
+    for t in (1.0, 1.2, 1.1, 1.4, 1.3, 1.5):
+        conc.add(0, t, [60., 0.], now=0.)
+    conc.flush()
+
+    assert times == sorted(times)
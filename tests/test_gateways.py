@@ -0,0 +1,72 @@
+import ipaddress
+
+import pytest
+
+from ltbnet.cache import build_network
+from ltbnet.generator import generate
+from ltbnet.network import Network
+
+
+def lookup(entries, dest):
+    """Return the longest-prefix (destination, gateway, interface) route to `dest`"""
+    best = None
+    for entry in entries:
+        net = ipaddress.ip_network(entry[0])
+        if dest in net and (best is None or net.prefixlen > best[0].prefixlen):
+            best = (net, entry)
+    return best[1] if best else None
+
+
+def owner(network, ip):
+    """Return the node holding the address `ip`"""
+    for item in (network.PDC, network.PMU):
+        for name, addr in zip(item.mn_name, item.ip):
+            if addr.split('/')[0] == ip:
+                return name
+    for g in network.gateways:
+        if ip in (x.split('/')[0] for x in g.ips):
+            return g.name
+
+
+def forward(network, src, dst_ip):
+    """Follow the routes from host `src` to `dst_ip` and return the gateways on the way"""
+    region = dict(zip(network.PDC.mn_name + network.PMU.mn_name, network.PDC.region + network.PMU.region))
+    dest = ipaddress.ip_address(dst_ip)
+    node, path = src, []
+    while True:
+        entry = lookup(network.routes.get(node, ()), dest)
+        if entry is None or entry[1] is None:
+            # on-link, by a route or the network of the interface: must be in the same domain
+            return path
+        node = owner(network, entry[1])
+        assert node not in path, 'routing loop through {}'.format(path + [node])
+        path.append(node)
+        assert len(path) <= len(network.gateways)
+
+
+@pytest.mark.parametrize('network', [
+    build_network('data/config_wecc_fixidx.csv', gateways=True),
+    Network().setup(generate(regions=5, switches=3, pmus=2, mesh=2, seed=1), gateways=True, switch_prefix=24),
+], ids=['flat-explicit', 'allocated'])
+def test_routes_reach_every_region_without_loops(network):
+    hosts = list(zip(network.PDC.mn_name + network.PMU.mn_name, network.PDC.ip + network.PMU.ip,
+                     network.PDC.region + network.PMU.region))
+    for src, _, src_region in hosts[::7]:
+        for dst, ip, dst_region in hosts[::5]:
+            path = forward(network, src, ip.split('/')[0])
+            last = network.gateways[[g.name for g in network.gateways].index(path[-1])] if path else None
+            if src_region == dst_region:
+                assert not path
+            else:
+                assert last is not None and dst_region in last.regions
+
+
+def test_gateways_replace_links_between_regions():
+    network = build_network('data/config_5pmu.csv', gateways=True)
+    assert len(network.gateways) == 1
+    g = network.gateways[0]
+    assert network.isSwitch(network.to_canonical(g.ends[0]))
+    ends = {network.to_canonical(end) for end in g.ends}
+    links = {frozenset(link) for link in network.links()}
+    assert frozenset(ends) not in links
+    assert all(frozenset((g.name, end)) in links for end in ends)